@@ -0,0 +1,184 @@
+# Admission control for the assessment analysis.
+#
+# Every session runs its analysis in its own script thread, so a burst of
+# submissions used to run all at once and slow everyone down. Analyses now go
+# through a process-wide gate:
+#
+# - at most ADMISSION_MAX_ACTIVE run at the same time; later ones wait in a
+#   FIFO queue and see their position in it,
+# - a submission is shed (with a message) when the queue already holds
+#   ADMISSION_MAX_QUEUE waiters or it waited ADMISSION_QUEUE_TIMEOUT seconds,
+# - each client may start ADMISSION_RATE_PER_MINUTE analyses a minute, with
+#   bursts of up to ADMISSION_BURST,
+# - an analysis admitted while ADMISSION_DEGRADE_QUEUE_DEPTH or more others
+#   are waiting runs degraded: no progress animation and none of the optional
+#   charts (contributions, what-if panel).
+#
+# Queue depth, active analyses, waits, degraded runs and shed submissions are
+# exported through metrics.py.
+import ipaddress
+import threading
+import time
+from collections import deque
+
+import streamlit as st
+
+import config
+import metrics
+
+POLL_SECONDS = 0.25  # how often a waiting session refreshes its queue position
+
+
+class Ticket:
+    def __init__(self):
+        self.degraded = False
+        self.waited = 0.0
+        self._gate = None
+
+    def release(self):
+        if self._gate is not None:
+            self._gate.release()
+            self._gate = None
+
+
+# Bounded pool of concurrent analyses with a FIFO queue in front of it
+class AdmissionGate:
+    def __init__(self, max_active, max_queue, degrade_depth):
+        self.max_active = max_active
+        self.max_queue = max_queue
+        self.degrade_depth = degrade_depth
+        self.active = 0
+        self._queue = deque()  # waiting tickets, oldest first
+        self._cond = threading.Condition()
+
+    @property
+    def depth(self):
+        return len(self._queue)
+
+    def _admit(self, ticket):
+        ticket.degraded = self.degrade_depth > 0 and len(self._queue) >= self.degrade_depth
+        ticket._gate = self
+        self.active += 1
+        return ticket
+
+    # Function to wait for a slot. on_wait(position, depth) is called about
+    # every POLL_SECONDS while queued. Returns (ticket, None) when admitted or
+    # (None, reason) when shed.
+    def enter(self, timeout, on_wait=None):
+        ticket = Ticket()
+        started = time.monotonic()
+        with self._cond:
+            if self.active < self.max_active and not self._queue:
+                return self._admit(ticket), None
+            if len(self._queue) >= self.max_queue:
+                return None, "queue_full"
+            self._queue.append(ticket)
+
+        # Leave the queue however this ends, including a rerun or stop
+        # raised inside on_wait
+        try:
+            while True:
+                with self._cond:
+                    if self._queue[0] is ticket and self.active < self.max_active:
+                        self._queue.popleft()
+                        ticket.waited = time.monotonic() - started
+                        return self._admit(ticket), None
+                    remaining = started + timeout - time.monotonic()
+                    if remaining <= 0:
+                        return None, "timeout"
+                    position, depth = self._queue.index(ticket) + 1, len(self._queue)
+                    self._cond.wait(min(remaining, POLL_SECONDS))
+                if on_wait is not None:
+                    on_wait(position, depth)
+        finally:
+            with self._cond:
+                if ticket in self._queue:
+                    self._queue.remove(ticket)
+                    self._cond.notify_all()
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+
+# Per-client token buckets
+class RateLimiter:
+    MAX_CLIENTS = 10000  # full buckets are forgotten beyond this many clients
+
+    def __init__(self, per_minute, burst):
+        self.rate = per_minute / 60.0
+        self.burst = burst
+        self._buckets = {}  # client -> (tokens, updated at)
+        self._lock = threading.Lock()
+
+    # Function to take one token for a client. Returns 0 when allowed,
+    # otherwise the seconds until the next token.
+    def take(self, client):
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens < 1:
+                self._buckets[client] = (tokens, now)
+                return (1 - tokens) / self.rate
+            self._buckets[client] = (tokens - 1, now)
+            if len(self._buckets) > self.MAX_CLIENTS:
+                self._forget_full(now)
+        return 0.0
+
+    def _forget_full(self, now):
+        for client, (tokens, updated) in list(self._buckets.items()):
+            if tokens + (now - updated) * self.rate >= self.burst:
+                del self._buckets[client]
+
+
+gate = AdmissionGate(config.ADMISSION_MAX_ACTIVE, config.ADMISSION_MAX_QUEUE, config.ADMISSION_DEGRADE_QUEUE_DEPTH)
+limiter = RateLimiter(config.ADMISSION_RATE_PER_MINUTE, config.ADMISSION_BURST)
+
+
+# Function to identify the client behind a session: the address the browser
+# connected from, or the session itself when the runtime doesn't expose it.
+# X-Forwarded-For is only trusted from a loopback peer (launcher.py, which
+# sets it to the browser's address); anyone else could pick their own key.
+def client_key(session_id):
+    try:
+        from streamlit.runtime import Runtime
+
+        request = Runtime.instance()._session_mgr.get_session_info(session_id).client.request
+        forwarded = request.headers.get("X-Forwarded-For")
+        if forwarded and ipaddress.ip_address(request.remote_ip).is_loopback:
+            return forwarded.split(",")[-1].strip()
+        return request.remote_ip
+    except (AttributeError, RuntimeError, ValueError):
+        return session_id
+
+
+# Function to let one analysis through, showing the queue position while it
+# waits. Returns a Ticket to release when the analysis is done, or None
+# (after telling the user why) when the submission is shed.
+def admit(client):
+    retry_after = limiter.take(client)
+    if retry_after > 0:
+        metrics.ADMISSION_SHED.inc(reason="rate_limit")
+        st.warning("You've run several analyses in a short time. Please try again in %d seconds."
+                   % max(1, round(retry_after)))
+        return None
+
+    status = st.empty()
+
+    def on_wait(position, depth):
+        status.info("⏳ The server is busy. Your analysis is number %d of %d in the queue..." % (position, depth))
+
+    ticket, reason = gate.enter(config.ADMISSION_QUEUE_TIMEOUT, on_wait)
+    status.empty()
+    if ticket is None:
+        metrics.ADMISSION_SHED.inc(reason=reason)
+        st.warning("The server is too busy to run your analysis right now. Please try again in a minute.")
+        return None
+    metrics.ADMISSION_WAIT_SECONDS.observe(ticket.waited)
+    if ticket.degraded:
+        metrics.ADMISSION_DEGRADED.inc()
+    return ticket
@@ -0,0 +1,198 @@
+# Incrementally maintained aggregates over the assessment log.
+#
+# Every batch the log writer inserts also bumps pre-bucketed counters in the
+# same SQLite transaction: assessments per risk level, yes-answers per factor
+# and matches per recommendation rule, each per hour and per day bucket (UTC)
+# and age band. The dashboard only reads these small tables, so its cost
+# depends on the time range shown, not on how many assessments were logged.
+#
+#   python analytics.py rebuild    # recompute the aggregates from the raw log
+import argparse
+import sqlite3
+import sys
+import time
+from collections import Counter
+
+import numpy as np
+
+import config
+import percentiles
+import recommendations
+import scoring
+
+GRANULARITIES = {"hour": 3600, "day": 86400}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS agg_risk_levels (
+    granularity TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    age_band INTEGER NOT NULL,
+    risk_level TEXT NOT NULL,
+    n INTEGER NOT NULL,
+    PRIMARY KEY (granularity, bucket, age_band, risk_level)
+);
+CREATE TABLE IF NOT EXISTS agg_factors (
+    granularity TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    age_band INTEGER NOT NULL,
+    factor TEXT NOT NULL,
+    n INTEGER NOT NULL,
+    PRIMARY KEY (granularity, bucket, age_band, factor)
+);
+CREATE TABLE IF NOT EXISTS agg_recommendations (
+    granularity TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    age_band INTEGER NOT NULL,
+    rule_id TEXT NOT NULL,
+    n INTEGER NOT NULL,
+    PRIMARY KEY (granularity, bucket, age_band, rule_id)
+);
+"""
+
+_UPSERT = (
+    "INSERT INTO {table} (granularity, bucket, age_band, {key}, n) VALUES (?, ?, ?, ?, ?) "
+    "ON CONFLICT (granularity, bucket, age_band, {key}) DO UPDATE SET n = n + excluded.n"
+)
+UPSERT_RISK_LEVELS = _UPSERT.format(table="agg_risk_levels", key="risk_level")
+UPSERT_FACTORS = _UPSERT.format(table="agg_factors", key="factor")
+UPSERT_RECOMMENDATIONS = _UPSERT.format(table="agg_recommendations", key="rule_id")
+
+
+# Function to turn log records (assessment_log.COLUMNS order) back into
+# timestamps, risk levels and an encoded feature matrix
+def _decode(batch):
+    from assessment_log import COLUMNS
+
+    first = COLUMNS.index(scoring.FEATURES[0].lower())
+    columns = list(zip(*batch))
+    features = np.empty((len(batch), len(scoring.FEATURES)), dtype=np.int16, order="F")
+    features[:, 0] = [2 if gender == "F" else 1 for gender in columns[first]]
+    for i in range(1, len(scoring.FEATURES)):
+        features[:, i] = columns[first + i]
+    return np.array(columns[COLUMNS.index("ts")]), columns[COLUMNS.index("risk_level")], features
+
+
+# Function to add one batch of log records to the aggregate tables, inside
+# the caller's transaction
+def update(connection, batch):
+    if not batch:
+        return
+    ts, risk_levels, features = _decode(batch)
+    age_bands = np.searchsorted(percentiles.AGE_BAND_EDGES, features[:, scoring.COLUMN["AGE"]], side="right")
+    yes = features[:, 2:] == 2
+    matches = recommendations.rule_matches(features)
+
+    for granularity, seconds in GRANULARITIES.items():
+        buckets = (ts // seconds * seconds).astype(np.int64)
+        levels = Counter(zip(buckets.tolist(), age_bands.tolist(), risk_levels))
+        connection.executemany(UPSERT_RISK_LEVELS, [
+            (granularity, bucket, band, level, n) for (bucket, band, level), n in levels.items()
+        ])
+
+        # Sum yes-answers and rule matches per (bucket, age band) group
+        keys = buckets * len(percentiles.AGE_BANDS) + age_bands
+        unique_keys, group = np.unique(keys, return_inverse=True)
+        factor_sums = np.zeros((len(unique_keys), yes.shape[1]), dtype=np.int64)
+        np.add.at(factor_sums, group, yes)
+        rule_sums = np.zeros((len(unique_keys), matches.shape[1]), dtype=np.int64)
+        np.add.at(rule_sums, group, matches)
+
+        group_buckets, group_bands = np.divmod(unique_keys, len(percentiles.AGE_BANDS))
+        groups = list(zip(group_buckets.tolist(), group_bands.tolist()))
+        connection.executemany(UPSERT_FACTORS, [
+            (granularity, bucket, band, name, n)
+            for (bucket, band), counts in zip(groups, factor_sums.tolist())
+            for name, n in zip(scoring.YES_NO_FEATURES, counts) if n
+        ])
+        connection.executemany(UPSERT_RECOMMENDATIONS, [
+            (granularity, bucket, band, rule_id, n)
+            for (bucket, band), counts in zip(groups, rule_sums.tolist())
+            for rule_id, n in zip(recommendations.RULE_IDS, counts) if n
+        ])
+
+
+# Function to open the log database read-only for the dashboard. Returns None
+# when nothing has been logged yet.
+def connect_readonly(path=None):
+    path = path or config.ASSESSMENT_LOG_PATH
+    try:
+        connection = sqlite3.connect("file:%s?mode=ro" % path, uri=True, check_same_thread=False)
+        connection.execute("SELECT 1 FROM agg_risk_levels LIMIT 1")
+    except sqlite3.Error:
+        return None
+    return connection
+
+
+def _age_filter(age_band):
+    return ("", ()) if age_band is None else (" AND age_band = ?", (age_band,))
+
+
+# Function to count assessments per bucket and risk level since a timestamp
+def risk_level_counts(connection, granularity, since, age_band=None):
+    where, params = _age_filter(age_band)
+    return connection.execute(
+        "SELECT bucket, risk_level, SUM(n) FROM agg_risk_levels "
+        "WHERE granularity = ? AND bucket >= ?" + where + " GROUP BY bucket, risk_level ORDER BY bucket",
+        (granularity, since) + params,
+    ).fetchall()
+
+
+# Function to count yes-answers per factor since a timestamp
+def factor_counts(connection, granularity, since, age_band=None):
+    where, params = _age_filter(age_band)
+    return connection.execute(
+        "SELECT factor, SUM(n) FROM agg_factors "
+        "WHERE granularity = ? AND bucket >= ?" + where + " GROUP BY factor",
+        (granularity, since) + params,
+    ).fetchall()
+
+
+# Function to count recommendation matches per bucket and rule since a timestamp
+def recommendation_counts(connection, granularity, since, age_band=None):
+    where, params = _age_filter(age_band)
+    return connection.execute(
+        "SELECT bucket, rule_id, SUM(n) FROM agg_recommendations "
+        "WHERE granularity = ? AND bucket >= ?" + where + " GROUP BY bucket, rule_id ORDER BY bucket",
+        (granularity, since) + params,
+    ).fetchall()
+
+
+# Function to recompute every aggregate from the raw assessment log, e.g.
+# after changing the recommendation rules or age bands
+def rebuild(path=None, batch_size=50000):
+    from assessment_log import COLUMNS, connect
+
+    connection = connect(path)
+    rows = 0
+    with connection:
+        for table in ("agg_risk_levels", "agg_factors", "agg_recommendations"):
+            connection.execute("DELETE FROM %s" % table)
+        cursor = connection.execute("SELECT %s FROM assessments ORDER BY id" % ", ".join(COLUMNS))
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            update(connection, batch)
+            rows += len(batch)
+    connection.close()
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the assessment analytics aggregates.")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--path", default=config.ASSESSMENT_LOG_PATH, help="assessment log database")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    try:
+        rows = rebuild(args.path)
+    except sqlite3.Error as e:
+        print("error: %s" % e, file=sys.stderr)
+        return 1
+    print("Rebuilt aggregates from %d assessments in %.1f s" % (rows, time.perf_counter() - started))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,233 @@
+# Lightweight JSON scoring API served next to the Streamlit app.
+#
+#   python api.py --port 10001
+#
+#   POST /score         one input_data record  -> one result
+#   POST /score/batch   {"records": [...]}     -> {"results": [...]}
+#   GET  /health
+#   GET  /metrics       Prometheus text (see metrics.py)
+#
+# Runs on Tornado (already installed with Streamlit). Concurrent /score calls
+# that arrive within a short window are coalesced into one vectorized call to
+# the scoring engine.
+import argparse
+import asyncio
+import json
+import time
+
+import numpy as np
+import tornado.httpserver
+import tornado.ioloop
+import tornado.web
+
+import config
+import metrics
+import scoring
+from assessment_log import log_scores
+from explain import baseline_probability, contribution_dicts, explain_features
+from recommendations import recommendation_lists
+
+
+# Function to turn a list of input_data records into scoring.encode columns
+def records_to_columns(records):
+    if not isinstance(records, list) or not records:
+        raise ValueError("Expected a non-empty list of records")
+    for i, record in enumerate(records):
+        if not isinstance(record, dict):
+            raise ValueError("Record %d is not an object" % i)
+        missing = [name for name in scoring.FEATURES if name not in record]
+        if missing:
+            raise ValueError("Record %d is missing: %s" % (i, ", ".join(missing)))
+        age = record["AGE"]
+        low, high = scoring.AGE_RANGE
+        if isinstance(age, bool) or not isinstance(age, int) or not low <= age <= high:
+            raise ValueError("Record %d: AGE must be a whole number from %d to %d" % (i, low, high))
+        for name in scoring.YES_NO_FEATURES:
+            value = record[name]
+            if isinstance(value, bool) or not isinstance(value, int) or value not in (1, 2):
+                raise ValueError("Record %d: %s must be 1 (No) or 2 (Yes)" % (i, name))
+        if record["GENDER"] not in ("M", "F"):
+            raise ValueError("Record %d: GENDER must be M or F" % i)
+    return {name: [record[name] for record in records] for name in scoring.FEATURES}
+
+
+# Function to build the JSON results for an encoded batch
+def results_for(features):
+    model = scoring.active_model()
+    scores = scoring.score_features(features, model)
+    log_scores(features, scores, "api")
+    metrics.count_assessments(scores, "api")
+    recommendations = recommendation_lists(features)
+    contributions = contribution_dicts(explain_features(features, model))
+    baseline = baseline_probability(model)
+    results = []
+    for i in range(len(features)):
+        result = scoring.row_result(scores, i)
+        result["recommendations"] = recommendations[i]
+        result["explanation"] = {"baseline_probability": baseline, "contributions": contributions[i]}
+        results.append(result)
+    return results
+
+
+# Coalesces single-record requests into vectorized scoring calls. The first
+# request of a batch waits at most `window` seconds for others to join; a full
+# batch is scored straight away.
+class MicroBatcher:
+    def __init__(self, window, max_size):
+        self.window = window
+        self.max_size = max_size
+        self._rows = []
+        self._futures = []
+        self._timer = None
+        self.batches = 0
+        self.requests = 0
+
+    def submit(self, features):
+        future = asyncio.get_running_loop().create_future()
+        self._rows.append(features)
+        self._futures.append(future)
+        if len(self._rows) >= self.max_size:
+            self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self.flush)
+        return future
+
+    def flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        rows, futures = self._rows, self._futures
+        self._rows, self._futures = [], []
+        if not rows:
+            return
+
+        self.batches += 1
+        self.requests += len(rows)
+        try:
+            results = results_for(np.concatenate(rows))
+        except Exception as e:
+            metrics.EXCEPTIONS.inc(handler="api.micro_batch")
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for future, result in zip(futures, results):
+            if not future.done():
+                future.set_result(result)
+
+
+# HTTP error whose message is returned in the JSON body
+class APIError(tornado.web.HTTPError):
+    def __init__(self, status_code, message):
+        super().__init__(status_code)
+        self.message = message
+
+
+class JSONHandler(tornado.web.RequestHandler):
+    def set_default_headers(self):
+        self.set_header("Content-Type", "application/json")
+
+    def write_json(self, data, status=200):
+        self.set_status(status)
+        self.finish(json.dumps(data))
+
+    def write_error(self, status_code, **kwargs):
+        error = kwargs.get("exc_info", (None, None))[1]
+        if status_code >= 500:
+            metrics.EXCEPTIONS.inc(handler="api.request")
+        self.finish(json.dumps({"error": getattr(error, "message", self._reason)}))
+
+    def json_body(self):
+        try:
+            return json.loads(self.request.body)
+        except ValueError:
+            raise APIError(400, "Request body is not valid JSON")
+
+
+class ScoreHandler(JSONHandler):
+    def initialize(self, batcher):
+        self.batcher = batcher
+
+    async def post(self):
+        try:
+            features = scoring.encode(records_to_columns([self.json_body()]))
+        except ValueError as e:
+            raise APIError(400, str(e))
+        result = await self.batcher.submit(features)
+        self.write_json(result)
+
+
+class BatchScoreHandler(JSONHandler):
+    async def post(self):
+        body = self.json_body()
+        records = body.get("records") if isinstance(body, dict) else body
+        if isinstance(records, list) and len(records) > config.API_MAX_BATCH_RECORDS:
+            raise APIError(413, "At most %d records per request" % config.API_MAX_BATCH_RECORDS)
+        try:
+            features = scoring.encode(records_to_columns(records))
+        except ValueError as e:
+            raise APIError(400, str(e))
+
+        # Large batches are scored off the event loop so single requests keep flowing
+        if len(features) > self.settings["inline_batch_rows"]:
+            results = await tornado.ioloop.IOLoop.current().run_in_executor(None, results_for, features)
+        else:
+            results = results_for(features)
+        self.write_json({"model_version": results[0]["model_version"], "results": results})
+
+
+class HealthHandler(JSONHandler):
+    def initialize(self, batcher, started):
+        self.batcher = batcher
+        self.started = started
+
+    def get(self):
+        self.write_json({
+            "status": "ok",
+            "model_version": scoring.model_version(),
+            "uptime_seconds": time.time() - self.started,
+            "micro_batches": self.batcher.batches,
+            "micro_batched_requests": self.batcher.requests,
+        })
+
+
+class MetricsHandler(tornado.web.RequestHandler):
+    def get(self):
+        self.set_header("Content-Type", metrics.CONTENT_TYPE)
+        self.write(metrics.render())
+
+
+def make_app():
+    batcher = MicroBatcher(config.API_BATCH_WINDOW_MS / 1000.0, config.API_MAX_MICRO_BATCH)
+    return tornado.web.Application(
+        [
+            (r"/score", ScoreHandler, {"batcher": batcher}),
+            (r"/score/batch", BatchScoreHandler),
+            (r"/health", HealthHandler, {"batcher": batcher, "started": time.time()}),
+            (r"/metrics", MetricsHandler),
+        ],
+        inline_batch_rows=config.API_INLINE_BATCH_ROWS,
+    )
+
+
+async def serve(port, address):
+    server = tornado.httpserver.HTTPServer(
+        make_app(),
+        idle_connection_timeout=config.API_KEEP_ALIVE_TIMEOUT,
+        max_body_size=config.API_MAX_BODY_BYTES,
+    )
+    server.listen(port, address)
+    print("Scoring API listening on http://%s:%d" % (address, port))
+    await asyncio.Event().wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the risk scorer over HTTP.")
+    parser.add_argument("--port", type=int, default=config.API_PORT)
+    parser.add_argument("--address", default="127.0.0.1")
+    args = parser.parse_args(argv)
+    asyncio.run(serve(args.port, args.address))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+# Append-only log of every assessment, for capacity planning, model
+# monitoring and audits.
+#
+# Request handlers only append their scored batch (the feature matrix and
+# scores, not per-row tuples) to an in-memory buffer. A background thread
+# turns batches into log records and writes them to SQLite (WAL mode) in
+# transactions: as soon as ASSESSMENT_LOG_BATCH_SIZE records are waiting, or
+# every ASSESSMENT_LOG_FLUSH_INTERVAL seconds otherwise. Each transaction also
+# updates the analytics aggregates (analytics.py). Whatever is still buffered
+# is written when the process exits normally.
+#
+# A scored batch of more than ASSESSMENT_LOG_MAX_BATCH_ROWS rows (a large API
+# request) logs an evenly spaced sample of that many rows, so one request
+# can't crowd everything else out of the buffer. If the writer falls so far
+# behind that ASSESSMENT_LOG_CAPACITY records are buffered, the oldest
+# batches are dropped and counted rather than slowing requests down. Records
+# a failed transaction didn't write stay buffered and are retried, oldest
+# first, on the next flush.
+#
+# With PERCENTILE_ADD_ASSESSMENTS on, the writer also adds each written UI
+# assessment to the loaded percentile index (percentiles.py).
+import atexit
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+import analytics
+import config
+import scoring
+
+COLUMNS = (
+    ["ts", "source", "session_id", "model_version"]
+    + [name.lower() for name in scoring.FEATURES]
+    + ["probability", "prediction", "risk_level", "latency_ms"]
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS assessments (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    source TEXT NOT NULL,
+    session_id TEXT,
+    model_version TEXT NOT NULL,
+    %s,
+    probability REAL NOT NULL,
+    prediction TEXT NOT NULL,
+    risk_level TEXT NOT NULL,
+    latency_ms REAL
+);
+CREATE INDEX IF NOT EXISTS assessments_ts ON assessments (ts);
+""" % ",\n    ".join(
+    ["gender TEXT NOT NULL"] + ["%s INTEGER NOT NULL" % name.lower() for name in scoring.FEATURES[1:]]
+)
+
+INSERT = "INSERT INTO assessments (%s) VALUES (%s)" % (", ".join(COLUMNS), ", ".join("?" * len(COLUMNS)))
+
+_log = None
+_log_lock = threading.Lock()
+
+
+# Function to open a log database, creating the schema on first use
+def connect(path=None):
+    path = path or config.ASSESSMENT_LOG_PATH
+    connection = sqlite3.connect(path, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.executescript(SCHEMA)
+    connection.executescript(analytics.SCHEMA)
+    return connection
+
+
+# Function to build log records for a scored batch, one tuple per row in
+# COLUMNS order
+def records(features, scores, source, session_id=None, latency_ms=None, ts=None):
+    now = time.time() if ts is None else ts
+    columns = [features[:, i].tolist() for i in range(features.shape[1])]
+    columns[scoring.COLUMN["GENDER"]] = ["F" if code == 2 else "M" for code in columns[scoring.COLUMN["GENDER"]]]
+    return [
+        (now, source, session_id, scores["model_version"]) + answers + (probability, prediction, risk_level, latency_ms)
+        for answers, probability, prediction, risk_level in zip(
+            zip(*columns),
+            scores["probability"].tolist(),
+            scores["prediction"].tolist(),
+            scores["risk_level"].tolist(),
+        )
+    ]
+
+
+# Function to add logged UI assessments to the loaded percentile index. Only
+# processes that already use the index (the app) are updated.
+def add_to_percentiles(batch):
+    percentiles = sys.modules.get("percentiles")
+    index = percentiles.get_index() if percentiles is not None else None
+    if index is None:
+        return
+    first, source, version = COLUMNS.index("gender"), COLUMNS.index("source"), COLUMNS.index("model_version")
+    rows = [row for row in batch if row[source] == "ui" and row[version] == index.model_version]
+    if not rows:
+        return
+    features = scoring.encode({
+        name: [row[first + i] for row in rows] for i, name in enumerate(scoring.FEATURES)
+    })
+    index.add(features, np.array([row[COLUMNS.index("probability")] for row in rows]))
+
+
+class AssessmentLog:
+    def __init__(self, path=None, capacity=None, batch_size=None, flush_interval=None, max_batch_rows=None):
+        self.path = path or config.ASSESSMENT_LOG_PATH
+        self.capacity = capacity or config.ASSESSMENT_LOG_CAPACITY
+        self.batch_size = batch_size or config.ASSESSMENT_LOG_BATCH_SIZE
+        self.flush_interval = flush_interval or config.ASSESSMENT_LOG_FLUSH_INTERVAL
+        self.max_batch_rows = max_batch_rows or config.ASSESSMENT_LOG_MAX_BATCH_ROWS
+        self._buffer = deque()  # (features, scores, source, session_id, latency_ms, ts) per scored batch
+        self._retry = []  # records of failed writes, written before the buffer
+        self._rows = 0  # records in the buffer and the retry list
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._write_lock = threading.Lock()
+        self._connection = None
+        self._thread = threading.Thread(target=self._run, name="assessment-log-writer", daemon=True)
+        self.appended = 0
+        self.written = 0
+        self.dropped = 0
+        self.sampled = 0
+        self.flushes = 0
+        self.errors = 0
+        self._thread.start()
+
+    # Function to queue a scored batch for writing. Never blocks on I/O; the
+    # records are built on the writer thread.
+    def add(self, features, scores, source, session_id=None, latency_ms=None):
+        rows = len(features)
+        if rows > self.max_batch_rows:
+            keep = np.linspace(0, rows - 1, self.max_batch_rows).astype(np.intp)
+            features = features[keep]
+            scores = {name: value[keep] if isinstance(value, np.ndarray) else value
+                      for name, value in scores.items()}
+        item = (features, scores, source, session_id, latency_ms, time.time())
+        with self._lock:
+            excess = self._rows + len(features) - self.capacity
+            if excess > 0 and self._retry:
+                dropped = min(excess, len(self._retry))
+                del self._retry[:dropped]
+                self._rows -= dropped
+                self.dropped += dropped
+            while self._buffer and self._rows + len(features) > self.capacity:
+                dropped = len(self._buffer.popleft()[0])
+                self._rows -= dropped
+                self.dropped += dropped
+            self._buffer.append(item)
+            self._rows += len(features)
+            self.appended += len(features)
+            self.sampled += rows - len(features)
+            wake = self._rows >= self.batch_size
+        if wake:
+            self._wake.set()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    # Function to write everything buffered so far, in transactions of at
+    # most batch_size records. Stops at the first failed transaction and
+    # keeps the records it didn't write for the next flush.
+    def flush(self):
+        with self._write_lock:
+            while True:
+                items = []
+                with self._lock:
+                    retry, self._retry = self._retry, []
+                    rows = len(retry)
+                    while self._buffer and rows < self.batch_size:
+                        items.append(self._buffer.popleft())
+                        rows += len(items[-1][0])
+                    self._rows -= rows
+                if not rows:
+                    return
+                batch = retry + [record for item in items for record in records(*item)]
+                for start in range(0, len(batch), self.batch_size):
+                    try:
+                        self._write(batch[start:start + self.batch_size])
+                    except sqlite3.Error as e:
+                        unwritten = batch[start:]
+                        with self._lock:
+                            self._retry = unwritten + self._retry
+                            self._rows += len(unwritten)
+                            self.errors += 1
+                        print("Assessment log write failed, %d records kept for retry: %s" % (len(unwritten), e),
+                              file=sys.stderr)
+                        return
+
+    def _write(self, batch):
+        if self._connection is None:
+            self._connection = connect(self.path)
+        with self._connection:
+            self._connection.executemany(INSERT, batch)
+            analytics.update(self._connection, batch)
+        with self._lock:
+            self.written += len(batch)
+            self.flushes += 1
+        if config.PERCENTILE_ADD_ASSESSMENTS:
+            add_to_percentiles(batch)
+
+    # Function to stop the writer and write out anything still buffered
+    def close(self):
+        self._stopped.set()
+        self._wake.set()
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        self.flush()
+        with self._write_lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "appended": self.appended,
+                "written": self.written,
+                "buffered": self._rows,
+                "dropped": self.dropped,
+                "sampled": self.sampled,
+                "flushes": self.flushes,
+                "errors": self.errors,
+            }
+
+
+# Function to get the process-wide log, or None when logging is turned off
+def get_log():
+    global _log
+    if _log is None and config.ASSESSMENT_LOG_ENABLED:
+        with _log_lock:
+            if _log is None:
+                os.makedirs(os.path.dirname(os.path.abspath(config.ASSESSMENT_LOG_PATH)), exist_ok=True)
+                _log = AssessmentLog()
+                atexit.register(_log.close)
+    return _log
+
+
+# Function to log a scored batch; a no-op when logging is turned off
+def log_scores(features, scores, source, session_id=None, latency_ms=None):
+    log = get_log()
+    if log is not None:
+        log.add(features, scores, source, session_id, latency_ms)
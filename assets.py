@@ -0,0 +1,315 @@
+# Vendored fonts, images and animations.
+#
+# The page used to pull Poppins from Google Fonts, full-size illustrations
+# from three image hosts and its Lottie animations from lottiefiles on every
+# load. `python assets.py build` downloads them once into static/: images are
+# resized to the width they are shown at and re-encoded as WebP, the font CSS
+# is rewritten to point at local woff2 files, and animations are stored as
+# compact JSON. static/manifest.json records what was vendored.
+#
+# Streamlit serves static/ at app/static/ (see .streamlit/config.toml). Every
+# URL handed to the browser carries ?v=<content hash>, which makes the static
+# file handler answer with a ten-year Cache-Control max-age; a rebuilt asset
+# gets a new hash and therefore a new URL. Anything that was not vendored (or
+# whose download failed) falls back to the original remote URL, so a partial
+# build never breaks the page.
+#
+# Without network access a build would wait ASSET_TIMEOUT seconds per asset,
+# so the first download that can't connect or times out skips the remaining
+# ones. With LU_OFFLINE set nothing is downloaded at all.
+#
+#   python assets.py build               # vendor everything, replacing old copies
+#   python assets.py build --if-missing  # only fetch what is not vendored yet
+import argparse
+import hashlib
+import io
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+import streamlit as st
+
+import config
+
+FONT_CSS_URL = "https://fonts.googleapis.com/css2?family=Poppins:wght@300;400;500;600;700&display=swap"
+
+# Name -> (remote URL, width in pixels to store). Widths are about twice the
+# CSS width each image is shown at, for high-density screens.
+IMAGES = {
+    "lung_illustration": (
+        "https://www.cancer.org/content/dam/cancer-org/images/illustrations/medical-illustrations/en/lung-cancer-illustration-en.png",
+        800,
+    ),
+    "lung_health": (
+        "https://i0.wp.com/www.denvaxindia.com/blog/wp-content/uploads/2024/04/Lung-Cancer-Treatment-1.png?fit=1107%2C632&ssl=1",
+        600,
+    ),
+    "lung_cancer_types": (
+        "https://img.freepik.com/free-vector/lung-cancer-concept-illustration_114360-8465.jpg",
+        1200,
+    ),
+    "lung_diagnostics": (
+        "https://img.freepik.com/free-vector/tiny-people-examining-lungs-flat-vector-illustration-cartoon-medical-team-doing-lung-diagnostics-x-ray-tuberculosis-pneumonia-respiratory-system-anatomy-health-medicine-concept_74855-25408.jpg",
+        800,
+    ),
+}
+
+ANIMATIONS = {
+    "lung": "https://assets1.lottiefiles.com/packages/lf20_5njp3vgg.json",
+    "doctor": "https://assets9.lottiefiles.com/packages/lf20_5tl1xxnz.json",
+    "health": "https://assets2.lottiefiles.com/packages/lf20_5njp3vgg.json",
+}
+
+WEBP_QUALITY = 82
+# Google Fonts picks the font format from the User-Agent; ask for woff2
+FONT_USER_AGENT = (
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36"
+)
+FONT_URL_RE = re.compile(r"url\((https://[^)]+)\)")
+
+_manifest = None
+_font_css = None
+_animations = {}
+_lock = threading.Lock()
+
+
+def _manifest_path(static_dir=None):
+    return os.path.join(static_dir or config.STATIC_DIR, "manifest.json")
+
+
+def _digest(data):
+    return hashlib.sha1(data).hexdigest()[:12]
+
+
+# Function to get the URL the browser loads a vendored file from
+def static_url(entry):
+    return "app/static/%s?v=%s" % (entry["path"], entry["hash"])
+
+
+# Function to read the manifest of a static directory, keeping only entries
+# whose file is actually there
+def read_manifest(static_dir=None):
+    static_dir = static_dir or config.STATIC_DIR
+    try:
+        with open(_manifest_path(static_dir), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+    for section in ("fonts", "images", "animations"):
+        entries = manifest.get(section)
+        manifest[section] = {
+            name: entry for name, entry in (entries or {}).items()
+            if os.path.isfile(os.path.join(static_dir, entry.get("path", "")))
+        }
+    return manifest
+
+
+# Function to get the process-wide manifest, read on first use
+def manifest():
+    global _manifest
+    if _manifest is None:
+        with _lock:
+            if _manifest is None:
+                _manifest = read_manifest()
+    return _manifest
+
+
+# Function to get the CSS that loads Poppins: the vendored @font-face rules
+# when available, otherwise the Google Fonts import
+def font_css():
+    global _font_css
+    if _font_css is None:
+        entry = manifest()["fonts"].get("poppins")
+        css = "@import url('%s');" % FONT_CSS_URL
+        if entry is not None:
+            try:
+                with open(os.path.join(config.STATIC_DIR, entry["path"]), "r", encoding="utf-8") as f:
+                    css = f.read()
+            except OSError:
+                pass
+        _font_css = css
+    return _font_css
+
+
+# Function to show an illustration at the column width, from the vendored
+# copy when there is one
+def image(name, caption=None):
+    entry = manifest()["images"].get(name)
+    if entry is None:
+        st.image(IMAGES[name][0], caption=caption, use_column_width=True)
+        return
+    html = '<img src="%s" alt="%s" width="%d" height="%d" loading="lazy" style="width: 100%%; height: auto;">' % (
+        static_url(entry), caption or "", entry["width"], entry["height"]
+    )
+    if caption:
+        html += ('<p style="text-align: center; font-size: 14px; color: rgba(49, 51, 63, 0.6); margin-top: 0.5rem;">'
+                 "%s</p>" % caption)
+    st.markdown(html, unsafe_allow_html=True)
+
+
+def _read_animation(entry):
+    from lottie_loader import is_valid_animation
+
+    try:
+        with open(os.path.join(config.STATIC_DIR, entry["path"]), "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return data if is_valid_animation(data) else None
+
+
+# Function to load animations by name, in order. Vendored ones are read from
+# disk once per process; the rest go through the cached remote loader and may
+# come back as None.
+def animations(names):
+    entries = manifest()["animations"]
+    results = {}
+    for name in names:
+        if name not in _animations and name in entries:
+            _animations[name] = _read_animation(entries[name])
+        results[name] = _animations.get(name)
+    remote = [name for name in names if results[name] is None]
+    if remote:
+        from lottie_loader import load_lotties
+
+        results.update(zip(remote, load_lotties([ANIMATIONS[name] for name in remote])))
+    return [results[name] for name in names]
+
+
+# Build step. Its dependencies are imported here rather than at the top, so
+# the app itself doesn't load Pillow and requests just to serve the assets.
+
+def _download(session, url, headers=None):
+    r = session.get(url, headers=headers, timeout=config.ASSET_TIMEOUT)
+    if r.status_code != 200:
+        raise ValueError("HTTP %d" % r.status_code)
+    return r.content
+
+
+def _write(static_dir, path, data):
+    full_path = os.path.join(static_dir, path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    tmp_path = "%s.%d.tmp" % (full_path, os.getpid())
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, full_path)
+    return {"path": path, "hash": _digest(data), "bytes": len(data)}
+
+
+# Function to resize an image to at most width pixels and encode it as WebP
+def to_webp(data, width):
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as img:
+        img = img.convert("RGBA" if "A" in img.getbands() or "transparency" in img.info else "RGB")
+        if img.width > width:
+            img = img.resize((width, round(img.height * width / img.width)), Image.LANCZOS)
+        out = io.BytesIO()
+        img.save(out, "WEBP", quality=WEBP_QUALITY, method=6)
+        return out.getvalue(), img.size
+
+
+def _build_image(session, static_dir, name):
+    url, width = IMAGES[name]
+    data, (w, h) = to_webp(_download(session, url), width)
+    entry = _write(static_dir, "img/%s.webp" % name, data)
+    entry.update(source=url, width=w, height=h)
+    return entry
+
+
+def _build_animation(session, static_dir, name):
+    from lottie_loader import is_valid_animation
+
+    url = ANIMATIONS[name]
+    data = json.loads(_download(session, url))
+    if not is_valid_animation(data):
+        raise ValueError("response is not a Lottie animation")
+    entry = _write(static_dir, "lottie/%s.json" % name, json.dumps(data, separators=(",", ":")).encode("utf-8"))
+    entry.update(source=url)
+    return entry
+
+
+# Function to vendor the font: every woff2 file the Google CSS refers to is
+# stored under fonts/ and the CSS is rewritten to the local, versioned URLs
+def _build_font(session, static_dir, name):
+    headers = {"User-Agent": FONT_USER_AGENT}
+    css = _download(session, FONT_CSS_URL, headers).decode("utf-8")
+    files = {}
+    for url in dict.fromkeys(FONT_URL_RE.findall(css)):
+        filename = "%s-%s" % (name, os.path.basename(url.split("?")[0]))
+        files[url] = _write(static_dir, "fonts/" + filename, _download(session, url, headers))
+    if not files:
+        raise ValueError("no font files in the stylesheet")
+    css = FONT_URL_RE.sub(lambda m: "url('%s')" % static_url(files[m.group(1)]), css)
+    entry = _write(static_dir, "fonts/%s.css" % name, css.encode("utf-8"))
+    entry.update(source=FONT_CSS_URL, files=len(files), bytes=entry["bytes"] + sum(f["bytes"] for f in files.values()))
+    return entry
+
+
+# Function to vendor every asset into static_dir. With if_missing, assets
+# already vendored from the same URL are kept. A failed download is reported
+# and leaves any previous copy in place; once one fails to connect or times
+# out, the rest are reported as skipped. Offline, every asset that would be
+# fetched is skipped. Returns (manifest, failures).
+def build(static_dir=None, if_missing=False, session=None, offline=None):
+    import requests
+
+    static_dir = static_dir or config.STATIC_DIR
+    offline = config.ASSET_OFFLINE if offline is None else offline
+    session = session or requests.Session()
+    current = read_manifest(static_dir)
+    jobs = [("fonts", "poppins", FONT_CSS_URL, _build_font)]
+    jobs += [("images", name, url, _build_image) for name, (url, _) in IMAGES.items()]
+    jobs += [("animations", name, url, _build_animation) for name, url in ANIMATIONS.items()]
+
+    failures = []
+    unreachable = "offline" if offline else None
+    for section, name, url, builder in jobs:
+        entry = current[section].get(name)
+        if if_missing and entry is not None and entry.get("source") == url:
+            continue
+        if unreachable is not None:
+            failures.append((section, name, "skipped (%s)" % unreachable))
+            continue
+        try:
+            current[section][name] = builder(session, static_dir, name)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            failures.append((section, name, str(e)))
+            unreachable = "no network"
+        except (requests.RequestException, OSError, ValueError) as e:
+            failures.append((section, name, str(e)))
+
+    if offline:
+        return current, failures
+    current["built_at"] = time.time()
+    _write(static_dir, "manifest.json", json.dumps(current, indent=2).encode("utf-8"))
+    return current, failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Vendor the fonts, images and animations the app shows.")
+    parser.add_argument("command", choices=["build"])
+    parser.add_argument("--static-dir", default=config.STATIC_DIR, help="directory Streamlit serves as app/static")
+    parser.add_argument("--if-missing", action="store_true", help="only fetch assets that are not vendored yet")
+    parser.add_argument("--offline", action="store_true", default=config.ASSET_OFFLINE,
+                        help="don't download anything, only report what is missing (default: LU_OFFLINE)")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    result, failures = build(args.static_dir, args.if_missing, offline=args.offline)
+    for section, name, error in failures:
+        print("warning: could not vendor %s/%s, the remote copy will be used: %s" % (section, name, error),
+              file=sys.stderr)
+    vendored = sum(len(result[section]) for section in ("fonts", "images", "animations"))
+    size = sum(entry["bytes"] for section in ("fonts", "images", "animations") for entry in result[section].values())
+    print("%d assets vendored (%.0f KB) in %.1f s: %s"
+          % (vendored, size / 1024, time.perf_counter() - started, args.static_dir))
+    # A partial build still leaves a working app, so --if-missing never fails a deploy
+    return 0 if not failures or args.if_missing else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
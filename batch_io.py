@@ -0,0 +1,246 @@
+# Chunked reading, scoring and writing of CSV / Parquet screening files.
+#
+# Files are processed one chunk at a time so memory stays bounded no matter how
+# many rows they have. Results are cached on disk by content hash, so scoring
+# an identical file again just returns the earlier output.
+import hashlib
+import io
+import json
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+import config
+import recommendations
+import scoring
+from explain import explain_features
+
+RESULT_COLUMNS = ["PROBABILITY", "PREDICTION", "RISK_LEVEL", "RECOMMENDATIONS", "MODEL_VERSION"]
+EXPLANATION_COLUMNS = ["CONTRIBUTION_" + name for name in scoring.FEATURES]
+FORMATS = {
+    ".csv": "csv",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+}
+MIME_TYPES = {
+    "csv": "text/csv",
+    "parquet": "application/octet-stream",
+}
+
+
+# Function to work out the file format from its name
+def detect_format(file_name):
+    extension = os.path.splitext(file_name.lower())[1]
+    if extension not in FORMATS:
+        raise ValueError("Unsupported file type %r: upload a .csv or .parquet file" % extension)
+    return FORMATS[extension]
+
+
+# Function to hash a file-like object's content without reading it all at once
+def content_hash(source, block_size=1 << 20):
+    digest = hashlib.sha256()
+    source.seek(0)
+    for block in iter(lambda: source.read(block_size), b""):
+        digest.update(block)
+    source.seek(0)
+    return digest.hexdigest()
+
+
+# Function to count data rows cheaply, for progress reporting
+def count_rows(source, file_format):
+    source.seek(0)
+    if file_format == "parquet":
+        import pyarrow.parquet as pq
+
+        rows = pq.ParquetFile(source).metadata.num_rows
+    else:
+        newlines = 0
+        last = b"\n"
+        for block in iter(lambda: source.read(1 << 20), b""):
+            newlines += block.count(b"\n")
+            last = block[-1:]
+        rows = newlines - 1 + (last != b"\n")  # minus header, plus unterminated last line
+    source.seek(0)
+    return max(rows, 0)
+
+
+# Function to read a file in DataFrame chunks of at most chunk_rows rows
+def iter_chunks(source, file_format, chunk_rows=None):
+    chunk_rows = chunk_rows or config.BATCH_CHUNK_ROWS
+    source.seek(0)
+    if file_format == "parquet":
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(source, chunksize=chunk_rows)
+
+
+# Function to score one chunk, returning it with the result columns appended.
+# Per-rule recommendation hits are added to rule_hits when it is given, and
+# explain=True also appends each feature's Shapley contribution.
+def score_frame(frame, rule_hits=None, explain=False):
+    features = scoring.encode(frame)
+    model = scoring.active_model()
+    scores = scoring.score_features(features, model)
+    annotated = frame.copy()
+    annotated["PROBABILITY"] = scores["probability"]
+    annotated["PREDICTION"] = scores["prediction"]
+    annotated["RISK_LEVEL"] = scores["risk_level"]
+    matches = recommendations.rule_matches(features)
+    annotated["RECOMMENDATIONS"] = recommendations.recommendation_text(features, matches)
+    annotated["MODEL_VERSION"] = scores["model_version"]
+    if explain:
+        contributions = explain_features(features, model)
+        for i, column in enumerate(EXPLANATION_COLUMNS):
+            annotated[column] = contributions[:, i]
+    if rule_hits is not None:
+        for rule_id, hits in recommendations.rule_hits(features, matches).items():
+            rule_hits[rule_id] = rule_hits.get(rule_id, 0) + hits
+    return annotated
+
+
+# Function to serialize a frame as CSV bytes. pyarrow's writer is several
+# times faster than DataFrame.to_csv on the long recommendation strings.
+def to_csv_bytes(frame, include_header=False):
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+
+    buffer = io.BytesIO()
+    pa_csv.write_csv(pa.Table.from_pandas(frame, preserve_index=False), buffer,
+                     write_options=pa_csv.WriteOptions(include_header=include_header))
+    return buffer.getvalue()
+
+
+# Incremental writer for the annotated output file
+class ResultWriter:
+    def __init__(self, path, file_format):
+        self.path = path
+        self.file_format = file_format
+        self._parquet = None
+        self._wrote_header = False
+
+    def write(self, frame):
+        if self.file_format == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._parquet is None:
+                self._parquet = pq.ParquetWriter(self.path, table.schema)
+            self._parquet.write_table(table.cast(self._parquet.schema))
+        else:
+            with open(self.path, "ab" if self._wrote_header else "wb") as f:
+                f.write(to_csv_bytes(frame, include_header=not self._wrote_header))
+            self._wrote_header = True
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+            self._parquet = None
+
+
+def _cache_paths(key, file_format):
+    base = os.path.join(config.BATCH_CACHE_DIR, key)
+    return base + "." + file_format, base + ".json"
+
+
+# Function to look up a previously scored file by cache key
+def cached_result(key, file_format):
+    output_path, summary_path = _cache_paths(key, file_format)
+    try:
+        with open(summary_path, "r", encoding="utf-8") as f:
+            summary = json.load(f)
+    except (OSError, ValueError):
+        return None
+    try:
+        os.stat(output_path)
+        os.utime(summary_path)  # mark as recently used
+    except OSError:  # pruned meanwhile
+        return None
+    return summary
+
+
+# Function to keep only the most recently used results in the cache
+def prune_cache(max_entries=None):
+    max_entries = max_entries or config.BATCH_CACHE_MAX_ENTRIES
+    try:
+        names = [n for n in os.listdir(config.BATCH_CACHE_DIR) if n.endswith(".json")]
+    except OSError:
+        return
+    paths = sorted((os.path.join(config.BATCH_CACHE_DIR, n) for n in names), key=os.path.getmtime)
+    for summary_path in paths[:max(0, len(paths) - max_entries)]:
+        base = summary_path[:-len(".json")]
+        for path in (summary_path, base + ".csv", base + ".parquet"):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+# Function to validate and score a whole file chunk by chunk. Calls
+# on_progress(rows_done) after each chunk and returns a summary dict with the
+# row count, per-band counts and the path of the annotated output file.
+# Results are cached by content hash, model and rule set, so re-scoring the
+# same file is served from disk.
+def score_file(source, file_format, chunk_rows=None, on_progress=None):
+    model_version = scoring.model_version()
+    key = "%s-%s-%s" % (content_hash(source), model_version, recommendations.RULESET_ID)
+    summary = cached_result(key, file_format)
+    if summary is not None:
+        summary["cached"] = True
+        return summary
+
+    os.makedirs(config.BATCH_CACHE_DIR, exist_ok=True)
+    output_path, summary_path = _cache_paths(key, file_format)
+    # A temp file of its own, so sessions scoring the same upload at once
+    # don't write into each other's output
+    fd, tmp_path = tempfile.mkstemp(prefix=key + ".", suffix=".tmp", dir=config.BATCH_CACHE_DIR)
+    os.close(fd)
+    writer = ResultWriter(tmp_path, file_format)
+    band_counts = dict.fromkeys(scoring.RISK_LEVELS.tolist(), 0)
+    rule_hits = dict.fromkeys(recommendations.RULE_IDS, 0)
+    rows = 0
+    started = time.perf_counter()
+    try:
+        for frame in iter_chunks(source, file_format, chunk_rows):
+            try:
+                annotated = score_frame(frame, rule_hits)
+            except ValueError as e:
+                raise ValueError("Rows %d-%d: %s" % (rows + 1, rows + len(frame), e))
+            writer.write(annotated)
+            for level, count in annotated["RISK_LEVEL"].value_counts().items():
+                band_counts[level] += int(count)
+            rows += len(frame)
+            if on_progress is not None:
+                on_progress(rows)
+        if rows == 0:
+            raise ValueError("The file has no data rows")
+        writer.close()
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        writer.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    summary = {
+        "key": key,
+        "rows": rows,
+        "band_counts": band_counts,
+        "rule_hits": rule_hits,
+        "seconds": time.perf_counter() - started,
+        "output_path": output_path,
+        "format": file_format,
+        "model_version": model_version,
+    }
+    fd, tmp_path = tempfile.mkstemp(prefix=key + ".", suffix=".tmp", dir=config.BATCH_CACHE_DIR)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(summary, f)
+    os.replace(tmp_path, summary_path)
+    prune_cache()
+    summary["cached"] = False
+    return summary
@@ -0,0 +1,113 @@
+# Batch upload mode: score a CSV / Parquet file of respondents in the UI
+import os
+
+import pandas as pd
+import plotly.express as px
+import streamlit as st
+
+import batch_io
+import recommendations
+import scoring
+
+BAND_COLORS = {"Low": "#16A34A", "Medium": "#CA8A04", "High": "#DC2626"}
+
+
+# Function to draw the risk band distribution of a scored file
+def render_band_distribution(band_counts, rows):
+    counts = pd.DataFrame({
+        "Risk Level": list(band_counts.keys()),
+        "Respondents": list(band_counts.values()),
+    })
+    counts["Share"] = counts["Respondents"] / max(rows, 1) * 100
+
+    metric_cols = st.columns(len(counts))
+    for col, (level, respondents, share) in zip(metric_cols, counts.itertuples(index=False)):
+        col.metric(f"{level} Risk", f"{respondents:,}", f"{share:.1f}%", delta_color="off")
+
+    fig = px.bar(
+        counts,
+        x="Risk Level",
+        y="Respondents",
+        color="Risk Level",
+        color_discrete_map=BAND_COLORS,
+        text=counts["Share"].map("{:.1f}%".format),
+    )
+    fig.update_layout(
+        height=300,
+        margin=dict(l=20, r=20, t=30, b=20),
+        paper_bgcolor="rgba(0,0,0,0)",
+        plot_bgcolor="rgba(0,0,0,0)",
+        showlegend=False,
+        font=dict(family="Poppins", size=12, color="#1E3A8A")
+    )
+    st.plotly_chart(fig, use_container_width=True)
+
+
+# Function to show how often each recommendation rule fired
+def render_rule_hit_rates(rule_hits, rows):
+    rates = pd.DataFrame(recommendations.hit_rates(rule_hits, rows))
+    st.dataframe(
+        pd.DataFrame({
+            "Recommendation": rates["message"],
+            "Respondents": rates["hits"],
+            "Hit Rate": rates["rate"].map("{:.1%}".format),
+        }),
+        hide_index=True,
+        use_container_width=True,
+    )
+
+
+# Function to render the batch upload page
+def render_batch_upload():
+    st.markdown("""
+    <div class="card">
+        <h2>Batch Screening Upload</h2>
+        <p>Upload a CSV or Parquet file with one respondent per row to score everyone at once. The file needs these columns:</p>
+        <p><code>%s</code></p>
+        <p>GENDER is M or F; AGE is in years; every other column is 1 (No) or 2 (Yes).</p>
+    </div>
+    """ % ", ".join(scoring.FEATURES), unsafe_allow_html=True)
+
+    uploaded = st.file_uploader("Screening file", type=["csv", "parquet", "pq"])
+    if uploaded is None:
+        return
+
+    try:
+        file_format = batch_io.detect_format(uploaded.name)
+        total_rows = batch_io.count_rows(uploaded, file_format)
+
+        progress_bar = st.progress(0, text="Scoring %s rows..." % f"{total_rows:,}")
+
+        def on_progress(rows_done):
+            fraction = min(rows_done / total_rows, 1.0) if total_rows else 1.0
+            progress_bar.progress(int(fraction * 100), text=f"Scored {rows_done:,} of {total_rows:,} rows")
+
+        summary = batch_io.score_file(uploaded, file_format, on_progress=on_progress)
+        progress_bar.empty()
+    except ValueError as e:
+        st.error(f"Could not score this file: {e}")
+        return
+
+    if summary["cached"]:
+        st.success(f"This file was scored before: showing the saved results for {summary['rows']:,} rows.")
+    else:
+        st.success(f"Scored {summary['rows']:,} rows in {summary['seconds']:.2f} s.")
+
+    st.subheader("📊 Risk Level Distribution")
+    render_band_distribution(summary["band_counts"], summary["rows"])
+
+    st.subheader("🩺 Recommendation Hit Rates")
+    render_rule_hit_rates(summary["rule_hits"], summary["rows"])
+
+    base_name = os.path.splitext(uploaded.name)[0]
+    try:
+        with open(summary["output_path"], "rb") as results:
+            st.download_button(
+                "⬇️ Download annotated results",
+                data=results,
+                file_name=f"{base_name}_scored.{summary['format']}",
+                mime=batch_io.MIME_TYPES[summary["format"]],
+            )
+    except OSError:
+        # Another upload pushed these results out of the cache meanwhile
+        st.warning("The annotated results are no longer available. Upload the file again to rebuild them.")
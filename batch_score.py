@@ -0,0 +1,342 @@
+# Headless, multi-process batch scorer for large CSV / Parquet files.
+#
+#   python batch_score.py screening.csv scored.csv --workers 32
+#   python batch_score.py screening.parquet scored.parquet --resume
+#
+# The input is cut into fixed-size chunks that a process pool scores with the
+# same scoring and recommendation logic as the UI (batch_io.score_frame).
+# CSV input is split into newline-aligned byte blocks so parsing also happens
+# in the workers. CSV output is appended to a single file, in input order by
+# default or as chunks finish with --unordered; Parquet output is a directory
+# of part files. Progress is checkpointed after every chunk so an interrupted
+# run continues where it stopped with --resume.
+import argparse
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import pandas as pd
+
+import batch_io
+import config
+
+
+# Function to estimate how many bytes hold chunk_rows CSV rows, from a sample
+def _csv_chunk_bytes(path, chunk_rows):
+    with open(path, "rb") as f:
+        f.readline()
+        sample = f.read(1 << 16)
+    lines = max(sample.count(b"\n"), 1)
+    return max(1 << 16, int(len(sample) / lines * chunk_rows))
+
+
+# Function to yield (index, header, block) CSV byte blocks ending on a newline
+def _csv_blocks(path, chunk_bytes):
+    with open(path, "rb") as f:
+        header = f.readline()
+        index = 0
+        while True:
+            block = f.read(chunk_bytes)
+            if not block:
+                break
+            if not block.endswith(b"\n"):
+                block += f.readline()
+            yield index, header, block
+            index += 1
+
+
+# Function to yield (index, record batch) chunks of a Parquet file
+def _parquet_batches(path, chunk_rows):
+    import pyarrow.parquet as pq
+
+    for index, batch in enumerate(pq.ParquetFile(path).iter_batches(batch_size=chunk_rows)):
+        yield index, batch
+
+
+# Worker: parse (CSV) or convert (Parquet) one chunk, score it and serialize
+# the result. CSV results come back as bytes for the parent to append;
+# Parquet results are written straight to a part file.
+def _score_chunk(index, payload, output_format, output_dir, explain):
+    started = time.perf_counter()
+    if isinstance(payload, tuple):
+        header, block = payload
+        frame = pd.read_csv(io.BytesIO(header + block))
+    else:
+        frame = payload.to_pandas()
+
+    try:
+        annotated = batch_io.score_frame(frame, explain=explain)
+    except ValueError as e:
+        raise ValueError("Chunk %d: %s" % (index, e))
+
+    if output_format == "parquet":
+        part_path = os.path.join(output_dir, "part-%06d.parquet" % index)
+        annotated.to_parquet(part_path + ".tmp", index=False)
+        os.replace(part_path + ".tmp", part_path)
+        data = None
+    else:
+        data = batch_io.to_csv_bytes(annotated)
+
+    return index, data, len(frame), time.perf_counter() - started, os.getpid()
+
+
+class Checkpoint:
+    def __init__(self, path, settings):
+        self.path = path
+        self.settings = settings
+        self.done = set()
+        self.output_bytes = 0
+        self.rows = 0
+
+    # Function to load an earlier checkpoint, if it matches this run's settings
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if state.get("settings") != self.settings:
+            raise ValueError("Checkpoint %s was written for a different input or settings" % self.path)
+        self.done = set(state["done"])
+        self.output_bytes = state["output_bytes"]
+        self.rows = state["rows"]
+        return True
+
+    def save(self):
+        state = {
+            "settings": self.settings,
+            "done": sorted(self.done),
+            "output_bytes": self.output_bytes,
+            "rows": self.rows,
+        }
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+# Per-worker throughput counters
+class WorkerStats:
+    def __init__(self):
+        self.workers = {}  # pid -> [chunks, rows, busy seconds]
+        self.started = time.perf_counter()
+        self.rows = 0
+
+    def record(self, pid, rows, seconds):
+        entry = self.workers.setdefault(pid, [0, 0, 0.0])
+        entry[0] += 1
+        entry[1] += rows
+        entry[2] += seconds
+        self.rows += rows
+
+    def report(self):
+        elapsed = time.perf_counter() - self.started
+        return {
+            "rows": self.rows,
+            "seconds": elapsed,
+            "rows_per_second": self.rows / elapsed if elapsed else 0.0,
+            "workers": [
+                {
+                    "pid": pid,
+                    "chunks": chunks,
+                    "rows": rows,
+                    "busy_seconds": busy,
+                    "rows_per_second": rows / busy if busy else 0.0,
+                }
+                for pid, (chunks, rows, busy) in sorted(self.workers.items())
+            ],
+        }
+
+
+# Function to build the CSV header line of the annotated output
+def _output_header(path, input_format, explain):
+    if input_format == "parquet":
+        import pyarrow.parquet as pq
+
+        columns = pq.ParquetFile(path).schema_arrow.names
+    else:
+        columns = list(pd.read_csv(path, nrows=0).columns)
+    result_columns = batch_io.RESULT_COLUMNS + (batch_io.EXPLANATION_COLUMNS if explain else [])
+    columns += [c for c in result_columns if c not in columns]
+    return pd.DataFrame(columns=columns).to_csv(index=False).encode("utf-8")
+
+
+def _chunks(args, settings):
+    if settings["input_format"] == "parquet":
+        for index, batch in _parquet_batches(args.input, args.chunk_rows):
+            yield index, batch
+    else:
+        for index, header, block in _csv_blocks(args.input, settings["chunk_bytes"]):
+            yield index, (header, block)
+
+
+# Function to make sure the output a checkpoint refers to is still there.
+# Raises ValueError when it was removed or is shorter than checkpointed.
+def _check_resumable(output, output_format, checkpoint):
+    if output_format == "parquet":
+        missing = [index for index in sorted(checkpoint.done)
+                   if not os.path.exists(os.path.join(output, "part-%06d.parquet" % index))]
+        if missing:
+            raise ValueError("Cannot resume: %d part files of %s are missing (first: part-%06d.parquet); "
+                             "run without --resume to start over" % (len(missing), output, missing[0]))
+        return
+    try:
+        size = os.path.getsize(output)
+    except OSError:
+        raise ValueError("Cannot resume: output %s is missing; run without --resume to start over" % output)
+    if size < checkpoint.output_bytes:
+        raise ValueError("Cannot resume: output %s holds %d bytes but the checkpoint expects %d; "
+                         "run without --resume to start over" % (output, size, checkpoint.output_bytes))
+
+
+# Function to run the whole job. Returns the WorkerStats report.
+def run(args):
+    input_format = batch_io.detect_format(args.input)
+    output_format = batch_io.detect_format(args.output)
+    settings = {
+        "input": os.path.abspath(args.input),
+        "input_size": os.path.getsize(args.input),
+        "input_mtime": os.path.getmtime(args.input),
+        "input_format": input_format,
+        "output_format": output_format,
+        "chunk_rows": args.chunk_rows,
+        "ordered": not args.unordered,
+        "explain": args.explain,
+    }
+    if input_format == "csv":
+        settings["chunk_bytes"] = _csv_chunk_bytes(args.input, args.chunk_rows)
+
+    checkpoint = Checkpoint(args.checkpoint or args.output + ".checkpoint.json", settings)
+    resumed = args.resume and checkpoint.load()
+    if resumed:
+        _check_resumable(args.output, output_format, checkpoint)
+
+    # Prepare the output, dropping anything written after the last checkpoint
+    output_file = None
+    if output_format == "parquet":
+        os.makedirs(args.output, exist_ok=True)
+        if not resumed:
+            for name in os.listdir(args.output):
+                if name.startswith("part-"):
+                    os.remove(os.path.join(args.output, name))
+    else:
+        output_file = open(args.output, "r+b" if resumed else "wb")
+        output_file.truncate(checkpoint.output_bytes)
+        output_file.seek(checkpoint.output_bytes)
+        if checkpoint.output_bytes == 0:
+            output_file.write(_output_header(args.input, input_format, args.explain))
+
+    stats = WorkerStats()
+    pending = {}  # chunk index -> CSV bytes waiting for earlier chunks (ordered mode)
+    next_index = min(set(range(len(checkpoint.done) + 1)) - checkpoint.done)
+    last_report = time.perf_counter()
+
+    # The data must be on disk before a checkpoint says it is
+    def write_csv(data):
+        output_file.write(data)
+        output_file.flush()
+        os.fsync(output_file.fileno())
+        checkpoint.output_bytes = output_file.tell()
+
+    def finish(index, data, rows):
+        nonlocal next_index
+        if output_file is None:
+            checkpoint.done.add(index)
+            checkpoint.rows += rows
+        elif settings["ordered"]:
+            pending[index] = (data, rows)
+            while next_index in pending:
+                data, rows = pending.pop(next_index)
+                write_csv(data)
+                checkpoint.done.add(next_index)
+                checkpoint.rows += rows
+                next_index += 1
+        else:
+            write_csv(data)
+            checkpoint.done.add(index)
+            checkpoint.rows += rows
+        checkpoint.save()
+
+    max_in_flight = args.workers * 2
+    in_flight = set()
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            for index, payload in _chunks(args, settings):
+                if index in checkpoint.done:
+                    continue
+                # Results held back for ordering count against the window too
+                while len(in_flight) + len(pending) >= max_in_flight:
+                    completed, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in completed:
+                        done_index, data, rows, seconds, pid = future.result()
+                        stats.record(pid, rows, seconds)
+                        finish(done_index, data, rows)
+                in_flight.add(pool.submit(_score_chunk, index, payload, output_format, args.output, args.explain))
+
+                if args.progress and time.perf_counter() - last_report >= args.progress:
+                    report = stats.report()
+                    print("%d rows scored, %.0f rows/s" % (report["rows"], report["rows_per_second"]),
+                          file=sys.stderr)
+                    last_report = time.perf_counter()
+
+            while in_flight:
+                completed, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in completed:
+                    done_index, data, rows, seconds, pid = future.result()
+                    stats.record(pid, rows, seconds)
+                    finish(done_index, data, rows)
+    finally:
+        if output_file is not None:
+            output_file.close()
+
+    checkpoint.remove()
+    report = stats.report()
+    report["total_rows"] = checkpoint.rows
+    report["resumed"] = bool(resumed)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a large CSV or Parquet screening file.")
+    parser.add_argument("input", help="input .csv or .parquet file")
+    parser.add_argument("output", help="output .csv file, or .parquet directory of part files")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-rows", type=int, default=config.BATCH_CHUNK_ROWS)
+    parser.add_argument("--unordered", action="store_true",
+                        help="write CSV chunks as they finish instead of in input order")
+    parser.add_argument("--explain", action="store_true",
+                        help="add a CONTRIBUTION_<feature> column per feature (Shapley contributions)")
+    parser.add_argument("--checkpoint", help="checkpoint file (default: OUTPUT.checkpoint.json)")
+    parser.add_argument("--resume", action="store_true", help="continue from an existing checkpoint")
+    parser.add_argument("--progress", type=float, default=10.0,
+                        help="seconds between progress lines on stderr (0 to disable)")
+    parser.add_argument("--report", help="also write the throughput report to this JSON file")
+    args = parser.parse_args(argv)
+
+    try:
+        report = run(args)
+    except ValueError as e:
+        print("error: %s" % e, file=sys.stderr)
+        return 1
+
+    print("Scored %d rows in %.1f s (%.0f rows/s)" % (report["rows"], report["seconds"], report["rows_per_second"]))
+    for worker in report["workers"]:
+        print("  worker %d: %d chunks, %d rows, %.0f rows/s"
+              % (worker["pid"], worker["chunks"], worker["rows"], worker["rows_per_second"]))
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+# Headless client for a running Streamlit app, for benchmarks.
+#
+# Speaks the same websocket protocol as the browser: it sends BackMsg reruns
+# with widget states and reads ForwardMsgs until the script run finishes,
+# counting the bytes and messages that went over the wire. Widgets are found
+# by label in the elements the app sends, so a benchmark can click a button or
+# pick an option the way a user would.
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+from tornado.websocket import websocket_connect
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# Function to pick a free local TCP port
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# Function to start `streamlit run app.py` headless on a port and wait until
+# it answers its health check. Returns the Popen object.
+def start_app(port, env=None, timeout=60.0, extra_args=()):
+    process = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", os.path.join(ROOT, "app.py"),
+         "--server.headless", "true", "--server.port", str(port), "--server.address", "127.0.0.1",
+         "--browser.gatherUsageStats", "false"] + list(extra_args),
+        cwd=ROOT, env=dict(os.environ, **(env or {})),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("streamlit exited with code %d" % process.returncode)
+        try:
+            with urllib.request.urlopen("http://127.0.0.1:%d/_stcore/health" % port, timeout=1) as r:
+                if r.status == 200:
+                    return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("streamlit did not become healthy within %.0f s" % timeout)
+
+
+def stop_app(process, timeout=10.0):
+    process.terminate()
+    try:
+        process.wait(timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+class RerunResult:
+    def __init__(self):
+        self.bytes = 0
+        self.messages = 0
+        self.references = 0  # messages sent as a hash reference to one the client already has
+        self.elements = 0
+        self.seconds = 0.0
+        self.status = None
+        self.exceptions = []
+
+    def as_dict(self):
+        return {
+            "bytes": self.bytes,
+            "messages": self.messages,
+            "references": self.references,
+            "elements": self.elements,
+            "seconds": self.seconds,
+            "exceptions": self.exceptions,
+        }
+
+
+class AppClient:
+    def __init__(self, url):
+        self.url = url.rstrip("/")
+        self.widgets = {}  # label -> (element type, widget proto)
+        self.states = {}  # widget id -> WidgetState to send on every rerun
+        self._ws = None
+
+    async def connect(self):
+        ws_url = self.url.replace("http://", "ws://").replace("https://", "wss://") + "/_stcore/stream"
+        self._ws = await websocket_connect(ws_url, max_message_size=200 * 1024 * 1024)
+
+    def close(self):
+        if self._ws is not None:
+            self._ws.close()
+            self._ws = None
+
+    # Function to look up a widget the app has shown, by its label
+    def widget(self, label):
+        try:
+            return self.widgets[label]
+        except KeyError:
+            raise KeyError("no widget labelled %r; seen: %s" % (label, sorted(self.widgets))) from None
+
+    # Function to list the options of a radio or selectbox, as displayed
+    def options(self, label):
+        return list(self.widget(label)[1].options)
+
+    # Function to set a widget's value for the following reruns: a displayed
+    # option (radio, selectbox), a number (slider) or True for a checkbox
+    def set_value(self, label, value):
+        kind, proto = self.widget(label)
+        state = self.states.setdefault(proto.id, WidgetState(id=proto.id))
+        if kind in ("radio", "selectbox"):
+            state.int_value = list(proto.options).index(value)
+        elif kind == "slider":
+            state.double_array_value.data[:] = [value]
+        elif kind == "checkbox":
+            state.bool_value = bool(value)
+        else:
+            raise ValueError("can't set a %s widget" % kind)
+
+    # Function to rerun the script, optionally clicking a button, and read
+    # every message up to the end of the run
+    async def rerun(self, click=None, timeout=60.0):
+        back = BackMsg()
+        back.rerun_script.query_string = ""
+        back.rerun_script.page_name = ""
+        for state in self.states.values():
+            back.rerun_script.widget_states.widgets.add().CopyFrom(state)
+        if click is not None:
+            trigger = back.rerun_script.widget_states.widgets.add()
+            trigger.id = self.widget(click)[1].id
+            trigger.trigger_value = True
+
+        result = RerunResult()
+        started = time.perf_counter()
+        await self._ws.write_message(back.SerializeToString(), binary=True)
+        deadline = started + timeout
+        while True:
+            raw = await asyncio.wait_for(self._ws.read_message(), max(deadline - time.perf_counter(), 0.001))
+            if raw is None:
+                raise ConnectionError("websocket closed during a rerun")
+            result.bytes += len(raw)
+            result.messages += 1
+            msg = ForwardMsg()
+            msg.ParseFromString(raw)
+            kind = msg.WhichOneof("type")
+            if kind == "ref_hash":
+                result.references += 1
+            elif kind == "delta" and msg.delta.WhichOneof("type") == "new_element":
+                result.elements += 1
+                element = msg.delta.new_element
+                if element.WhichOneof("type") == "exception":
+                    result.exceptions.append(element.exception.message)
+                self._track(element)
+            elif kind == "script_finished":
+                result.status = msg.script_finished
+                break
+        result.seconds = time.perf_counter() - started
+        return result
+
+    def _track(self, element):
+        kind = element.WhichOneof("type")
+        proto = getattr(element, kind)
+        label = getattr(proto, "label", None)
+        if label and getattr(proto, "id", None):
+            self.widgets[label] = (kind, proto)
@@ -0,0 +1,364 @@
+# Concurrent-session load test for app.py.
+#
+# Starts `streamlit run app.py` headless (or attaches to a running one with
+# --url) and drives N sessions at once over the browser's websocket protocol.
+# Each session loads the page, fills the three form tabs with answers drawn
+# from an input profile, clicks "Analyze Risk Factors", then explores the
+# what-if panel, with a random think time between steps, and repeats.
+#
+# The report has rerun latency percentiles and websocket bytes per step, the
+# server's CPU use and resident memory (total and per session), and the app's
+# own /metrics stage timings. Keys are stable and sorted so reports from two
+# commits can be diffed, or compared directly with --compare.
+#
+# The app's animations normally come from lottiefiles. For a deterministic
+# run that works offline, the app started here gets a fresh animation cache
+# seeded with small local stand-ins and a TTL long enough that nothing is
+# ever fetched. Images and fonts are only loaded by browsers, which this
+# client is not.
+#
+#   python benchmarks/load_test.py --sessions 20 --duration 60
+#   python benchmarks/load_test.py --sessions 50 --think-time 0 --output load.json
+#   python benchmarks/load_test.py --compare load.json --output load-new.json
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import urllib.request
+
+from app_client import ROOT, AppClient, free_port, start_app, stop_app
+
+sys.path.insert(0, ROOT)
+import assets  # noqa: E402
+
+SUBMIT = "📊 Analyze Risk Factors"
+WHATIF = "Change one answer"
+
+# Yes/No questions by label, with the share of respondents answering Yes
+DEFAULT_PROFILE = {
+    "male_rate": 0.5,
+    "age": {"mean": 58, "sd": 12, "min": 18, "max": 100},
+    "yes_rates": {
+        "Do you have any chronic diseases?": 0.5,
+        "Do you experience anxiety?": 0.5,
+        "Do you smoke?": 0.55,
+        "Yellow Fingers?": 0.55,
+        "Do you consume alcohol regularly?": 0.55,
+        "Do you experience peer pressure?": 0.5,
+        "Do you experience fatigue?": 0.65,
+        "Do you have a persistent cough?": 0.6,
+        "Do you experience shortness of breath?": 0.65,
+        "Do you have allergies?": 0.55,
+        "Do you experience wheezing?": 0.55,
+        "Do you have difficulty swallowing?": 0.5,
+        "Do you experience chest pain?": 0.55,
+    },
+    "whatif_changes": 2,  # what-if selections after each assessment
+}
+
+# Smallest payload the app accepts as a Lottie animation
+STAND_IN_ANIMATION = {"v": "5.7.4", "fr": 30, "ip": 0, "op": 60, "w": 100, "h": 100, "layers": []}
+
+
+# Function to seed an animation cache directory with local stand-ins for
+# every remote animation, named the way lottie_loader names its files
+def seed_animations(cache_dir):
+    os.makedirs(cache_dir, exist_ok=True)
+    for url in assets.ANIMATIONS.values():
+        path = os.path.join(cache_dir, hashlib.sha1(url.encode("utf-8")).hexdigest() + ".json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(STAND_IN_ANIMATION, f)
+
+
+# Function to read a profile file over the defaults
+def load_profile(path):
+    profile = json.loads(json.dumps(DEFAULT_PROFILE))
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            overrides = json.load(f)
+        for key, value in overrides.items():
+            if isinstance(value, dict) and isinstance(profile.get(key), dict):
+                profile[key].update(value)
+            else:
+                profile[key] = value
+    return profile
+
+
+# Function to draw one respondent's answers: {widget label: displayed value}
+def draw_answers(profile, rng):
+    age = profile["age"]
+    answers = {
+        "Gender": "Male" if rng.random() < profile["male_rate"] else "Female",
+        "Age": int(min(age["max"], max(age["min"], round(rng.gauss(age["mean"], age["sd"]))))),
+    }
+    for label, rate in profile["yes_rates"].items():
+        answers[label] = "Yes" if rng.random() < rate else "No"
+    return answers
+
+
+# Function to read a process's CPU seconds and resident set size from /proc.
+# Returns (None, None) where /proc is not available.
+def process_usage(pid):
+    try:
+        with open("/proc/%d/stat" % pid, "r") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open("/proc/%d/status" % pid, "r") as f:
+            rss_kb = next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+    except (OSError, StopIteration, IndexError, ValueError):
+        return None, None
+    ticks = os.sysconf("SC_CLK_TCK")
+    cpu_seconds = (int(fields[11]) + int(fields[12])) / ticks  # utime + stime
+    return cpu_seconds, rss_kb * 1024
+
+
+class Recorder:
+    def __init__(self):
+        self.steps = {}  # step name -> list of RerunResult
+        self.errors = []
+
+    def add(self, step, result):
+        self.steps.setdefault(step, []).append(result)
+        for message in result.exceptions:
+            self.errors.append({"step": step, "error": message})
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+# Function to summarize the results of one step
+def summarize(results):
+    seconds = sorted(result.seconds for result in results)
+    return {
+        "count": len(results),
+        "latency_ms": {
+            "mean": round(statistics.mean(seconds) * 1000, 2),
+            "p50": round(_percentile(seconds, 0.50) * 1000, 2),
+            "p90": round(_percentile(seconds, 0.90) * 1000, 2),
+            "p95": round(_percentile(seconds, 0.95) * 1000, 2),
+            "p99": round(_percentile(seconds, 0.99) * 1000, 2),
+            "max": round(seconds[-1] * 1000, 2),
+        },
+        "bytes_mean": round(statistics.mean(result.bytes for result in results)),
+        "bytes_total": sum(result.bytes for result in results),
+    }
+
+
+async def think(rng, mean):
+    if mean > 0:
+        await asyncio.sleep(rng.expovariate(1 / mean))
+
+
+# Function to run one simulated visitor until the deadline. Each loop is one
+# assessment: fill the tabs, submit, then try a few what-if answers.
+async def session(url, profile, think_time, deadline, seed, recorder, ready):
+    rng = random.Random(seed)
+    client = AppClient(url)
+    try:
+        await client.connect()
+        recorder.add("first_load", await client.rerun())
+        ready.set_result(None)
+        while time.monotonic() < deadline:
+            await think(rng, think_time)
+            for label, value in draw_answers(profile, rng).items():
+                client.set_value(label, value)
+            recorder.add("submit_assessment", await client.rerun(click=SUBMIT))
+            options = client.options(WHATIF) if WHATIF in client.widgets else []
+            for option in rng.sample(options, min(profile["whatif_changes"], len(options))):
+                await think(rng, think_time)
+                client.set_value(WHATIF, option)
+                recorder.add("whatif", await client.rerun())
+    except Exception as e:
+        if not ready.done():
+            ready.set_result(None)
+        recorder.errors.append({"step": "session", "error": "%s: %s" % (type(e).__name__, e)})
+    finally:
+        client.close()
+
+
+def _scrape(metrics_url):
+    try:
+        with urllib.request.urlopen(metrics_url, timeout=5) as r:
+            return r.read().decode("utf-8")
+    except OSError:
+        return None
+
+
+# Function to pull the rerun and stage timings out of the app's /metrics page
+def stage_means(text):
+    sums, counts = {}, {}
+    for line in text.splitlines():
+        for suffix, target in (("_sum", sums), ("_count", counts)):
+            for metric in ("lu_stage_seconds", "lu_rerun_seconds"):
+                if line.startswith(metric + suffix + "{"):
+                    labels, value = line[len(metric + suffix):].rsplit(" ", 1)
+                    # lu_stage_seconds_sum{stage="Scoring"} -> "stage:Scoring"
+                    target["%s:%s" % (metric[3:-8], labels.split('"')[1])] = float(value)
+    return {
+        name: {"count": int(counts[name]), "mean_ms": round(sums[name] / counts[name] * 1000, 3)}
+        for name in sorted(counts) if counts[name]
+    }
+
+
+# Function to pull the admission counters (shed, degraded, waits) out of the
+# app's /metrics page, e.g. {"shed_total{reason=\"timeout\"}": 3}
+def admission_counts(text):
+    counts = {}
+    for line in text.splitlines():
+        if line.startswith("lu_admission_") and "_bucket" not in line:
+            name, value = line.rsplit(" ", 1)
+            counts[name[len("lu_admission_"):]] = float(value)
+    return counts
+
+
+# Function to run every session against url and build the report
+async def run(url, args, profile, pid=None, metrics_url=None):
+    recorder = Recorder()
+    loop = asyncio.get_running_loop()
+    cpu_before, rss_baseline = process_usage(pid) if pid else (None, None)
+    started = time.monotonic()
+    deadline = started + args.duration
+    tasks, rss_peak = [], rss_baseline
+
+    # Open sessions at the ramp-up rate; each one only counts as started once
+    # its first page load is done
+    for i in range(args.sessions):
+        ready = loop.create_future()
+        tasks.append(asyncio.create_task(
+            session(url, profile, args.think_time, deadline, args.seed + i, recorder, ready)))
+        await ready
+        if args.ramp_up > 0:
+            await asyncio.sleep(args.ramp_up / args.sessions)
+
+    while not all(task.done() for task in tasks):
+        await asyncio.sleep(0.5)
+        if pid:
+            rss = process_usage(pid)[1]
+            if rss is not None:
+                rss_peak = max(rss_peak or 0, rss)
+    await asyncio.gather(*tasks)
+    wall = time.monotonic() - started
+    cpu_after, rss_end = process_usage(pid) if pid else (None, None)
+
+    reruns = sum(len(results) for results in recorder.steps.values())
+    metrics = _scrape(metrics_url) if metrics_url else None
+    server = None
+    if cpu_before is not None and cpu_after is not None:
+        server = {
+            "cpu_seconds": round(cpu_after - cpu_before, 3),
+            "cpu_percent": round(100 * (cpu_after - cpu_before) / wall, 1),
+            "rss_baseline_mb": round(rss_baseline / 2 ** 20, 1),
+            "rss_peak_mb": round(rss_peak / 2 ** 20, 1),
+            "rss_end_mb": round(rss_end / 2 ** 20, 1),
+            "rss_per_session_mb": round((rss_end - rss_baseline) / 2 ** 20 / args.sessions, 3),
+        }
+    return {
+        "config": {
+            "sessions": args.sessions,
+            "duration_seconds": args.duration,
+            "think_time_seconds": args.think_time,
+            "ramp_up_seconds": args.ramp_up,
+            "seed": args.seed,
+            "profile": profile,
+        },
+        "wall_seconds": round(wall, 2),
+        "reruns": reruns,
+        "reruns_per_second": round(reruns / wall, 2),
+        "websocket_bytes": sum(result.bytes for results in recorder.steps.values() for result in results),
+        "steps": {step: summarize(results) for step, results in sorted(recorder.steps.items())},
+        "server": server,
+        "server_stages": stage_means(metrics) if metrics else None,
+        "server_admission": admission_counts(metrics) if metrics else None,
+        "errors": recorder.errors,
+    }
+
+
+# Function to list latency and byte changes between two reports
+def compare(old, new):
+    lines = []
+    for step in sorted(set(old["steps"]) | set(new["steps"])):
+        a, b = old["steps"].get(step), new["steps"].get(step)
+        if a is None or b is None:
+            lines.append("%-18s only in the %s report" % (step, "new" if a is None else "old"))
+            continue
+        for key in ("p50", "p95", "p99"):
+            before, after = a["latency_ms"][key], b["latency_ms"][key]
+            change = (after - before) / before * 100 if before else 0.0
+            lines.append("%-18s %-4s %9.1f ms -> %9.1f ms  %+6.1f%%" % (step, key, before, after, change))
+        lines.append("%-18s %-4s %9d B  -> %9d B" % (step, "size", a["bytes_mean"], b["bytes_mean"]))
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Drive many concurrent sessions through app.py.")
+    parser.add_argument("--url", help="running app to test (stand-ins and server stats are then not set up)")
+    parser.add_argument("--sessions", type=int, default=10, help="concurrent sessions")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds each session keeps going")
+    parser.add_argument("--think-time", type=float, default=1.0,
+                        help="mean seconds between a session's actions (exponential); 0 for none")
+    parser.add_argument("--ramp-up", type=float, default=5.0, help="seconds over which sessions are opened")
+    parser.add_argument("--profile", help="JSON file overriding the input distribution (see DEFAULT_PROFILE)")
+    parser.add_argument("--seed", type=int, default=1, help="random seed; session i uses seed + i")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--compare", help="earlier report to compare latencies and bytes with")
+    args = parser.parse_args(argv)
+    profile = load_profile(args.profile)
+
+    if args.url:
+        report = asyncio.run(run(args.url, args, profile))
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            seed_animations(os.path.join(tmp, "lottie"))
+            port, metrics_port = free_port(), free_port()
+            env = {
+                "LU_LOTTIE_CACHE_DIR": os.path.join(tmp, "lottie"),
+                "LU_LOTTIE_TTL": str(10 * 365 * 24 * 3600),
+                "LU_DATA_DIR": os.path.join(tmp, "data"),
+                "LU_METRICS_PORT": str(metrics_port),
+                # Every simulated session connects from 127.0.0.1, which the
+                # per-client rate limit would treat as one very busy client
+                "LU_ADMISSION_RATE_PER_MINUTE": "0",
+            }
+            process = start_app(port, env=env)
+            try:
+                report = asyncio.run(run("http://127.0.0.1:%d" % port, args, profile, pid=process.pid,
+                                         metrics_url="http://127.0.0.1:%d/metrics" % metrics_port))
+            finally:
+                stop_app(process)
+
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+    print("%d sessions, %d reruns in %.1f s (%.1f/s), %d errors"
+          % (args.sessions, report["reruns"], report["wall_seconds"], report["reruns_per_second"],
+             len(report["errors"])))
+    for step, summary in report["steps"].items():
+        latency = summary["latency_ms"]
+        print("  %-18s n=%-5d p50 %7.1f ms  p95 %7.1f ms  p99 %7.1f ms  %7d B"
+              % (step, summary["count"], latency["p50"], latency["p95"], latency["p99"], summary["bytes_mean"]))
+    if report["server"]:
+        server = report["server"]
+        print("  server: %.0f%% CPU, RSS %.1f -> %.1f MB (peak %.1f), %.2f MB per session"
+              % (server["cpu_percent"], server["rss_baseline_mb"], server["rss_end_mb"], server["rss_peak_mb"],
+                 server["rss_per_session_mb"]))
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            for line in compare(json.load(f), report):
+                print("  " + line)
+    for error in report["errors"][:10]:
+        print("ERROR in %s: %s" % (error["step"], error["error"]), file=sys.stderr)
+    return 1 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,341 @@
+# Micro-benchmarks for the hot paths, with regression budgets.
+#
+# Times scoring, the lookup table, recommendations, explanations, what-if
+# sweeps, figure building and the animation loader in-process. Functions that
+# take a batch run at every size from 1 to 10^6 rows; the others run once per
+# call. Each result is the best per-call time over --repeat rounds, where a
+# round repeats the call until it has run for at least --min-time seconds.
+#
+# micro_baseline.json stores a time for each benchmark and size, a relative
+# tolerance and an absolute floor. A result fails the run when it is slower
+# than both baseline * (1 + tolerance) and baseline + floor; the floor keeps
+# microsecond-scale benchmarks from failing on scheduler noise alone.
+# --update-baseline records the current results instead. Baselines are only
+# comparable on the machine they were recorded on.
+#
+# Everything runs against the mock model with a scratch cache directory, and
+# the animation loader fetches from a local HTTP stub rather than lottiefiles.
+#
+#   python benchmarks/micro.py
+#   python benchmarks/micro.py --max-rows 10000 --only scoring
+#   python benchmarks/micro.py --output micro.json
+#   python benchmarks/micro.py --update-baseline
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "micro_baseline.json")
+ROW_SIZES = (1, 10, 100, 1000, 10000, 100000, 1000000)
+DEFAULT_TOLERANCE = 0.5
+DEFAULT_FLOOR_SECONDS = 50e-6
+
+STUB_ANIMATION = json.dumps({"v": "5.7.4", "fr": 30, "ip": 0, "op": 60, "w": 100, "h": 100,
+                             "layers": [{"ty": 4, "ind": i} for i in range(50)]}).encode("utf-8")
+
+
+# Function to make n random, valid form answers as columns, the shape
+# encode() receives from a batch file
+def random_columns(n, seed=0):
+    import scoring
+
+    rng = np.random.default_rng(seed)
+    columns = {
+        "GENDER": np.where(rng.random(n) < 0.5, "M", "F"),
+        "AGE": rng.integers(18, 101, n),
+    }
+    for name in scoring.FEATURES[2:]:
+        columns[name] = rng.integers(1, 3, n)
+    return columns
+
+
+def random_features(n, seed=0):
+    import scoring
+
+    return scoring.encode(random_columns(n, seed))
+
+
+# Function to answer every GET with the stub animation
+class _StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(STUB_ANIMATION)))
+        self.end_headers()
+        self.wfile.write(STUB_ANIMATION)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# Benchmark setups. Each takes a row count and returns the function to time;
+# inputs are built here, outside the timed call.
+
+def bench_encode(n):
+    import scoring
+
+    columns = random_columns(n)
+    return lambda: scoring.encode(columns)
+
+
+def bench_model_probability(n):
+    import scoring
+
+    features, model = random_features(n), scoring.active_model()
+    return lambda: scoring.model_probability(features, model)
+
+
+def bench_score_features(n):
+    import scoring
+
+    features = random_features(n)
+    return lambda: scoring.score_features(features)
+
+
+def bench_score_one(n):
+    import scoring
+
+    record = {name: values[0].item() for name, values in random_columns(1).items()}
+    return lambda: scoring.score_one(record)
+
+
+def bench_recommend(n):
+    import recommendations
+
+    features = random_features(1)
+    return lambda: recommendations.recommend(features)
+
+
+def bench_recommendation_text(n):
+    import recommendations
+
+    features = random_features(n)
+    return lambda: recommendations.recommendation_text(features)
+
+
+def bench_recommendation_lists(n):
+    import recommendations
+
+    features = random_features(n)
+    return lambda: recommendations.recommendation_lists(features)
+
+
+def bench_explain_features(n):
+    import explain
+
+    features = random_features(n)
+    return lambda: explain.explain_features(features)
+
+
+def bench_whatif_sweep(n):
+    import scoring
+    import whatif
+
+    # Call the uncached sweep; the app's cache would answer every repeat
+    row, model = tuple(random_features(1)[0].tolist()), scoring.active_model()
+    return lambda: whatif._sweep.__wrapped__(model, row)
+
+
+def bench_contribution_chart(n):
+    import explain
+    import figures
+
+    features = random_features(1)
+    input_data = {name: values[0].item() for name, values in random_columns(1).items()}
+    explanation = explain.explain(features)
+    items = tuple(sorted(
+        ((figures.feature_label(name, input_data[name]), round(value * 100, 2))
+         for name, value in explanation["contributions"].items() if value != 0),
+        key=lambda item: item[1],
+    ))
+    return lambda: figures.to_spec(figures.create_signed_bar_chart(items, "Contribution (pp)"))
+
+
+def bench_gauge_chart(n):
+    import figures
+
+    return lambda: figures.to_spec(figures.create_gauge_chart(0.42))
+
+
+def bench_lottie_fetch(n):
+    import lottie_loader
+
+    server = start_stub()
+    url = "http://127.0.0.1:%d/animation.json" % server.server_address[1]
+    counter = iter(range(10 ** 9))
+
+    # A new URL every call: a cache miss, fetched from the stub and written to disk
+    def run():
+        return lottie_loader.load_lottieurl("%s?%d" % (url, next(counter)), deadline=10)
+    return run
+
+
+def bench_lottie_cached(n):
+    import lottie_loader
+
+    server = start_stub()
+    url = "http://127.0.0.1:%d/animation.json" % server.server_address[1]
+    lottie_loader.load_lottieurl(url, deadline=10)
+    return lambda: lottie_loader.load_lottieurl(url)
+
+
+# name -> (setup, sizes). Sizes of None mean the function handles one record.
+BENCHMARKS = {
+    "scoring.encode": (bench_encode, ROW_SIZES),
+    "scoring.model_probability": (bench_model_probability, ROW_SIZES),
+    "scoring.score_features": (bench_score_features, ROW_SIZES),
+    "scoring.score_one": (bench_score_one, None),
+    "recommendations.recommend": (bench_recommend, None),
+    "recommendations.recommendation_text": (bench_recommendation_text, ROW_SIZES),
+    "recommendations.recommendation_lists": (bench_recommendation_lists, ROW_SIZES),
+    "explain.explain_features": (bench_explain_features, ROW_SIZES),
+    "whatif.sweep": (bench_whatif_sweep, None),
+    "figures.contribution_chart": (bench_contribution_chart, None),
+    "figures.gauge_chart": (bench_gauge_chart, None),
+    "lottie_loader.fetch": (bench_lottie_fetch, None),
+    "lottie_loader.cached": (bench_lottie_cached, None),
+}
+
+
+# Function to time fn: the best per-call time over several rounds
+def measure(fn, repeat, min_time):
+    fn()  # warm up caches and lazy imports
+    best = float("inf")
+    for _ in range(repeat):
+        calls, started = 0, time.perf_counter()
+        while True:
+            fn()
+            calls += 1
+            elapsed = time.perf_counter() - started
+            if elapsed >= min_time:
+                break
+        best = min(best, elapsed / calls)
+    return best
+
+
+# Function to run the selected benchmarks. Returns {"name[rows]": result}.
+def run(names, max_rows, repeat, min_time, log=None):
+    results = {}
+    for name in names:
+        setup, sizes = BENCHMARKS[name]
+        for rows in [size for size in sizes if size <= max_rows] if sizes else [1]:
+            key = "%s[%d]" % (name, rows) if sizes else name
+            seconds = measure(setup(rows), repeat, min_time)
+            results[key] = {"rows": rows, "seconds": seconds, "rows_per_second": rows / seconds}
+            if log is not None:
+                log("%-48s %12.3f us  %14.0f rows/s" % (key, seconds * 1e6, rows / seconds))
+    return results
+
+
+# Function to check results against the baseline. Returns a list of problems.
+def check(results, baseline):
+    problems = []
+    default = baseline.get("tolerance", DEFAULT_TOLERANCE)
+    floor = baseline.get("floor_seconds", DEFAULT_FLOOR_SECONDS)
+    for key, result in results.items():
+        entry = baseline.get("benchmarks", {}).get(key)
+        if entry is None:
+            continue
+        tolerance = entry.get("tolerance", default)
+        limit = max(entry["seconds"] * (1 + tolerance), entry["seconds"] + floor)
+        result["baseline_seconds"] = entry["seconds"]
+        result["change"] = result["seconds"] / entry["seconds"] - 1
+        if result["seconds"] > limit:
+            problems.append("%s took %.3f us, baseline is %.3f us (limit %.3f us: +%d%% or +%.0f us)"
+                            % (key, result["seconds"] * 1e6, entry["seconds"] * 1e6, limit * 1e6,
+                               tolerance * 100, floor * 1e6))
+    return problems
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the hot paths and check them against a baseline.")
+    parser.add_argument("--only", action="append", default=[],
+                        help="run benchmarks whose name starts with this (repeatable)")
+    parser.add_argument("--max-rows", type=int, default=ROW_SIZES[-1], help="largest batch size to run")
+    parser.add_argument("--repeat", type=int, default=5, help="rounds per benchmark; the best is kept")
+    parser.add_argument("--min-time", type=float, default=0.1, help="minimum seconds per round")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline file to check against")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="store these results as the new baseline instead of checking them")
+    parser.add_argument("--output", help="write the JSON results to this file")
+    args = parser.parse_args(argv)
+
+    names = [name for name in BENCHMARKS if not args.only or any(name.startswith(p) for p in args.only)]
+    if not names:
+        parser.error("no benchmark matches %s" % ", ".join(args.only))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Set before the app's modules are imported, so config picks them up
+        os.environ.update({
+            "LU_MODEL_BACKEND": "mock",
+            "LU_CACHE_DIR": os.path.join(tmp, "cache"),
+            "LU_DATA_DIR": os.path.join(tmp, "data"),
+        })
+        sys.path.insert(0, ROOT)
+        import lookup_table
+
+        # Score through the lookup table, as deployed workers do after start.sh
+        lookup_table.build()
+        results = run(names, args.max_rows, args.repeat, args.min_time, log=print)
+
+    report = {
+        "commit": _git_commit(),
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "timestamp": time.time(),
+        "repeat": args.repeat,
+        "min_time": args.min_time,
+        "results": results,
+    }
+
+    if args.update_baseline:
+        baseline = {"tolerance": DEFAULT_TOLERANCE, "floor_seconds": DEFAULT_FLOOR_SECONDS, "benchmarks": {}}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                baseline = json.load(f)
+        for key, result in results.items():
+            entry = baseline["benchmarks"].setdefault(key, {})
+            entry["seconds"] = float("%.4g" % result["seconds"])
+        baseline["benchmarks"] = dict(sorted(baseline["benchmarks"].items()))
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2)
+            f.write("\n")
+        problems = []
+        print("baseline updated: %s" % args.baseline)
+    else:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            problems = check(results, json.load(f))
+    report["problems"] = problems
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    for problem in problems:
+        print("FAIL: %s" % problem, file=sys.stderr)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
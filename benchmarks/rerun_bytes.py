@@ -0,0 +1,64 @@
+# Measure the websocket bytes the app sends per rerun.
+#
+# Drives one headless session through a typical visit: first load, a rerun
+# with nothing changed, submitting the assessment form, then two what-if
+# selections. Prints one JSON report with bytes, messages and cache
+# references per step.
+#
+#   python benchmarks/rerun_bytes.py                        # starts its own app
+#   python benchmarks/rerun_bytes.py --url http://localhost:10000
+import argparse
+import asyncio
+import json
+import sys
+
+from app_client import AppClient, free_port, start_app, stop_app
+
+SUBMIT = "📊 Analyze Risk Factors"
+WHATIF = "Change one answer"
+
+
+async def measure(url):
+    client = AppClient(url)
+    await client.connect()
+    steps = []
+    try:
+        steps.append(("first_load", await client.rerun()))
+        steps.append(("rerun_unchanged", await client.rerun()))
+        steps.append(("submit_assessment", await client.rerun(click=SUBMIT)))
+        for i, option in enumerate(client.options(WHATIF)[:2], start=1):
+            client.set_value(WHATIF, option)
+            steps.append(("whatif_%d" % i, await client.rerun()))
+    finally:
+        client.close()
+    return {name: result.as_dict() for name, result in steps}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure websocket bytes per rerun.")
+    parser.add_argument("--url", help="running app to measure; by default a fresh one is started")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    process = None
+    url = args.url
+    if url is None:
+        port = free_port()
+        process = start_app(port)
+        url = "http://127.0.0.1:%d" % port
+    try:
+        report = asyncio.run(measure(url))
+    finally:
+        if process is not None:
+            stop_app(process)
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    return 1 if any(step["exceptions"] for step in report.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+# Cold-start benchmark: how long a fresh worker takes to import everything
+# and finish its first script run, and which modules that time goes to.
+#
+# Each sample is a new interpreter that runs app.py once in bare mode under
+# `python -X importtime`, after one warm-up run. The report has the median
+# wall time, the time spent after `import streamlit` (the part this app
+# controls) and per-package import cost, summed over every module of the
+# package whoever imported it.
+# startup_budget.json holds the budget: the run fails when the app's own
+# startup time is over budget or when a module that should load lazily is
+# imported on the first run.
+#
+#   python benchmarks/startup.py
+#   python benchmarks/startup.py --samples 10 --output startup.json
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "startup_budget.json")
+
+# Runs in the child interpreter: time `import streamlit`, then one bare-mode
+# run of the app with no buttons pressed
+CHILD = """
+import json, runpy, sys, time
+started = time.perf_counter()
+import streamlit
+imported = time.perf_counter()
+sys.argv = ["app.py"]
+runpy.run_path("app.py", run_name="__main__")
+finished = time.perf_counter()
+print(json.dumps({"streamlit_seconds": imported - started, "app_seconds": finished - imported,
+                  "modules": sorted(sys.modules)}))
+"""
+
+IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+# Function to parse `-X importtime` output into {module: (self us, cumulative us)}
+def parse_importtime(text):
+    modules = {}
+    for line in text.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match:
+            modules[match.group(4)] = (int(match.group(1)), int(match.group(2)))
+    return modules
+
+
+# Function to run one cold start in a fresh interpreter
+def sample(env):
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD],
+        cwd=ROOT, env=dict(os.environ, **env), capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError("cold start failed:\n%s" % result.stderr[-2000:])
+    child = json.loads(result.stdout.strip().splitlines()[-1])
+    child["wall_seconds"] = wall
+    child["imports"] = parse_importtime(result.stderr)
+    return child
+
+
+# Function to collect several samples into one report. A first, uncounted
+# run fills the on-disk caches the way start.sh and earlier workers would on
+# a deployed host.
+def measure(samples):
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {
+            # Keep the assessment log and stored charts of the runs out of the tree
+            "LU_DATA_DIR": os.path.join(tmp, "data"),
+            "LU_FIGURE_SPEC_DIR": os.path.join(tmp, "figures"),
+            # Don't let remote animation fetches make the numbers depend on the network
+            "LU_LOTTIE_DEADLINE": "0",
+        }
+        sample(env)
+        runs = [sample(env) for _ in range(samples)]
+
+    package_ms = defaultdict(list)
+    for run in runs:
+        totals = defaultdict(int)
+        for name, (self_us, _) in run["imports"].items():
+            totals[name.split(".")[0]] += self_us
+        for package, us in totals.items():
+            package_ms[package].append(us / 1000)
+
+    last = runs[-1]
+    own = [name for name in last["imports"] if os.path.exists(os.path.join(ROOT, name.split(".")[0] + ".py"))]
+    return {
+        "samples": samples,
+        "python": sys.version.split()[0],
+        "wall_seconds": statistics.median(run["wall_seconds"] for run in runs),
+        "streamlit_seconds": statistics.median(run["streamlit_seconds"] for run in runs),
+        "app_seconds": statistics.median(run["app_seconds"] for run in runs),
+        "packages_ms": dict(sorted(
+            ((package, round(statistics.median(values), 2)) for package, values in package_ms.items()),
+            key=lambda item: -item[1],
+        )),
+        "app_modules_ms": {name: round(last["imports"][name][1] / 1000, 2) for name in sorted(own)},
+        "loaded_modules": last["modules"],
+    }
+
+
+# Function to check a report against the budget. Returns a list of problems.
+def check(report, budget):
+    problems = []
+    limit = budget["app_seconds"] * (1 + budget["tolerance"])
+    if report["app_seconds"] > limit:
+        problems.append("app startup took %.3f s, budget is %.3f s (+%d%%)"
+                        % (report["app_seconds"], budget["app_seconds"], budget["tolerance"] * 100))
+    loaded = set(report["loaded_modules"])
+    for name in budget["lazy_modules"]:
+        if name in loaded:
+            problems.append("%s was imported on the first run; it should load lazily" % name)
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure cold-start time and per-package import cost.")
+    parser.add_argument("--samples", type=int, default=5, help="fresh interpreters to run")
+    parser.add_argument("--top", type=int, default=15, help="packages to list")
+    parser.add_argument("--output", help="write the full JSON report to this file")
+    parser.add_argument("--budget", default=BUDGET_PATH, help="budget file to check against")
+    args = parser.parse_args(argv)
+
+    report = measure(args.samples)
+    with open(args.budget, "r", encoding="utf-8") as f:
+        budget = json.load(f)
+    report["budget"] = budget
+    report["problems"] = check(report, budget)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    print("cold start %.3f s: streamlit %.3f s, app %.3f s (budget %.3f s), median of %d"
+          % (report["wall_seconds"], report["streamlit_seconds"], report["app_seconds"],
+             budget["app_seconds"], args.samples))
+    for package, ms in list(report["packages_ms"].items())[:args.top]:
+        print("  %8.1f ms  %s" % (ms, package))
+    for problem in report["problems"]:
+        print("FAIL: %s" % problem, file=sys.stderr)
+    return 1 if report["problems"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
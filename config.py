@@ -0,0 +1,134 @@
+import os
+
+
+# Helper functions to read settings from environment variables
+def env_str(name, default):
+    return os.environ.get(name, default)
+
+
+def env_int(name, default):
+    value = os.environ.get(name)
+    if value is None or value.strip() == "":
+        return default
+    return int(value)
+
+
+def env_float(name, default):
+    value = os.environ.get(name)
+    if value is None or value.strip() == "":
+        return default
+    return float(value)
+
+
+def env_bool(name, default):
+    value = os.environ.get(name)
+    if value is None or value.strip() == "":
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = env_str("LU_CACHE_DIR", os.path.join(BASE_DIR, ".cache"))
+DATA_DIR = env_str("LU_DATA_DIR", os.path.join(BASE_DIR, "data"))
+
+# Lottie animation loader
+LOTTIE_CACHE_DIR = env_str("LU_LOTTIE_CACHE_DIR", os.path.join(CACHE_DIR, "lottie"))
+LOTTIE_TTL = env_float("LU_LOTTIE_TTL", 24 * 60 * 60)  # seconds before a cached animation is refreshed
+LOTTIE_TIMEOUT = env_float("LU_LOTTIE_TIMEOUT", 3.0)  # per-request timeout in seconds
+LOTTIE_FAILURE_TTL = env_float("LU_LOTTIE_FAILURE_TTL", 60.0)  # seconds before retrying a failed URL
+LOTTIE_DEADLINE = env_float("LU_LOTTIE_DEADLINE", 2.0)  # max time a page waits for all animations
+LOTTIE_STALE_WHILE_REVALIDATE = env_bool("LU_LOTTIE_STALE_WHILE_REVALIDATE", True)
+LOTTIE_MAX_WORKERS = env_int("LU_LOTTIE_MAX_WORKERS", 4)
+
+# Assessment progress display. Turn off in production to skip the progress bar
+# and per-stage timing caption entirely.
+PROGRESS_ANIMATION = env_bool("LU_PROGRESS_ANIMATION", True)
+
+# Precomputed risk table (built with `python lookup_table.py build`)
+LOOKUP_TABLE_PATH = env_str("LU_LOOKUP_TABLE", os.path.join(CACHE_DIR, "risk_table.npy"))
+LOOKUP_TABLE_ENABLED = env_bool("LU_LOOKUP_TABLE_ENABLED", True)
+LOOKUP_TABLE_RELOAD_INTERVAL = env_float("LU_LOOKUP_TABLE_RELOAD_INTERVAL", 5.0)  # seconds between table file checks
+
+# Batch file scoring
+BATCH_CHUNK_ROWS = env_int("LU_BATCH_CHUNK_ROWS", 50000)
+BATCH_CACHE_DIR = env_str("LU_BATCH_CACHE_DIR", os.path.join(CACHE_DIR, "batch"))
+BATCH_CACHE_MAX_ENTRIES = env_int("LU_BATCH_CACHE_MAX_ENTRIES", 20)
+
+# HTTP scoring API (api.py)
+API_PORT = env_int("LU_API_PORT", 10001)
+API_BATCH_WINDOW_MS = env_float("LU_API_BATCH_WINDOW_MS", 2.0)  # micro-batching window
+API_MAX_MICRO_BATCH = env_int("LU_API_MAX_MICRO_BATCH", 256)
+API_MAX_BATCH_RECORDS = env_int("LU_API_MAX_BATCH_RECORDS", 100000)
+API_INLINE_BATCH_ROWS = env_int("LU_API_INLINE_BATCH_ROWS", 1000)  # bigger batches run off the event loop
+API_MAX_BODY_BYTES = env_int("LU_API_MAX_BODY_BYTES", 64 * 1024 * 1024)
+API_KEEP_ALIVE_TIMEOUT = env_float("LU_API_KEEP_ALIVE_TIMEOUT", 75.0)
+
+# Plotly figure cache (pre-serialized figure JSON)
+FIGURE_CACHE_MAX_ENTRIES = env_int("LU_FIGURE_CACHE_MAX_ENTRIES", 512)
+FIGURE_SPEC_DIR = env_str("LU_FIGURE_SPEC_DIR", os.path.join(CACHE_DIR, "figures"))  # static charts kept across restarts
+# Specs shared by every worker process through files under FIGURE_SPEC_DIR/shared (launcher.py turns this on)
+FIGURE_SHARED_CACHE = env_bool("LU_FIGURE_SHARED_CACHE", False)
+FIGURE_SHARED_MAX_ENTRIES = env_int("LU_FIGURE_SHARED_MAX_ENTRIES", 20000)
+
+# Model backend (models.py): "auto" uses the published model in MODEL_DIR and
+# falls back to the mock model; "mock" or "logistic" force one backend
+MODEL_BACKEND = env_str("LU_MODEL_BACKEND", "auto")
+MODEL_DIR = env_str("LU_MODEL_DIR", os.path.join(BASE_DIR, "model"))
+MODEL_RELOAD_INTERVAL = env_float("LU_MODEL_RELOAD_INTERVAL", 5.0)  # seconds between version file checks
+
+# Per-feature explanations (explain.py)
+EXPLAIN_CACHE_MAX_ENTRIES = env_int("LU_EXPLAIN_CACHE_MAX_ENTRIES", 4096)
+
+# What-if sweeps (whatif.py)
+WHATIF_CACHE_MAX_ENTRIES = env_int("LU_WHATIF_CACHE_MAX_ENTRIES", 1024)
+
+# Population percentile index (built with `python percentiles.py build cohort.csv`)
+PERCENTILE_INDEX_PATH = env_str("LU_PERCENTILE_INDEX", os.path.join(CACHE_DIR, "percentiles.npy"))
+PERCENTILE_MIN_GROUP_SIZE = env_int("LU_PERCENTILE_MIN_GROUP_SIZE", 30)  # smaller groups show no group percentile
+PERCENTILE_RELOAD_INTERVAL = env_float("LU_PERCENTILE_RELOAD_INTERVAL", 10.0)  # seconds between checks for an updated index file
+PERCENTILE_ADD_ASSESSMENTS = env_bool("LU_PERCENTILE_ADD_ASSESSMENTS", True)  # add logged UI assessments to the loaded index
+
+# Assessment log (assessment_log.py): buffered in memory, written to SQLite
+ASSESSMENT_LOG_ENABLED = env_bool("LU_ASSESSMENT_LOG_ENABLED", True)
+ASSESSMENT_LOG_PATH = env_str("LU_ASSESSMENT_LOG", os.path.join(DATA_DIR, "assessments.db"))
+ASSESSMENT_LOG_CAPACITY = env_int("LU_ASSESSMENT_LOG_CAPACITY", 100000)  # records buffered before the oldest are dropped
+ASSESSMENT_LOG_BATCH_SIZE = env_int("LU_ASSESSMENT_LOG_BATCH_SIZE", 500)  # records per write transaction
+ASSESSMENT_LOG_MAX_BATCH_ROWS = env_int("LU_ASSESSMENT_LOG_MAX_BATCH_ROWS", 1000)  # larger scored batches log an even sample of this many rows
+ASSESSMENT_LOG_FLUSH_INTERVAL = env_float("LU_ASSESSMENT_LOG_FLUSH_INTERVAL", 2.0)  # max seconds a record waits
+
+# Vendored fonts, images and animations (built with `python assets.py build`).
+# Streamlit serves STATIC_DIR at app/static/ when server.enableStaticServing is on.
+STATIC_DIR = os.path.join(BASE_DIR, "static")
+ASSET_TIMEOUT = env_float("LU_ASSET_TIMEOUT", 15.0)  # per-download timeout in seconds
+ASSET_OFFLINE = env_bool("LU_OFFLINE", False)  # never download assets; use what is vendored
+
+# Metrics (metrics.py): Prometheus text at http://METRICS_ADDRESS:METRICS_PORT/metrics
+METRICS_ENABLED = env_bool("LU_METRICS_ENABLED", True)
+METRICS_PORT = env_int("LU_METRICS_PORT", 10002)  # 0 turns the /metrics endpoint off
+METRICS_ADDRESS = env_str("LU_METRICS_ADDRESS", "127.0.0.1")
+METRICS_TRACE_SAMPLE_RATE = env_float("LU_METRICS_TRACE_SAMPLE_RATE", 0.0)  # fraction of reruns dumped as traces
+METRICS_TRACE_DIR = env_str("LU_METRICS_TRACE_DIR", os.path.join(DATA_DIR, "traces"))
+
+# Multi-worker launcher (launcher.py)
+LAUNCHER_WORKERS = env_int("LU_WORKERS", os.cpu_count() or 1)
+LAUNCHER_WORKER_PORT = env_int("LU_WORKER_PORT", 10100)  # first worker port; each worker's metrics are 1000 higher
+LAUNCHER_HEALTH_INTERVAL = env_float("LU_WORKER_HEALTH_INTERVAL", 5.0)  # seconds between health checks
+LAUNCHER_HEALTH_FAILURES = env_int("LU_WORKER_HEALTH_FAILURES", 3)  # failed checks in a row before a restart
+LAUNCHER_MAX_WORKER_AGE = env_float("LU_WORKER_MAX_AGE", 0.0)  # seconds before a worker is recycled, 0 = never
+LAUNCHER_MAX_WORKER_RSS_MB = env_float("LU_WORKER_MAX_RSS_MB", 0.0)  # MB before a worker is recycled, 0 = never
+LAUNCHER_DRAIN_TIMEOUT = env_float("LU_WORKER_DRAIN_TIMEOUT", 300.0)  # seconds a recycled worker keeps its sessions
+LAUNCHER_MAX_BODY_BYTES = env_int("LU_LAUNCHER_MAX_BODY_BYTES", 0)  # largest proxied request, 0 = Streamlit's server.maxUploadSize
+
+# Admission control for analyses (admission.py)
+ADMISSION_MAX_ACTIVE = env_int("LU_ADMISSION_MAX_ACTIVE", os.cpu_count() or 1)  # analyses running at once
+ADMISSION_MAX_QUEUE = env_int("LU_ADMISSION_MAX_QUEUE", 50)  # waiting analyses before new ones are shed
+ADMISSION_QUEUE_TIMEOUT = env_float("LU_ADMISSION_QUEUE_TIMEOUT", 20.0)  # max seconds an analysis waits
+ADMISSION_DEGRADE_QUEUE_DEPTH = env_int("LU_ADMISSION_DEGRADE_QUEUE_DEPTH", 1)  # queue depth that skips optional charts, 0 = never
+ADMISSION_RATE_PER_MINUTE = env_float("LU_ADMISSION_RATE_PER_MINUTE", 12.0)  # per client, 0 = unlimited
+ADMISSION_BURST = env_int("LU_ADMISSION_BURST", 5)
+
+# Per-session memory (session_memory.py) and the admin sessions view
+SESSION_SWEEP_INTERVAL = env_float("LU_SESSION_SWEEP_INTERVAL", 60.0)  # seconds between sweeps, 0 = off
+SESSION_IDLE_COMPACT = env_float("LU_SESSION_IDLE_COMPACT", 900.0)  # idle seconds before uploads and cached messages are released, 0 = never
+SESSION_IDLE_EVICT = env_float("LU_SESSION_IDLE_EVICT", 0.0)  # idle seconds before a session is closed, 0 = never
+ADMIN_TOKEN = env_str("LU_ADMIN_TOKEN", "")  # ?admin=<token> shows the Sessions view; empty turns it off
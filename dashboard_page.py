@@ -0,0 +1,104 @@
+# Analytics dashboard over the logged assessments. Reads only the aggregate
+# tables maintained by analytics.py, never the raw log.
+import time
+
+import pandas as pd
+import plotly.express as px
+import streamlit as st
+
+import analytics
+import percentiles
+from batch_page import BAND_COLORS
+
+# Label -> (days shown, bucket granularity)
+RANGES = {
+    "Last 24 hours": (1, "hour"),
+    "Last 7 days": (7, "hour"),
+    "Last 30 days": (30, "day"),
+    "Last 365 days": (365, "day"),
+}
+
+CHART_LAYOUT = dict(
+    height=320,
+    margin=dict(l=20, r=20, t=30, b=20),
+    paper_bgcolor="rgba(0,0,0,0)",
+    plot_bgcolor="rgba(0,0,0,0)",
+    font=dict(family="Poppins", size=12, color="#1E3A8A")
+)
+
+
+def _label(name):
+    return name.replace("_", " ").capitalize()
+
+
+# Function to render the analytics dashboard page
+def render_dashboard():
+    st.markdown("""
+    <div class="card">
+        <h2>Assessment Analytics</h2>
+        <p>Risk level mix, factor prevalence and recommendation frequency across all logged assessments.</p>
+    </div>
+    """, unsafe_allow_html=True)
+
+    control_cols = st.columns(2)
+    range_label = control_cols[0].selectbox("Period", list(RANGES), index=1)
+    age_choice = control_cols[1].selectbox("Age band", ["All ages"] + percentiles.AGE_BANDS)
+    days, granularity = RANGES[range_label]
+    age_band = None if age_choice == "All ages" else percentiles.AGE_BANDS.index(age_choice)
+    bucket_seconds = analytics.GRANULARITIES[granularity]
+    since = int((time.time() - days * 86400) // bucket_seconds * bucket_seconds)
+
+    connection = analytics.connect_readonly()
+    if connection is None:
+        st.info("No assessments have been logged yet.")
+        return
+    try:
+        levels = pd.DataFrame(analytics.risk_level_counts(connection, granularity, since, age_band),
+                              columns=["bucket", "Risk Level", "Assessments"])
+        factors = pd.DataFrame(analytics.factor_counts(connection, granularity, since, age_band),
+                               columns=["factor", "Yes"])
+        rules = pd.DataFrame(analytics.recommendation_counts(connection, granularity, since, age_band),
+                             columns=["bucket", "rule_id", "Matches"])
+    finally:
+        connection.close()
+
+    if levels.empty:
+        st.info("No assessments in this period.")
+        return
+
+    levels["Time"] = pd.to_datetime(levels["bucket"], unit="s")
+    totals = levels.groupby("bucket")["Assessments"].sum()
+    total = int(totals.sum())
+    by_level = levels.groupby("Risk Level")["Assessments"].sum()
+
+    metric_cols = st.columns(4)
+    metric_cols[0].metric("Assessments", f"{total:,}")
+    for col, level in zip(metric_cols[1:], ["Low", "Medium", "High"]):
+        col.metric(f"{level} Risk", f"{by_level.get(level, 0) / total:.1%}")
+
+    st.subheader("📊 Risk Level Mix")
+    fig = px.bar(levels, x="Time", y="Assessments", color="Risk Level", color_discrete_map=BAND_COLORS,
+                 category_orders={"Risk Level": ["Low", "Medium", "High"]})
+    fig.update_layout(**CHART_LAYOUT)
+    st.plotly_chart(fig, use_container_width=True)
+
+    st.subheader("🚬 Factor Prevalence")
+    factors["Factor"] = factors["factor"].map(_label)
+    factors["Prevalence (%)"] = factors["Yes"] / total * 100
+    factors = factors.sort_values("Prevalence (%)")
+    fig = px.bar(factors, x="Prevalence (%)", y="Factor", orientation="h",
+                 text=factors["Prevalence (%)"].map("{:.1f}%".format))
+    fig.update_traces(marker_color="#1E3A8A")
+    fig.update_layout(**dict(CHART_LAYOUT, height=420))
+    st.plotly_chart(fig, use_container_width=True)
+
+    st.subheader("🩺 Recommendation Frequency")
+    if rules.empty:
+        st.caption("No recommendations were made in this period.")
+        return
+    rules["Time"] = pd.to_datetime(rules["bucket"], unit="s")
+    rules["Recommendation"] = rules["rule_id"].map(_label)
+    rules["Share (%)"] = rules["Matches"] / rules["bucket"].map(totals) * 100
+    fig = px.line(rules, x="Time", y="Share (%)", color="Recommendation", markers=True)
+    fig.update_layout(**CHART_LAYOUT)
+    st.plotly_chart(fig, use_container_width=True)
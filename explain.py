@@ -0,0 +1,119 @@
+# Exact Shapley contributions of each input feature to the risk probability.
+#
+# Each respondent is compared with a fixed baseline respondent (BASELINE). A
+# coalition S of features takes the respondent's answers for S and the
+# baseline's for the rest, and its value is the predicted probability of that
+# mixed row. Features that already match the baseline contribute nothing, so
+# only the d features that differ are enumerated: all 2^d coalitions are
+# scored in one vectorized call (usually straight from the lookup table) and
+# the Shapley values follow from one matrix product over those 2^d values. The
+# contributions add up exactly to probability - baseline probability.
+import functools
+from math import factorial
+
+import numpy as np
+
+import config
+import scoring
+
+BASELINE = dict(
+    {"GENDER": "M", "AGE": 40},
+    **{name: 1 for name in scoring.YES_NO_FEATURES}
+)
+BASELINE_FEATURES = scoring.encode(BASELINE)
+BASELINE_ROW = BASELINE_FEATURES[0]
+
+MAX_COALITION_ROWS = 1 << 20  # rows scored per vectorized call
+
+
+# Function to build the (2^d, d) matrix that turns coalition values into
+# Shapley values: phi[k] = sum over coalitions T of value[T] * C[T, k], with
+# C[T, k] = w(|T| - 1) when k is in T and -w(|T|) otherwise, where
+# w(s) = s! (d - s - 1)! / d!
+@functools.lru_cache(maxsize=None)
+def _shapley_matrix(d):
+    weights = np.array([factorial(s) * factorial(d - s - 1) / factorial(d) for s in range(d)] + [0.0])
+    bits = (np.arange(1 << d)[:, None] >> np.arange(d)) & 1
+    sizes = bits.sum(axis=1, keepdims=True)
+    return np.where(bits == 1, weights[sizes - 1], -weights[np.minimum(sizes, d)])
+
+
+# Function to get the baseline respondent's probability under a model
+def baseline_probability(model=None):
+    return float(scoring.predict_probability(BASELINE_FEATURES, model or scoring.active_model())[0])
+
+
+# Function to compute the Shapley contributions of distinct encoded rows.
+# Returns a float64 matrix of shape (rows, len(FEATURES)).
+def _contributions(rows, model):
+    n_features = len(scoring.FEATURES)
+    differs = rows != BASELINE_ROW
+    counts = differs.sum(axis=1)
+    # Position of each differing feature among its row's differing features
+    member_bit = np.where(differs, np.cumsum(differs, axis=1) - 1, -1)
+    contributions = np.zeros((len(rows), n_features))
+
+    for d in np.unique(counts):
+        if d == 0:
+            continue
+        group = np.flatnonzero(counts == d)
+        size = 1 << d
+        # Membership of coalition member k, plus an all-False row for
+        # features that match the baseline (member_bit -1)
+        membership = np.zeros((d + 1, size), dtype=bool)
+        membership[:d] = (np.arange(size) >> np.arange(d)[:, None]) & 1
+        step = max(1, MAX_COALITION_ROWS // size)
+
+        for start in range(0, len(group), step):
+            members = group[start:start + step]
+            m = len(members)
+            # Coalition rows, feature by feature, laid out column-major:
+            # respondent's answer where the coalition includes the feature
+            columns = np.empty((n_features, m, size), dtype=np.int16)
+            for c in range(n_features):
+                if not differs[members, c].any():
+                    columns[c] = BASELINE_ROW[c]
+                    continue
+                included = membership[member_bit[members, c]]
+                np.copyto(columns[c], BASELINE_ROW[c])
+                np.copyto(columns[c], rows[members, c, None], where=included)
+            coalitions = columns.reshape(n_features, m * size).T
+            value = scoring.predict_probability(coalitions, model).reshape(m, size)
+
+            feature_columns = np.nonzero(differs[members])[1].reshape(m, d)
+            contributions[members[:, None], feature_columns] = value @ _shapley_matrix(d)
+    return contributions
+
+
+# Function to explain every row of an encoded batch. Identical rows are
+# explained once. Returns a float64 matrix of shape (rows, len(FEATURES)).
+def explain_features(features, model=None):
+    model = model or scoring.active_model()
+    keys = (
+        (features[:, scoring.COLUMN["AGE"]].astype(np.int64) << 14)
+        | (features[:, scoring.COLUMN["GENDER"]].astype(np.int64) - 1) << 13
+        | scoring.pack_flags(features)
+    )
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    return _contributions(features[first], model)[inverse]
+
+
+@functools.lru_cache(maxsize=config.EXPLAIN_CACHE_MAX_ENTRIES)
+def _explain_row(model, row):
+    features = np.array([row], dtype=np.int16, order="F")
+    return {
+        "baseline_probability": baseline_probability(model),
+        "contributions": dict(zip(scoring.FEATURES, _contributions(features, model)[0].tolist())),
+    }
+
+
+# Function to explain one encoded row, memoized per model and answers.
+# Returns {"baseline_probability": float, "contributions": {feature: float}};
+# the dict is shared with the cache, so treat it as read-only.
+def explain(features, index=0, model=None):
+    return _explain_row(model or scoring.active_model(), tuple(features[index].tolist()))
+
+
+# Function to turn a batch's contribution matrix into one dict per row
+def contribution_dicts(contributions):
+    return [dict(zip(scoring.FEATURES, row)) for row in contributions.tolist()]
@@ -0,0 +1,399 @@
+# Plotly figures for the app, cached as pre-serialized JSON.
+#
+# Building a go.Figure and serializing it are among the most expensive parts of
+# a rerun, and most figures only depend on a handful of values. Specs are kept
+# in a size-bounded LRU cache keyed on those values, static charts are built
+# once and kept on disk, and show_chart() sends the cached JSON to the browser
+# without rebuilding or revalidating the figure.
+#
+# Plotly is only imported when a figure has to be built: constructing the
+# first Figure also pulls in plotly.offline and IPython, a few hundred
+# milliseconds a fresh worker doesn't need to spend when every chart on its
+# first page comes from a cache.
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from importlib import metadata
+
+import streamlit as st
+
+import config
+import metrics
+
+CHART_CONFIG = json.dumps({"showLink": False, "linkText": False})
+
+
+# Size-bounded LRU cache of figure JSON specs. With FIGURE_SHARED_CACHE on,
+# a miss is looked up in the shared store before the figure is built, so a
+# chart built by one worker process is reused by all the others.
+class FigureCache:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._specs = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    # Function to get a spec, building and serializing the figure on a miss
+    def get(self, key, build):
+        with self._lock:
+            spec = self._specs.get(key)
+            if spec is not None:
+                self._specs.move_to_end(key)
+                self.hits += 1
+                return spec
+
+        spec = shared.get(key) if config.FIGURE_SHARED_CACHE else None
+        if spec is not None:
+            self.shared_hits += 1
+        else:
+            self.misses += 1
+            with metrics.span("figure." + key[0]):
+                spec = to_spec(build())
+            if config.FIGURE_SHARED_CACHE:
+                shared.put(key, spec)
+        with self._lock:
+            self._specs[key] = spec
+            self._specs.move_to_end(key)
+            while len(self._specs) > self.max_entries:
+                self._specs.popitem(last=False)
+        return spec
+
+    def __len__(self):
+        return len(self._specs)
+
+    def clear(self):
+        with self._lock:
+            self._specs.clear()
+
+
+# Cross-process store of figure specs: one file per spec, named by a digest
+# of the cache key and of this module. Every worker reads the same files, so
+# the OS page cache holds one copy however many workers there are. The
+# oldest files are pruned once the store grows past max_entries.
+class SharedSpecStore:
+    PRUNE_EVERY = 500  # writes between size checks
+
+    def __init__(self, directory, max_entries):
+        self.directory = directory
+        self.max_entries = max_entries
+        self._writes = 0
+
+    def _path(self, key):
+        digest = hashlib.sha1(("%s|%r" % (source_digest(), key)).encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest + ".json")
+
+    def get(self, key):
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                return f.read() or None
+        except OSError:
+            return None
+
+    def put(self, key, spec):
+        path = self._path(key)
+        tmp_path = "%s.%d.%d.tmp" % (path, os.getpid(), threading.get_ident())
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(spec)
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            self.prune()
+
+    # Function to delete the oldest specs beyond max_entries
+    def prune(self):
+        entries = []
+        try:
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(".json"):
+                    entries.append((entry.stat().st_mtime, entry.path))
+        except OSError:
+            return  # another worker is pruning at the same time
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort()
+        for _, path in entries[:len(entries) - self.max_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+cache = FigureCache(config.FIGURE_CACHE_MAX_ENTRIES)
+shared = SharedSpecStore(os.path.join(config.FIGURE_SPEC_DIR, "shared"), config.FIGURE_SHARED_MAX_ENTRIES)
+_static_specs = {}
+_static_lock = threading.Lock()
+_source_digest = None
+
+
+# Function to serialize a figure the same way st.plotly_chart does
+def to_spec(fig):
+    import plotly.utils
+
+    return json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+
+
+# Function to get a digest of this module and the plotly version, so stored
+# static charts are rebuilt whenever either changes
+def source_digest():
+    global _source_digest
+    if _source_digest is None:
+        with open(__file__, "rb") as f:
+            source = f.read()
+        _source_digest = hashlib.sha1(source + metadata.version("plotly").encode("utf-8")).hexdigest()[:12]
+    return _source_digest
+
+
+def _static_spec_path(name):
+    return os.path.join(config.FIGURE_SPEC_DIR, "%s-%s.json" % (name, source_digest()))
+
+
+def _read_static_spec(name):
+    try:
+        with open(_static_spec_path(name), "r", encoding="utf-8") as f:
+            return f.read() or None
+    except OSError:
+        return None
+
+
+def _write_static_spec(name, spec):
+    path = _static_spec_path(name)
+    tmp_path = "%s.%d.tmp" % (path, os.getpid())
+    try:
+        os.makedirs(config.FIGURE_SPEC_DIR, exist_ok=True)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(spec)
+        os.replace(tmp_path, path)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+# Function to get a static chart: from memory, then from disk, and only
+# built (and stored for the next process) when neither has it
+def static_spec(name, build):
+    spec = _static_specs.get(name)
+    if spec is None:
+        with _static_lock:
+            spec = _static_specs.get(name)
+            if spec is None:
+                spec = _read_static_spec(name)
+                if spec is None:
+                    with metrics.span("figure." + name):
+                        spec = to_spec(build())
+                    _write_static_spec(name, spec)
+                _static_specs[name] = spec
+    return spec
+
+
+# Function to display a cached spec, equivalent to st.plotly_chart(fig).
+# Enqueueing the PlotlyChart proto directly goes through Streamlit internals
+# (st._main._enqueue and the proto's fields) written against streamlit 1.23,
+# the version pinned in requirements.txt. When another version lacks any of
+# them, the chart is rebuilt from the spec and shown with st.plotly_chart.
+def show_chart(spec, use_container_width=True):
+    try:
+        from streamlit.proto.PlotlyChart_pb2 import PlotlyChart as PlotlyChartProto
+
+        proto = PlotlyChartProto()
+        proto.use_container_width = use_container_width
+        proto.figure.spec = spec
+        proto.figure.config = CHART_CONFIG
+        proto.theme = "streamlit"
+        enqueue = st._main._enqueue
+    except (AttributeError, ImportError):
+        import plotly.graph_objects as go
+
+        return st.plotly_chart(go.Figure(json.loads(spec)), use_container_width=use_container_width)
+    return enqueue("plotly_chart", proto)
+
+
+# Function to create a gauge chart with improved styling
+def create_gauge_chart(probability):
+    import plotly.graph_objects as go
+
+    fig = go.Figure(go.Indicator(
+        mode="gauge+number",
+        value=probability * 100,
+        domain={'x': [0, 1], 'y': [0, 1]},
+        title={'text': "Risk Probability (%)", 'font': {'size': 24, 'color': '#1E3A8A'}},
+        gauge={
+            'axis': {'range': [0, 100], 'tickwidth': 2, 'tickcolor': "#1E3A8A"},
+            'bar': {'color': "#1E3A8A"},
+            'steps': [
+                {'range': [0, 30], 'color': "#DCFCE7"},  # Light green
+                {'range': [30, 70], 'color': "#FEF9C3"},  # Light yellow
+                {'range': [70, 100], 'color': "#FEE2E2"}  # Light red
+            ],
+            'threshold': {
+                'line': {'color': "#DC2626", 'width': 4},
+                'thickness': 0.75,
+                'value': probability * 100
+            }
+        }
+    ))
+
+    fig.update_layout(
+        height=350,
+        margin=dict(l=20, r=20, t=50, b=20),
+        paper_bgcolor="rgba(0,0,0,0)",
+        font={'color': "#1E3A8A", 'family': "Arial"}
+    )
+
+    return fig
+
+
+# Function to get the gauge chart spec, memoized per probability value
+def gauge_chart_spec(probability):
+    probability = float(probability)
+    return cache.get(("gauge", probability), lambda: create_gauge_chart(probability))
+
+
+# Function to label a feature with the respondent's answer, e.g. "Smoking: Yes"
+def feature_label(name, value):
+    if name in ("GENDER", "AGE"):
+        answer = value
+    else:
+        answer = "Yes" if value == 2 else "No"
+    return "%s: %s" % (name.replace("_", " ").title(), answer)
+
+
+# Function to create a horizontal bar chart of signed percentage-point
+# changes from ((label, points), ...): red bars raise the risk, green lower it
+def create_signed_bar_chart(items, xaxis_title):
+    import plotly.graph_objects as go
+
+    labels = [label for label, _ in items]
+    points = [value for _, value in items]
+    fig = go.Figure(go.Bar(
+        x=points,
+        y=labels,
+        orientation="h",
+        marker_color=["#DC2626" if value > 0 else "#16A34A" for value in points],
+        text=["%+.1f pp" % value for value in points],
+        textposition="auto",
+    ))
+
+    fig.update_layout(
+        height=max(300, 28 * len(items) + 60),
+        margin=dict(l=20, r=20, t=30, b=20),
+        paper_bgcolor="rgba(0,0,0,0)",
+        plot_bgcolor="rgba(0,0,0,0)",
+        xaxis_title=xaxis_title,
+        font=dict(family="Poppins", size=12, color="#1E3A8A")
+    )
+
+    return fig
+
+
+# Function to get the contribution chart spec for one explained respondent.
+# Features that match the baseline contribute nothing and are left out.
+def contribution_chart_spec(input_data, explanation):
+    items = tuple(sorted(
+        (
+            (feature_label(name, input_data[name]), round(value * 100, 2))
+            for name, value in explanation["contributions"].items()
+            if value != 0
+        ),
+        key=lambda item: item[1],
+    ))
+    return cache.get(("contributions", items), lambda: create_signed_bar_chart(
+        items, "Contribution to risk probability (percentage points)"))
+
+
+# Function to label a what-if flip from its new encoded answer, e.g. "Smoking → No"
+def flip_label(name, value):
+    if name == "GENDER":
+        answer = "F" if value == 2 else "M"
+    else:
+        answer = "Yes" if value == 2 else "No"
+    return "%s → %s" % (name.replace("_", " ").title(), answer)
+
+
+# Function to create the what-if age curve: the current answers and one
+# flipped answer across ages 18-100, with the respondent's age marked
+def create_whatif_curve_chart(ages, curve, flip_curve, label, age):
+    import plotly.graph_objects as go
+
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=ages, y=curve * 100, mode="lines", name="Your answers",
+                             line=dict(color="#1E3A8A", width=3)))
+    fig.add_trace(go.Scatter(x=ages, y=flip_curve * 100, mode="lines", name=label,
+                             line=dict(color="#DC2626", width=2, dash="dash")))
+    if ages[0] <= age <= ages[-1]:
+        fig.add_vline(x=age, line_width=1, line_dash="dot", line_color="#64748B",
+                      annotation_text="Your age", annotation_position="top left")
+
+    fig.update_layout(
+        height=320,
+        margin=dict(l=20, r=20, t=30, b=20),
+        paper_bgcolor="rgba(0,0,0,0)",
+        plot_bgcolor="rgba(0,0,0,0)",
+        xaxis_title="Age",
+        yaxis_title="Risk Probability (%)",
+        yaxis_range=[0, 100],
+        legend=dict(orientation="h", y=1.12),
+        font=dict(family="Poppins", size=12, color="#1E3A8A")
+    )
+
+    return fig
+
+
+# Function to get the what-if curve spec for one sweep and flipped feature
+def whatif_curve_spec(sweep, feature):
+    flip = next(flip for flip in sweep["flips"] if flip["feature"] == feature)
+    label = flip_label(feature, flip["value"])
+    key = ("whatif_curve", sweep["model_version"], sweep["profile"], feature)
+    return cache.get(key, lambda: create_whatif_curve_chart(
+        sweep["ages"], sweep["curve"], flip["curve"], label, sweep["age"]))
+
+
+# Function to get the what-if delta chart spec for one sweep
+def whatif_delta_spec(sweep):
+    items = tuple(sorted(
+        ((flip_label(flip["feature"], flip["value"]), round(flip["delta"] * 100, 2)) for flip in sweep["flips"]),
+        key=lambda item: item[1],
+    ))
+    return cache.get(("whatif_deltas", items), lambda: create_signed_bar_chart(
+        items, "Change in risk probability (percentage points)"))
+
+
+# Function to create the 5-year survival rate chart (constant data)
+def create_survival_chart():
+    import plotly.express as px
+
+    stages = ['Localized', 'Regional', 'Distant']
+    survival_rates = [60, 33, 6]
+
+    fig = px.bar(
+        x=stages,
+        y=survival_rates,
+        labels={'x': 'Cancer Stage', 'y': '5-Year Survival Rate (%)'},
+        title='Lung Cancer 5-Year Survival Rates by Stage',
+        color=survival_rates,
+        color_continuous_scale=px.colors.sequential.Blues
+    )
+
+    fig.update_layout(
+        height=300,
+        margin=dict(l=20, r=20, t=50, b=30),
+    )
+
+    return fig
+
+
+def survival_chart_spec():
+    return static_spec("survival", create_survival_chart)
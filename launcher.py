@@ -0,0 +1,449 @@
+# Multi-worker launcher: N `streamlit run app.py` processes behind one port.
+#
+#   python launcher.py --workers 4 --port 10000
+#
+# A Streamlit session lives in the worker process that served its websocket,
+# so the balancer is sticky: the first page load picks the healthy worker with
+# the fewest open sessions and sets an lu_worker cookie, and every later
+# request and websocket from that browser goes to the same worker. Uploads
+# and media files are kept by the session's worker too, so all HTTP requests
+# follow the cookie, not just the websocket.
+#
+# Workers listen on 127.0.0.1 from --worker-port upwards, each with its own
+# metrics endpoint 1000 ports higher. They share what would otherwise be
+# loaded N times: model weights and the lookup table are memory-mapped
+# files, animations and static charts are read from the on-disk caches, and
+# figure specs go through the shared store in figures.py (one file per spec,
+# held once in the OS page cache).
+#
+# Every --health-interval seconds each worker's /_stcore/health is checked.
+# A worker that exits or fails --health-failures checks in a row is replaced.
+# A worker older than --max-age or using more than --max-rss MB is recycled
+# gracefully: a replacement is started first, new sessions go to it once it
+# is healthy, and the old worker is stopped when its last session closes (or
+# after --drain-timeout). One worker is recycled at a time.
+#
+# GET /_lb/status lists the workers as JSON.
+import argparse
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import tornado.httpclient
+import tornado.httpserver
+import tornado.ioloop
+import tornado.web
+import tornado.websocket
+
+import config
+from metrics import process_rss
+
+COOKIE = "lu_worker"
+METRICS_PORT_OFFSET = 1000
+STREAM_PATH = "/_stcore/stream"
+# Headers that describe one connection and must not be forwarded
+HOP_BY_HOP = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization", "te", "trailer",
+    "transfer-encoding", "upgrade", "host", "content-length",
+}
+
+
+class Worker:
+    def __init__(self, worker_id, slot, port, process):
+        self.id = worker_id
+        self.slot = slot
+        self.port = port
+        self.process = process
+        self.started = time.time()
+        self.healthy = False  # set by the first passing health check
+        self.failures = 0
+        self.sessions = 0  # open websockets
+        self.draining_since = None  # set when the worker is being recycled
+
+    @property
+    def url(self):
+        return "http://127.0.0.1:%d" % self.port
+
+    @property
+    def alive(self):
+        return self.process.poll() is None
+
+    @property
+    def draining(self):
+        return self.draining_since is not None
+
+    # A worker takes new sessions once healthy, until it starts draining
+    @property
+    def accepting(self):
+        return self.healthy and not self.draining and self.alive
+
+    def status(self):
+        return {
+            "id": self.id,
+            "slot": self.slot,
+            "port": self.port,
+            "pid": self.process.pid,
+            "metrics": "http://127.0.0.1:%d/metrics" % (self.port + METRICS_PORT_OFFSET),
+            "age_seconds": round(time.time() - self.started, 1),
+            "healthy": self.healthy,
+            "draining": self.draining,
+            "sessions": self.sessions,
+            "rss_mb": round((process_rss(self.process.pid) or 0) / 2 ** 20, 1),
+        }
+
+
+class Supervisor:
+    def __init__(self, args):
+        self.args = args
+        self.workers = {}  # id -> Worker
+        self.stopping = []  # workers that were sent SIGTERM
+        self._next_id = 1
+        self._ticking = False
+        self._http = tornado.httpclient.AsyncHTTPClient()
+
+    # Function to pick a port no live worker uses (or used just before)
+    def _free_port(self):
+        used = {worker.port for worker in list(self.workers.values()) + self.stopping}
+        for offset in range(4 * self.args.workers + 16):
+            port = self.args.worker_port + offset
+            if port not in used:
+                return port
+        raise RuntimeError("no free worker port above %d" % self.args.worker_port)
+
+    def spawn(self, slot):
+        port = self._free_port()
+        worker_id = self._next_id
+        self._next_id += 1
+        env = dict(os.environ)
+        env.update({
+            "LU_WORKER_ID": str(worker_id),
+            "LU_METRICS_PORT": str(port + METRICS_PORT_OFFSET),
+            "LU_FIGURE_SHARED_CACHE": "1",
+        })
+        # Each worker keeps a small in-memory figure cache in front of the shared store
+        env.setdefault("LU_FIGURE_CACHE_MAX_ENTRIES", str(self.args.figure_cache_entries))
+        process = subprocess.Popen(
+            [sys.executable, "-m", "streamlit", "run", os.path.join(config.BASE_DIR, "app.py"),
+             "--server.port", str(port), "--server.address", "127.0.0.1", "--server.headless", "true",
+             "--browser.gatherUsageStats", "false"],
+            cwd=config.BASE_DIR, env=env,
+        )
+        worker = Worker(worker_id, slot, port, process)
+        self.workers[worker_id] = worker
+        print("worker %d (slot %d) starting on port %d, pid %d" % (worker_id, slot, port, process.pid))
+        return worker
+
+    def start(self):
+        for slot in range(self.args.workers):
+            self.spawn(slot)
+
+    # Function to choose a worker for a new session: the accepting worker
+    # with the fewest open sessions
+    def choose(self):
+        candidates = [worker for worker in self.workers.values() if worker.accepting]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda worker: (worker.sessions, worker.id))
+
+    # Function to find the worker a sticky cookie points at, if it can still
+    # serve that session
+    def sticky(self, worker_id):
+        try:
+            worker = self.workers.get(int(worker_id))
+        except (TypeError, ValueError):
+            return None
+        if worker is None or not worker.healthy or not worker.alive:
+            return None
+        return worker
+
+    def stop_worker(self, worker, reason):
+        print("worker %d stopping: %s" % (worker.id, reason))
+        self.workers.pop(worker.id, None)
+        self.stopping.append(worker)
+        if worker.alive:
+            worker.process.terminate()
+            tornado.ioloop.IOLoop.current().call_later(10, self._kill, worker)
+
+    def _kill(self, worker):
+        if worker.alive:
+            worker.process.kill()
+
+    async def _check(self, worker):
+        try:
+            response = await self._http.fetch(worker.url + "/_stcore/health", request_timeout=2, raise_error=False)
+            ok = response.code == 200
+        except (OSError, tornado.httpclient.HTTPClientError):
+            ok = False
+        if ok:
+            if not worker.healthy:
+                print("worker %d healthy" % worker.id)
+            worker.healthy, worker.failures = True, 0
+        else:
+            worker.failures += 1
+
+    # Function to run one round of health checks, replacements and recycling
+    async def tick(self):
+        if self._ticking:
+            return
+        self._ticking = True
+        try:
+            await self._tick()
+        finally:
+            self._ticking = False
+        self.stopping = [worker for worker in self.stopping if worker.alive]
+
+    async def _tick(self):
+        workers = list(self.workers.values())
+        await asyncio.gather(*(self._check(worker) for worker in workers if worker.alive))
+        now = time.time()
+        for worker in workers:
+            if worker.draining:
+                if (worker.sessions == 0 or now - worker.draining_since > self.args.drain_timeout
+                        or not worker.alive):
+                    self.stop_worker(worker, "drained")
+                continue
+            starting = not worker.healthy and now - worker.started < self.args.start_timeout
+            if not worker.alive or (worker.failures >= self.args.health_failures and not starting):
+                self.stop_worker(worker, "exited" if not worker.alive else "failed health checks")
+                self.spawn(worker.slot)
+
+        # Recycle one worker at a time, and only once its slot's replacement
+        # would not leave the pool short
+        if any(not worker.healthy for worker in self.workers.values()):
+            return
+        for worker in sorted(self.workers.values(), key=lambda worker: worker.started):
+            if worker.draining:
+                return
+            reason = self._recycle_reason(worker, now)
+            if reason:
+                replacement = self.spawn(worker.slot)
+                print("worker %d recycling (%s), replaced by worker %d" % (worker.id, reason, replacement.id))
+                worker.draining_since = now
+                return
+
+    def _recycle_reason(self, worker, now):
+        if self.args.max_age and now - worker.started > self.args.max_age:
+            return "older than %d s" % self.args.max_age
+        rss = process_rss(worker.process.pid)
+        if self.args.max_rss and rss is not None and rss > self.args.max_rss * 2 ** 20:
+            return "RSS %.0f MB" % (rss / 2 ** 20)
+        return None
+
+    def shutdown(self):
+        for worker in list(self.workers.values()):
+            self.stop_worker(worker, "launcher shutting down")
+
+
+# Function to get the worker for a request: the sticky one, or a newly
+# chosen one when there is none or a page load lands on a draining worker.
+# Returns (worker, whether the cookie must be set).
+def route(handler, supervisor, page_load):
+    worker = supervisor.sticky(handler.get_cookie(COOKIE))
+    if worker is not None and not (page_load and worker.draining):
+        return worker, False
+    return supervisor.choose(), True
+
+
+class ProxyHandler(tornado.web.RequestHandler):
+    SUPPORTED_METHODS = ("GET", "HEAD", "POST", "PUT", "DELETE", "PATCH", "OPTIONS")
+
+    def initialize(self, supervisor):
+        self.supervisor = supervisor
+
+    async def _proxy(self):
+        worker, new = route(self, self.supervisor, self.request.path == "/")
+        if worker is None:
+            raise tornado.web.HTTPError(503, reason="No healthy worker")
+        if new:
+            self.set_cookie(COOKIE, str(worker.id), httponly=True, samesite="Lax")
+
+        headers = {name: value for name, value in self.request.headers.get_all()
+                   if name.lower() not in HOP_BY_HOP}
+        headers["X-Forwarded-For"] = self.request.remote_ip
+        body = self.request.body if self.request.method in ("POST", "PUT", "PATCH") else None
+        try:
+            response = await tornado.httpclient.AsyncHTTPClient().fetch(
+                worker.url + self.request.uri, method=self.request.method, headers=headers, body=body,
+                follow_redirects=False, decompress_response=False, raise_error=False,
+                request_timeout=self.supervisor.args.request_timeout, allow_nonstandard_methods=True,
+            )
+        except (OSError, tornado.httpclient.HTTPClientError):
+            raise tornado.web.HTTPError(502, reason="Worker %d unavailable" % worker.id)
+        self.set_status(response.code, response.reason)
+        self.clear_header("Content-Type")
+        for name, value in response.headers.get_all():
+            if name.lower() not in HOP_BY_HOP:
+                self.add_header(name, value)
+        if response.body:
+            self.write(response.body)
+
+    get = head = post = put = delete = patch = options = _proxy
+
+
+class StreamProxyHandler(tornado.websocket.WebSocketHandler):
+    def initialize(self, supervisor):
+        self.supervisor = supervisor
+        self.worker = None
+        self.upstream = None
+
+    # Streamlit passes its session details as websocket subprotocols; accept
+    # the first one, as the worker will
+    def select_subprotocol(self, subprotocols):
+        return subprotocols[0] if subprotocols else None
+
+    async def open(self):
+        worker, _ = route(self, self.supervisor, page_load=False)
+        if worker is None:
+            self.close(1013, "No healthy worker")
+            return
+        headers = {name: value for name, value in self.request.headers.get_all()
+                   if name.lower() in ("cookie", "user-agent")}
+        headers["X-Forwarded-For"] = self.request.remote_ip  # the client key for admission.py
+        protocols = self.request.headers.get("Sec-WebSocket-Protocol", "")
+        request = tornado.httpclient.HTTPRequest(
+            worker.url.replace("http://", "ws://") + STREAM_PATH, headers=headers,
+        )
+        try:
+            self.upstream = await tornado.websocket.websocket_connect(
+                request, max_message_size=200 * 2 ** 20,
+                subprotocols=[p.strip() for p in protocols.split(",") if p.strip()] or None,
+            )
+        except (OSError, tornado.websocket.WebSocketError, tornado.httpclient.HTTPClientError):
+            self.close(1011, "Worker %d unavailable" % worker.id)
+            return
+        self.worker = worker
+        worker.sessions += 1
+        tornado.ioloop.IOLoop.current().add_callback(self._pump)
+
+    # Function to forward every message from the worker to the browser
+    async def _pump(self):
+        while True:
+            message = await self.upstream.read_message()
+            if message is None:
+                break
+            try:
+                await self.write_message(message, binary=isinstance(message, bytes))
+            except tornado.websocket.WebSocketClosedError:
+                break
+        self.close()
+
+    async def on_message(self, message):
+        if self.upstream is not None:
+            try:
+                await self.upstream.write_message(message, binary=isinstance(message, bytes))
+            except tornado.websocket.WebSocketClosedError:
+                self.close()
+
+    def on_close(self):
+        if self.upstream is not None:
+            self.upstream.close()
+            self.upstream = None
+        if self.worker is not None:
+            self.worker.sessions -= 1
+            self.worker = None
+
+
+class StatusHandler(tornado.web.RequestHandler):
+    def initialize(self, supervisor):
+        self.supervisor = supervisor
+
+    def get(self):
+        workers = [worker.status() for worker in sorted(self.supervisor.workers.values(), key=lambda w: w.id)]
+        self.set_header("Content-Type", "application/json")
+        self.set_status(200 if any(worker["healthy"] for worker in workers) else 503)
+        self.finish(json.dumps({"workers": workers}, indent=2))
+
+
+# Function to read an option the workers' Streamlit runs with: a STREAMLIT_*
+# environment variable (which `streamlit run` reads as a flag), the
+# .streamlit/config.toml in their working directory (BASE_DIR), or the
+# default. Streamlit finds its config files relative to the working directory
+# it is imported from, so it is imported from BASE_DIR.
+def streamlit_option(name):
+    cwd = os.getcwd()
+    os.chdir(config.BASE_DIR)
+    try:
+        from streamlit import config as streamlit_config
+
+        option = streamlit_config.get_config_options()[name]
+    finally:
+        os.chdir(cwd)
+    value = os.environ.get(option.env_var)
+    return option.type(value) if value else option.value
+
+
+def make_app(supervisor):
+    options = {"supervisor": supervisor}
+    return tornado.web.Application([
+        (r"/_lb/status", StatusHandler, options),
+        (STREAM_PATH, StreamProxyHandler, options),
+        (r".*", ProxyHandler, options),
+    ])
+
+
+async def serve(args):
+    supervisor = Supervisor(args)
+    supervisor.start()
+    # Batch-page uploads go through the proxy, so it accepts what a worker does
+    max_body_size = config.LAUNCHER_MAX_BODY_BYTES or streamlit_option("server.maxUploadSize") * 1024 * 1024
+    server = tornado.httpserver.HTTPServer(make_app(supervisor), max_body_size=max_body_size)
+    server.listen(args.port, args.address)
+    print("Balancing %d workers on http://%s:%d" % (args.workers, args.address, args.port))
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    checks = tornado.ioloop.PeriodicCallback(supervisor.tick, args.health_interval * 1000)
+    checks.start()
+    # Check soon after launch so the first workers take traffic without
+    # waiting a whole interval
+    while not stop.is_set() and not any(worker.healthy for worker in supervisor.workers.values()):
+        await supervisor.tick()
+        await asyncio.sleep(0.5)
+    await stop.wait()
+
+    checks.stop()
+    server.stop()
+    supervisor.shutdown()
+    deadline = time.monotonic() + 10
+    while any(worker.alive for worker in supervisor.stopping) and time.monotonic() < deadline:
+        await asyncio.sleep(0.2)
+    for worker in supervisor.stopping:
+        if worker.alive:
+            worker.process.kill()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run several app workers behind a sticky load balancer.")
+    parser.add_argument("--workers", type=int, default=config.LAUNCHER_WORKERS, help="app processes to run")
+    parser.add_argument("--port", type=int, default=10000)
+    parser.add_argument("--address", default="127.0.0.1")
+    parser.add_argument("--worker-port", type=int, default=config.LAUNCHER_WORKER_PORT,
+                        help="first port the workers listen on (127.0.0.1)")
+    parser.add_argument("--health-interval", type=float, default=config.LAUNCHER_HEALTH_INTERVAL)
+    parser.add_argument("--health-failures", type=int, default=config.LAUNCHER_HEALTH_FAILURES,
+                        help="failed checks in a row before a worker is replaced")
+    parser.add_argument("--start-timeout", type=float, default=60.0,
+                        help="seconds a new worker has to pass its first health check")
+    parser.add_argument("--max-age", type=float, default=config.LAUNCHER_MAX_WORKER_AGE,
+                        help="recycle workers older than this many seconds (0: never)")
+    parser.add_argument("--max-rss", type=float, default=config.LAUNCHER_MAX_WORKER_RSS_MB,
+                        help="recycle workers using more than this many MB (0: never)")
+    parser.add_argument("--drain-timeout", type=float, default=config.LAUNCHER_DRAIN_TIMEOUT,
+                        help="seconds a recycled worker keeps serving its open sessions")
+    parser.add_argument("--request-timeout", type=float, default=300.0, help="seconds per proxied HTTP request")
+    parser.add_argument("--figure-cache-entries", type=int, default=128,
+                        help="in-memory figure specs per worker, in front of the shared store")
+    args = parser.parse_args(argv)
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    asyncio.run(serve(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+# Precomputed risk table covering the whole input space of the assessment form.
+#
+# The form has 2 genders, ages 18-100 and 13 yes/no answers, so every possible
+# respondent maps to one cell of a 2 x 83 x 2^13 (~1.36 M) table through a
+# mixed-radix index. The build step scores every cell once with the live model
+# and stores the probability quantized to a uint8; online scoring is then a
+# single index into a memory-mapped array. Each model version gets its own
+# table file (risk_table-<version>.npy), so a hot-reloaded model never reads a
+# table built for another one. The running app checks the table's metadata
+# file every LOOKUP_TABLE_RELOAD_INTERVAL seconds, so a table built (or
+# rebuilt) while it runs is picked up without a restart.
+#
+#   python lookup_table.py build [--if-missing]
+#   python lookup_table.py check
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+import config
+import scoring
+
+AGE_MIN = 18
+AGE_MAX = 100
+AGE_RANGE = AGE_MAX - AGE_MIN + 1
+FLAG_BITS = 13
+TABLE_SIZE = 2 * AGE_RANGE << FLAG_BITS
+SCALE = 200  # a stored value q means probability q / SCALE
+
+_current = (None, None, None)  # (model version, table or None, metadata file stamp)
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+# Function to compute the mixed-radix table index of each encoded row:
+# ((gender * AGE_RANGE + age offset) << FLAG_BITS) | packed yes/no answers
+def table_index(features):
+    gender = features[:, scoring.COLUMN["GENDER"]].astype(np.int32) - 1
+    age = features[:, scoring.COLUMN["AGE"]].astype(np.int32) - AGE_MIN
+    return ((gender * AGE_RANGE + age) << FLAG_BITS) | scoring.pack_flags(features)
+
+
+# Function to check which rows fall inside the table (ages 18-100)
+def in_range(features):
+    age = features[:, scoring.COLUMN["AGE"]]
+    return (age >= AGE_MIN) & (age <= AGE_MAX)
+
+
+# Function to build the encoded rows for one (gender, age) slice of the table,
+# in table order
+def space_slice(gender_code, age):
+    flags = np.arange(1 << FLAG_BITS, dtype=np.int64)
+    features = np.empty((len(flags), len(scoring.FEATURES)), dtype=np.int16, order="F")
+    features[:, scoring.COLUMN["GENDER"]] = gender_code
+    features[:, scoring.COLUMN["AGE"]] = age
+    features[:, 2:] = 1 + ((flags[:, None] >> np.arange(FLAG_BITS)) & 1)
+    return features
+
+
+def _slices():
+    for gender_code in (1, 2):
+        for age in range(AGE_MIN, AGE_MAX + 1):
+            start = ((gender_code - 1) * AGE_RANGE + age - AGE_MIN) << FLAG_BITS
+            yield start, space_slice(gender_code, age)
+
+
+# Function to quantize probabilities to uint8. Values are nudged by one step
+# where rounding would carry them across a risk band edge or the prediction
+# threshold, so the table always agrees with the live model on both.
+def quantize(probability):
+    probability = np.clip(probability, 0.0, 1.0)
+    q = np.rint(probability * SCALE).astype(np.int16)
+    for edge in np.append(scoring.BAND_EDGES, scoring.PREDICTION_THRESHOLD):
+        q[(probability < edge) & (q / SCALE >= edge)] -= 1
+        q[(probability >= edge) & (q / SCALE < edge)] += 1
+    return q.astype(np.uint8)
+
+
+# Function to get the table file of a model version
+def table_path(version, path=None):
+    base, ext = os.path.splitext(path or config.LOOKUP_TABLE_PATH)
+    return "%s-%s%s" % (base, version, ext)
+
+
+def _meta_path(path):
+    return os.path.splitext(path)[0] + ".json"
+
+
+def _stamp(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+class RiskTable:
+    def __init__(self, values, meta, model):
+        self.values = values
+        self.meta = meta
+        self.model = model
+
+    # Function to look up probabilities, falling back to the live model for
+    # rows outside the table (ages below 18 or above 100)
+    def probability(self, features):
+        inside = in_range(features)
+        if inside.all():
+            return self.values[table_index(features)] / SCALE
+        probability = np.empty(len(features))
+        probability[inside] = self.values[table_index(features[inside])] / SCALE
+        probability[~inside] = self.model.probability(features[~inside])
+        return probability
+
+
+# Function to evaluate a model (the active one by default) over the whole
+# input space and save its table
+def build(path=None, model=None):
+    model = model or scoring.active_model()
+    path = table_path(model.version, path)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    values = np.empty(TABLE_SIZE, dtype=np.uint8)
+    for start, features in _slices():
+        values[start:start + len(features)] = quantize(model.probability(features))
+
+    meta = {
+        "model_version": model.version,
+        "path": path,
+        "features": scoring.FEATURES,
+        "age_min": AGE_MIN,
+        "age_max": AGE_MAX,
+        "scale": SCALE,
+        "size": TABLE_SIZE,
+        "band_edges": scoring.BAND_EDGES.tolist(),
+        "prediction_threshold": scoring.PREDICTION_THRESHOLD,
+        "built_at": time.time(),
+    }
+    tmp_path = path + ".tmp.npy"
+    np.save(tmp_path, values)
+    os.replace(tmp_path, path)
+    # The metadata goes last and in one step: readers go by its file stamp
+    tmp_path = _meta_path(path) + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, _meta_path(path))
+    return meta
+
+
+# Function to memory-map a model's table from disk. Returns None when the
+# table is missing or was built for a different model, risk bands or
+# prediction threshold.
+def load(path=None, model=None):
+    model = model or scoring.active_model()
+    path = table_path(model.version, path)
+    try:
+        with open(_meta_path(path), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        values = np.load(path, mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+
+    if (
+        meta.get("model_version") != model.version
+        or meta.get("features") != scoring.FEATURES
+        or meta.get("scale") != SCALE
+        or meta.get("band_edges") != scoring.BAND_EDGES.tolist()
+        or meta.get("prediction_threshold") != scoring.PREDICTION_THRESHOLD
+        or values.shape != (TABLE_SIZE,)
+        or values.dtype != np.uint8
+    ):
+        return None
+    return RiskTable(values, meta, model)
+
+
+# Function to get the process-wide table for a model. The table's metadata
+# file is checked at most every LOOKUP_TABLE_RELOAD_INTERVAL seconds, and the
+# table is loaded again when the model version or that file changes; a
+# missing table is looked for again on the next check.
+def get_table(model):
+    global _current, _checked_at
+    now = time.monotonic()
+    version, table, _ = _current
+    if version == model.version and now - _checked_at < config.LOOKUP_TABLE_RELOAD_INTERVAL:
+        return table
+    with _lock:
+        version, table, stamp = _current
+        if version != model.version or now - _checked_at >= config.LOOKUP_TABLE_RELOAD_INTERVAL:
+            new_stamp = None
+            if not config.LOOKUP_TABLE_ENABLED:
+                table = None
+            else:
+                new_stamp = _stamp(_meta_path(table_path(model.version)))
+                if version != model.version or new_stamp != stamp:
+                    table = load(model=model)
+            _current = (model.version, table, new_stamp)
+            _checked_at = now
+    return table
+
+
+# Function to compare every cell of a table with the live model. Returns a
+# dict with the number of probability, risk band and prediction mismatches.
+def check(path=None):
+    model = scoring.active_model()
+    table = load(path, model)
+    if table is None:
+        raise ValueError("No usable lookup table at %s" % table_path(model.version, path))
+
+    tolerance = 1.0 / SCALE + 1e-9  # rounding plus a possible edge nudge
+    prob_mismatches = 0
+    band_mismatches = 0
+    prediction_mismatches = 0
+    max_error = 0.0
+    for start, features in _slices():
+        live = model.probability(features)
+        stored = table.probability(features)
+        error = np.abs(live - stored)
+        max_error = max(max_error, float(error.max()))
+        prob_mismatches += int((error > tolerance).sum())
+        band_mismatches += int((scoring.risk_bands(live) != scoring.risk_bands(stored)).sum())
+        prediction_mismatches += int(((live >= scoring.PREDICTION_THRESHOLD)
+                                      != (stored >= scoring.PREDICTION_THRESHOLD)).sum())
+
+    return {
+        "cells": TABLE_SIZE,
+        "probability_mismatches": prob_mismatches,
+        "band_mismatches": band_mismatches,
+        "prediction_mismatches": prediction_mismatches,
+        "max_abs_error": max_error,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or verify the precomputed risk table.")
+    parser.add_argument("command", choices=["build", "check"])
+    parser.add_argument("--path", default=config.LOOKUP_TABLE_PATH,
+                        help="table file (.npy); the model version is added to the name")
+    parser.add_argument("--if-missing", action="store_true", help="only build when no usable table exists")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        if args.if_missing and load(args.path) is not None:
+            print("Lookup table is up to date: %s" % table_path(scoring.model_version(), args.path))
+            return 0
+        started = time.perf_counter()
+        meta = build(args.path)
+        print("Built %d cells for model %s in %.2f s: %s"
+              % (meta["size"], meta["model_version"], time.perf_counter() - started, meta["path"]))
+        return 0
+
+    try:
+        result = check(args.path)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    print(json.dumps(result, indent=2))
+    mismatches = result["probability_mismatches"] + result["band_mismatches"] + result["prediction_mismatches"]
+    return 0 if mismatches == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
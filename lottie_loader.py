@@ -0,0 +1,250 @@
+# Cached, time-bounded loader for Lottie animation JSON.
+#
+# Animations are kept in a process-wide memory cache (shared by every session
+# and surviving Streamlit reruns) backed by an on-disk cache with a TTL. Missing
+# animations are fetched in parallel with a per-request timeout, and stale ones
+# can be served immediately while a background refresh runs.
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import requests
+
+import config
+
+
+# Hit/miss/latency counters for the loader
+class LoaderStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.memory_hits = 0
+            self.disk_hits = 0
+            self.misses = 0
+            self.stale_served = 0
+            self.refreshes = 0
+            self.errors = 0
+            self.fetches = 0
+            self.fetch_seconds_total = 0.0
+            self.fetch_seconds_max = 0.0
+            self.recent_latencies = deque(maxlen=500)
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def record_fetch(self, seconds):
+        with self._lock:
+            self.fetches += 1
+            self.fetch_seconds_total += seconds
+            self.fetch_seconds_max = max(self.fetch_seconds_max, seconds)
+            self.recent_latencies.append(seconds)
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(self.recent_latencies)
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "stale_served": self.stale_served,
+                "refreshes": self.refreshes,
+                "errors": self.errors,
+                "fetches": self.fetches,
+                "fetch_seconds_avg": self.fetch_seconds_total / self.fetches if self.fetches else 0.0,
+                "fetch_seconds_p50": _percentile(latencies, 0.50),
+                "fetch_seconds_p95": _percentile(latencies, 0.95),
+                "fetch_seconds_max": self.fetch_seconds_max,
+            }
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(q * len(sorted_values)))
+    return sorted_values[index]
+
+
+stats = LoaderStats()
+
+_memory = {}  # url -> (fetched_at, animation)
+_inflight = {}  # url -> Future of a running fetch
+_failures = {}  # url -> time of the last failed fetch
+_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=config.LOTTIE_MAX_WORKERS, thread_name_prefix="lottie")
+_http = requests.Session()
+
+
+# Function to check that a payload looks like a Lottie animation
+def is_valid_animation(data):
+    return isinstance(data, dict) and isinstance(data.get("layers"), list)
+
+
+def _disk_path(url):
+    digest = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    return os.path.join(config.LOTTIE_CACHE_DIR, digest + ".json")
+
+
+def _read_disk(url):
+    path = _disk_path(url)
+    try:
+        fetched_at = os.path.getmtime(path)
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not is_valid_animation(data):
+        # Corrupt or truncated entry: drop it so the next load refetches
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return None
+    return fetched_at, data
+
+
+def _write_disk(url, data):
+    path = _disk_path(url)
+    tmp_path = "%s.%d.%d.tmp" % (path, os.getpid(), threading.get_ident())
+    try:
+        os.makedirs(config.LOTTIE_CACHE_DIR, exist_ok=True)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+# Function to download one animation, storing it in both caches on success
+def _fetch(url):
+    started = time.perf_counter()
+    try:
+        r = _http.get(url, timeout=config.LOTTIE_TIMEOUT)
+        if r.status_code != 200:
+            raise ValueError("HTTP %d" % r.status_code)
+        data = r.json()
+        if not is_valid_animation(data):
+            raise ValueError("response is not a Lottie animation")
+    except (requests.RequestException, ValueError):
+        stats.incr("errors")
+        with _lock:
+            _failures[url] = time.time()
+        return None
+    finally:
+        stats.record_fetch(time.perf_counter() - started)
+
+    with _lock:
+        _memory[url] = (time.time(), data)
+        _failures.pop(url, None)
+    _write_disk(url, data)
+    return data
+
+
+def _fetch_done(url, future):
+    with _lock:
+        if _inflight.get(url) is future:
+            del _inflight[url]
+
+
+# Function to start a fetch, sharing one in-flight request per URL
+def _fetch_async(url):
+    with _lock:
+        future = _inflight.get(url)
+        if future is not None:
+            return future
+        future = _executor.submit(_fetch, url)
+        _inflight[url] = future
+    # Registered outside the lock: a future that already finished runs the
+    # callback right here, and _fetch_done takes the lock itself
+    future.add_done_callback(lambda done: _fetch_done(url, done))
+    return future
+
+
+def _cached(url):
+    with _lock:
+        entry = _memory.get(url)
+    if entry is not None:
+        return entry, "memory"
+    entry = _read_disk(url)
+    if entry is not None:
+        with _lock:
+            _memory.setdefault(url, entry)
+        return entry, "disk"
+    return None, None
+
+
+def _recently_failed(url):
+    with _lock:
+        failed_at = _failures.get(url)
+    return failed_at is not None and time.time() - failed_at < config.LOTTIE_FAILURE_TTL
+
+
+# Function to resolve a URL from cache. Returns (animation, needs_fetch).
+def _lookup(url):
+    entry, source = _cached(url)
+    if entry is None:
+        stats.incr("misses")
+        # Don't make every rerun wait on an endpoint that just failed
+        return None, not _recently_failed(url)
+
+    fetched_at, data = entry
+    stats.incr("memory_hits" if source == "memory" else "disk_hits")
+    if time.time() - fetched_at < config.LOTTIE_TTL:
+        return data, False
+
+    if config.LOTTIE_STALE_WHILE_REVALIDATE:
+        stats.incr("stale_served")
+        if not _recently_failed(url):
+            stats.incr("refreshes")
+            _fetch_async(url)
+        return data, False
+
+    # Stale and not allowed to serve it as-is: refetch, but keep it as a fallback
+    return data, True
+
+
+# Function to load several animations at once within a shared deadline.
+# Returns a list in the same order as urls, with None for animations that
+# could not be loaded in time (those keep downloading in the background).
+def load_lotties(urls, deadline=None):
+    if deadline is None:
+        deadline = config.LOTTIE_DEADLINE
+
+    results = {}
+    pending = {}
+    for url in dict.fromkeys(urls):
+        data, needs_fetch = _lookup(url)
+        results[url] = data
+        if needs_fetch:
+            pending[url] = _fetch_async(url)
+
+    if pending:
+        wait(pending.values(), timeout=deadline)
+        for url, future in pending.items():
+            if future.done() and future.result() is not None:
+                results[url] = future.result()
+
+    return [results[url] for url in urls]
+
+
+# Function to load a single animation
+def load_lottieurl(url, deadline=None):
+    return load_lotties([url], deadline=deadline)[0]
+
+
+# Function to drop every cached animation from memory (the disk cache is kept)
+def clear_memory_cache():
+    with _lock:
+        _memory.clear()
@@ -0,0 +1,373 @@
+# Lightweight in-process metrics, exposed in the Prometheus text format.
+#
+# span("Scoring") times a block into the lu_stage_seconds histogram; reruns,
+# assessments and exceptions caught by the app's handlers are counters, and
+# the hit/miss counters the caches already keep are read at scrape time. With
+# METRICS_ENABLED off, span() hands back one shared no-op context manager and
+# nothing is recorded, so instrumented code pays a function call.
+#
+# The Streamlit process serves GET /metrics on METRICS_ADDRESS:METRICS_PORT
+# from a background thread started by the first rerun; api.py serves the same
+# page for its own process.
+#
+# When METRICS_TRACE_SAMPLE_RATE is above 0, that fraction of reruns also
+# records every nested span and is written to METRICS_TRACE_DIR as folded
+# stacks ("rerun;Scoring 1234" per line, self time in microseconds), the input
+# of flamegraph.pl and speedscope.
+import bisect
+import os
+import random
+import sys
+import threading
+import time
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import config
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_NOOP = nullcontext()
+_local = threading.local()
+_server = None
+_server_lock = threading.Lock()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{%s}" % ",".join('%s="%s"' % (name, _escape(value)) for name, value in pairs)
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels[name] for name in self.labelnames), 0)
+
+    def render(self):
+        lines = ["# HELP %s %s" % (self.name, self.help), "# TYPE %s counter" % self.name]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines += ["%s%s %s" % (self.name, _labels(self.labelnames, key), _number(value)) for key, value in items]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self._series = {}  # label values -> [bucket counts, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels):
+        series = self._series.get(tuple(labels[name] for name in self.labelnames))
+        return series[2] if series else 0
+
+    def render(self):
+        lines = ["# HELP %s %s" % (self.name, self.help), "# TYPE %s histogram" % self.name]
+        with self._lock:
+            items = sorted((key, ([*series[0]], series[1], series[2])) for key, series in self._series.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                lines.append("%s_bucket%s %d" % (self.name, _labels(self.labelnames, key, [("le", _number(bound))]),
+                                                 cumulative))
+            lines.append("%s_sum%s %s" % (self.name, _labels(self.labelnames, key), repr(total)))
+            lines.append("%s_count%s %d" % (self.name, _labels(self.labelnames, key), count))
+        return lines
+
+
+RERUNS = Counter("lu_reruns_total", "Script reruns of the Streamlit app.", ["mode"])
+RERUN_SECONDS = Histogram("lu_rerun_seconds", "Wall time of a whole script rerun.", ["mode"])
+STAGE_SECONDS = Histogram("lu_stage_seconds", "Wall time of instrumented stages.", ["stage"])
+ASSESSMENTS = Counter("lu_assessments_total", "Respondents scored.", ["source", "risk_level"])
+EXCEPTIONS = Counter("lu_exceptions_total", "Exceptions caught and shown to the user.", ["handler"])
+ADMISSION_SHED = Counter("lu_admission_shed_total", "Analyses refused by admission control.", ["reason"])
+ADMISSION_DEGRADED = Counter("lu_admission_degraded_total", "Analyses run without the optional charts.")
+ADMISSION_WAIT_SECONDS = Histogram("lu_admission_wait_seconds", "Time admitted analyses spent queued.")
+SESSION_COMPACTIONS = Counter("lu_session_compactions_total", "Idle sessions whose files and cached messages were released.")
+SESSION_EVICTIONS = Counter("lu_session_evictions_total", "Idle sessions closed.")
+METRICS = [RERUNS, RERUN_SECONDS, STAGE_SECONDS, ASSESSMENTS, EXCEPTIONS, ADMISSION_SHED, ADMISSION_DEGRADED,
+           ADMISSION_WAIT_SECONDS, SESSION_COMPACTIONS, SESSION_EVICTIONS]
+
+
+# Function to read a process's resident set size in bytes from /proc.
+# Returns None where /proc is not available.
+def process_rss(pid):
+    try:
+        with open("/proc/%d/status" % pid, "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+# Function to read the counters the caches keep themselves. Modules that were
+# never imported are skipped rather than loaded just to report zeros.
+def cache_samples():
+    samples = []
+    figures = sys.modules.get("figures")
+    if figures is not None:
+        samples.append(("figures", figures.cache.hits, figures.cache.shared_hits + figures.cache.misses))
+        if config.FIGURE_SHARED_CACHE:
+            samples.append(("figures_shared", figures.cache.shared_hits, figures.cache.misses))
+    explain = sys.modules.get("explain")
+    if explain is not None:
+        info = explain._explain_row.cache_info()
+        samples.append(("explanations", info.hits, info.misses))
+    whatif = sys.modules.get("whatif")
+    if whatif is not None:
+        info = whatif._sweep.cache_info()
+        samples.append(("whatif", info.hits, info.misses))
+    lottie_loader = sys.modules.get("lottie_loader")
+    if lottie_loader is not None:
+        stats = lottie_loader.stats.snapshot()
+        samples.append(("lottie", stats["memory_hits"] + stats["disk_hits"], stats["misses"]))
+    return samples
+
+
+def _render_caches():
+    samples = cache_samples()
+    lines = []
+    for name, help, index in (("lu_cache_hits_total", "Cache lookups answered from the cache.", 1),
+                              ("lu_cache_misses_total", "Cache lookups that had to compute or fetch.", 2)):
+        lines += ["# HELP %s %s" % (name, help), "# TYPE %s counter" % name]
+        lines += ['%s{cache="%s"} %d' % (name, sample[0], sample[index]) for sample in samples]
+    return lines
+
+
+def _render_assessment_log():
+    assessment_log = sys.modules.get("assessment_log")
+    log = assessment_log._log if assessment_log is not None else None
+    if log is None:
+        return []
+    stats = log.stats()
+    return [
+        "# HELP lu_assessment_log_records_total Assessment log records by outcome.",
+        "# TYPE lu_assessment_log_records_total counter",
+        'lu_assessment_log_records_total{outcome="written"} %d' % stats["written"],
+        'lu_assessment_log_records_total{outcome="dropped"} %d' % stats["dropped"],
+        'lu_assessment_log_records_total{outcome="sampled_out"} %d' % stats["sampled"],
+        "# HELP lu_assessment_log_buffered Records waiting to be written.",
+        "# TYPE lu_assessment_log_buffered gauge",
+        "lu_assessment_log_buffered %d" % stats["buffered"],
+    ]
+
+
+def _render_admission():
+    admission = sys.modules.get("admission")
+    if admission is None:
+        return []
+    return [
+        "# HELP lu_admission_active Analyses running now.",
+        "# TYPE lu_admission_active gauge",
+        "lu_admission_active %d" % admission.gate.active,
+        "# HELP lu_admission_queue_depth Analyses waiting for a slot.",
+        "# TYPE lu_admission_queue_depth gauge",
+        "lu_admission_queue_depth %d" % admission.gate.depth,
+    ]
+
+
+# Session sizes come from the sweeper's last measurement; measuring every
+# session again on each scrape would be too slow
+def _render_sessions():
+    session_memory = sys.modules.get("session_memory")
+    report = session_memory.last_report if session_memory is not None else None
+    if report is None:
+        return []
+    lines = [
+        "# HELP lu_sessions Sessions at the last sweep.",
+        "# TYPE lu_sessions gauge",
+        "lu_sessions %d" % len(report),
+        "# HELP lu_session_bytes Memory held by all sessions at the last sweep.",
+        "# TYPE lu_session_bytes gauge",
+    ]
+    for kind in session_memory.KINDS:
+        lines.append('lu_session_bytes{kind="%s"} %d' % (kind, sum(entry[kind] for entry in report)))
+    return lines
+
+
+# Function to render every metric in the Prometheus text exposition format
+def render():
+    lines = []
+    for metric in METRICS:
+        lines += metric.render()
+    lines += _render_caches()
+    lines += _render_assessment_log()
+    lines += _render_admission()
+    lines += _render_sessions()
+    return "\n".join(lines) + "\n"
+
+
+# Folded-stack recorder for one sampled rerun
+class Trace:
+    def __init__(self, root):
+        self.stack = [root]
+        self.child_seconds = [0.0]  # time spent in child spans of each open frame
+        self.self_seconds = {}  # "root;stage;..." -> self time
+
+    def push(self, name):
+        self.stack.append(name)
+        self.child_seconds.append(0.0)
+
+    def pop(self, elapsed):
+        path = ";".join(self.stack)
+        self.self_seconds[path] = self.self_seconds.get(path, 0.0) + elapsed - self.child_seconds.pop()
+        self.stack.pop()
+        if self.child_seconds:
+            self.child_seconds[-1] += elapsed
+
+    def folded(self):
+        return "".join("%s %d\n" % (path, round(seconds * 1e6))
+                       for path, seconds in self.self_seconds.items() if seconds > 0)
+
+
+class _Span:
+    __slots__ = ("name", "started", "trace")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.trace = getattr(_local, "trace", None)
+        if self.trace is not None:
+            self.trace.push(self.name)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.started
+        STAGE_SECONDS.observe(elapsed, stage=self.name)
+        if self.trace is not None:
+            self.trace.pop(elapsed)
+        return False
+
+
+# Function to time a block of code as a named stage
+def span(name):
+    if not config.METRICS_ENABLED:
+        return _NOOP
+    return _Span(name)
+
+
+# Function to mark the start of a script rerun. Also starts the metrics
+# endpoint the first time and decides whether this rerun is traced.
+def start_rerun():
+    if not config.METRICS_ENABLED:
+        return
+    ensure_server()
+    _local.rerun_started = time.perf_counter()
+    rate = config.METRICS_TRACE_SAMPLE_RATE
+    _local.trace = Trace("rerun") if rate > 0 and random.random() < rate else None
+
+
+# Function to mark the end of a rerun; call it before st.stop() too
+def end_rerun(mode):
+    started = getattr(_local, "rerun_started", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    _local.rerun_started = None
+    RERUNS.inc(mode=mode)
+    RERUN_SECONDS.observe(elapsed, mode=mode)
+    trace, _local.trace = getattr(_local, "trace", None), None
+    if trace is not None:
+        trace.pop(elapsed)
+        write_trace(trace)
+
+
+# Function to write a sampled rerun's folded stacks to METRICS_TRACE_DIR
+def write_trace(trace):
+    path = os.path.join(config.METRICS_TRACE_DIR, "rerun-%d-%d.folded" % (time.time() * 1000, threading.get_ident()))
+    try:
+        os.makedirs(config.METRICS_TRACE_DIR, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(trace.folded())
+    except OSError as e:
+        print("Could not write trace %s: %s" % (path, e), file=sys.stderr)
+        return None
+    return path
+
+
+# Function to count scored respondents by risk level
+def count_assessments(scores, source):
+    if not config.METRICS_ENABLED:
+        return
+    levels = {}
+    for level in scores["risk_level"].tolist():
+        levels[level] = levels.get(level, 0) + 1
+    for level, n in levels.items():
+        ASSESSMENTS.inc(n, source=source, risk_level=level)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+# Function to start the /metrics endpoint once per process. A port that is
+# already taken is reported once and otherwise ignored.
+def ensure_server():
+    global _server
+    if _server is not None or config.METRICS_PORT <= 0:
+        return
+    with _server_lock:
+        if _server is not None:
+            return
+        try:
+            _server = ThreadingHTTPServer((config.METRICS_ADDRESS, config.METRICS_PORT), _Handler)
+        except OSError as e:
+            print("Metrics endpoint not started on port %d: %s" % (config.METRICS_PORT, e), file=sys.stderr)
+            _server = False
+            return
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
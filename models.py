@@ -0,0 +1,252 @@
+# Model backends for risk scoring.
+#
+# A backend turns an encoded feature matrix (see scoring.encode) into
+# probabilities and carries the version every result is tagged with. The
+# active model is loaded once per process and shared by every session. Trained
+# models are published to MODEL_DIR as
+#
+#   current.json          {"version": "...", "type": "logistic", "weights": "<version>.npy"}
+#   <version>.npy         float64 [intercept, one coefficient per FEATURES column]
+#
+# Weight files are memory-mapped, so worker processes share their pages.
+# Publishing a new version (write the weights, then atomically replace
+# current.json, as `train` does) is picked up by running processes within
+# MODEL_RELOAD_INTERVAL seconds; requests already in flight finish on the
+# model they started with.
+#
+#   python models.py train survey.csv [--version NAME]
+#   python models.py info
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+import config
+import scoring
+
+VERSION_FILE = "current.json"
+
+# Model inputs are 0/1 indicators (yes, female) plus the age in years
+INPUT_OFFSETS = np.array([0 if name == "AGE" else 1 for name in scoring.FEATURES], dtype=np.float64)
+
+_model = None
+_model_stamp = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+class ModelBackend:
+    version = None
+
+    # Function to score an encoded feature matrix. Returns float64 probabilities.
+    def probability(self, features):
+        raise NotImplementedError
+
+
+# Rule-based development model (scoring.mock_probability)
+class MockModel(ModelBackend):
+    version = "mock-1"
+
+    def probability(self, features):
+        return scoring.mock_probability(features)
+
+
+# Logistic regression over the FEATURES columns
+class LogisticModel(ModelBackend):
+    def __init__(self, version, weights):
+        if weights.shape != (len(scoring.FEATURES) + 1,):
+            raise ValueError("Model %s has %d weights, expected %d"
+                             % (version, len(weights), len(scoring.FEATURES) + 1))
+        self.version = version
+        self.weights = weights
+        # Fold the 1/2 -> 0/1 input offsets into the intercept once
+        self.coefficients = np.array(weights[1:], dtype=np.float64)
+        self.intercept = float(weights[0] - self.coefficients @ INPUT_OFFSETS)
+
+    @classmethod
+    def load(cls, model_dir, info):
+        weights = np.load(os.path.join(model_dir, info["weights"]), mmap_mode="r")
+        return cls(info["version"], weights)
+
+    def probability(self, features):
+        z = np.full(len(features), self.intercept)
+        for column, coefficient in enumerate(self.coefficients):
+            z += coefficient * features[:, column]
+        return 1.0 / (1.0 + np.exp(-z))
+
+
+BACKENDS = {"logistic": LogisticModel}
+
+
+def _version_path(model_dir=None):
+    return os.path.join(model_dir or config.MODEL_DIR, VERSION_FILE)
+
+
+def _stamp(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+# Function to read the published model info, or None when nothing is published
+def published_info(model_dir=None):
+    try:
+        with open(_version_path(model_dir), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+# Function to load the configured model. Falls back to the mock model when
+# LU_MODEL_BACKEND is "auto" and no model has been published.
+def load_model(model_dir=None):
+    model_dir = model_dir or config.MODEL_DIR
+    if config.MODEL_BACKEND == "mock":
+        return MockModel()
+
+    info = published_info(model_dir)
+    if info is None:
+        if config.MODEL_BACKEND == "auto":
+            return MockModel()
+        raise ValueError("No model published in %s" % model_dir)
+    if config.MODEL_BACKEND != "auto" and info.get("type") != config.MODEL_BACKEND:
+        raise ValueError("Published model is %s, expected %s" % (info.get("type"), config.MODEL_BACKEND))
+    if info.get("features", scoring.FEATURES) != scoring.FEATURES:
+        raise ValueError("Model %s was trained on different features" % info.get("version"))
+    try:
+        backend = BACKENDS[info["type"]]
+    except KeyError:
+        raise ValueError("Unknown model type: %s" % info.get("type"))
+    return backend.load(model_dir, info)
+
+
+# Function to get the process-wide model. The version file is checked at most
+# every MODEL_RELOAD_INTERVAL seconds and a changed one is loaded and swapped
+# in; if the new model fails to load, the current one stays active and the
+# load is retried on the next check.
+def get_model():
+    global _model, _model_stamp, _checked_at
+    now = time.monotonic()
+    if _model is not None and now - _checked_at < config.MODEL_RELOAD_INTERVAL:
+        return _model
+
+    with _lock:
+        if _model is None or now - _checked_at >= config.MODEL_RELOAD_INTERVAL:
+            stamp = _stamp(_version_path())
+            if _model is None or stamp != _model_stamp:
+                try:
+                    model = load_model()
+                except (OSError, ValueError, KeyError) as e:
+                    if _model is None:
+                        raise
+                    print("Keeping model %s, reload failed: %s" % (_model.version, e), file=sys.stderr)
+                else:
+                    _model = model
+                    _model_stamp = stamp
+            _checked_at = now
+    return _model
+
+
+# Function to fit logistic regression weights with Newton's method (IRLS).
+# features is an encoded matrix, outcome a 0/1 array.
+def fit_logistic(features, outcome, l2=1e-3, max_iter=50):
+    inputs = features - INPUT_OFFSETS
+    design = np.column_stack([np.ones(len(inputs)), inputs])
+    weights = np.zeros(design.shape[1])
+    penalty = l2 * np.eye(len(weights))
+    penalty[0, 0] = 0.0  # the intercept is not regularized
+    for _ in range(max_iter):
+        p = 1.0 / (1.0 + np.exp(-(design @ weights)))
+        hessian = design.T @ (design * (p * (1 - p))[:, None]) + penalty
+        gradient = design.T @ (outcome - p) - penalty @ weights
+        step = np.linalg.solve(hessian, gradient)
+        weights += step
+        if np.abs(step).max() < 1e-8:
+            break
+    return weights
+
+
+# Function to publish a new model version. The weights are written first and
+# current.json is replaced last, so readers never see a partial model.
+def publish(weights, version, model_dir=None, model_type="logistic"):
+    model_dir = model_dir or config.MODEL_DIR
+    os.makedirs(model_dir, exist_ok=True)
+    weights_name = "%s.npy" % version
+    tmp_path = os.path.join(model_dir, weights_name + ".tmp.npy")
+    np.save(tmp_path, np.asarray(weights, dtype=np.float64))
+    os.replace(tmp_path, os.path.join(model_dir, weights_name))
+
+    info = {
+        "version": version,
+        "type": model_type,
+        "weights": weights_name,
+        "features": scoring.FEATURES,
+        "published_at": time.time(),
+    }
+    tmp_path = _version_path(model_dir) + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(info, f, indent=2)
+    os.replace(tmp_path, _version_path(model_dir))
+    return info
+
+
+# LUNG_CANCER values accepted in training data, coded like the survey
+# answers (1 = No, 2 = Yes) or spelled out
+OUTCOME_CODES = {"YES": 1.0, "2": 1.0, "NO": 0.0, "1": 0.0}
+
+
+# Function to read a labelled survey file (FEATURES plus LUNG_CANCER as
+# YES/NO or 2/1)
+def read_training_data(path):
+    frame = pd.read_csv(path)
+    frame.columns = [name.strip().replace(" ", "_") for name in frame.columns]
+    if "LUNG_CANCER" not in frame.columns:
+        raise ValueError("Training data needs a LUNG_CANCER column")
+    outcome = frame["LUNG_CANCER"].astype(str).str.strip().str.upper().map(OUTCOME_CODES)
+    invalid = outcome.isna()
+    if invalid.any():
+        raise ValueError("LUNG_CANCER must be YES/NO or 2/1 (%d invalid rows, e.g. %r)"
+                         % (invalid.sum(), frame["LUNG_CANCER"][invalid].iloc[0]))
+    return scoring.encode(frame), outcome.to_numpy(dtype=np.float64)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train, publish or inspect risk models.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    train = sub.add_parser("train", help="fit logistic regression on a labelled CSV and publish it")
+    train.add_argument("data", help="CSV with the FEATURES columns and LUNG_CANCER (YES/NO or 2/1)")
+    train.add_argument("--version", help="version name (default: logistic-<timestamp>)")
+    train.add_argument("--l2", type=float, default=1e-3)
+    train.add_argument("--model-dir", default=config.MODEL_DIR)
+    info = sub.add_parser("info", help="show the active model")
+    info.add_argument("--model-dir", default=config.MODEL_DIR)
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "train":
+            features, outcome = read_training_data(args.data)
+            weights = fit_logistic(features, outcome, l2=args.l2)
+            version = args.version or time.strftime("logistic-%Y%m%d%H%M%S")
+            publish(weights, version, args.model_dir)
+            model = LogisticModel(version, weights)
+            accuracy = ((model.probability(features) >= scoring.PREDICTION_THRESHOLD) == outcome).mean()
+            print("Published %s (%d rows, training accuracy %.3f) to %s"
+                  % (version, len(features), accuracy, args.model_dir))
+        else:
+            model = load_model(args.model_dir)
+            print("Active model: %s (%s)" % (model.version, type(model).__name__))
+    except (OSError, ValueError) as e:
+        print("error: %s" % e, file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,241 @@
+# Population percentiles: "how do you compare" against a reference cohort.
+#
+# The cohort is scored offline and reduced to a histogram of probabilities
+# (BINS + 1 bins of width 1 / BINS) per age band and gender. At request time a
+# percentile is one read from a cumulative count table, so nothing scans the
+# cohort. Probabilities depend on the model, so each model version has its
+# own index file (percentiles-<version>.npy plus a .json with its metadata).
+# New respondents can be added to a loaded index with add() and saved again.
+#
+# A running process picks up a rebuilt or extended index file within
+# PERCENTILE_RELOAD_INTERVAL seconds. With PERCENTILE_ADD_ASSESSMENTS on, the
+# assessment log's writer also adds every logged UI assessment to the loaded
+# index. Those additions live in memory only (each worker keeps its own) and
+# are carried over when the file is reloaded.
+#
+#   python percentiles.py build cohort.csv
+#   python percentiles.py add more_respondents.parquet
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+import batch_io
+import config
+import scoring
+
+BINS = 200
+AGE_BAND_EDGES = np.array([40, 50, 60, 70, 80])
+AGE_BANDS = ["under 40", "40-49", "50-59", "60-69", "70-79", "80 and over"]
+GENDER_LABELS = ["Men", "Women"]
+GROUPS = len(AGE_BANDS) * 2
+
+_current = (None, None, None)  # (model version, index or None, index file mtime)
+_checked_at = 0.0  # time.monotonic() of the last index file check
+_lock = threading.Lock()
+
+
+# Function to get the index file of a model version
+def index_path(version, path=None):
+    base, ext = os.path.splitext(path or config.PERCENTILE_INDEX_PATH)
+    return "%s-%s%s" % (base, version, ext)
+
+
+def _meta_path(path):
+    return os.path.splitext(path)[0] + ".json"
+
+
+# Function to get each row's age band and gender group index
+def group_index(features):
+    band = np.searchsorted(AGE_BAND_EDGES, features[:, scoring.COLUMN["AGE"]], side="right")
+    return band * 2 + features[:, scoring.COLUMN["GENDER"]] - 1
+
+
+def group_label(group):
+    return "%s aged %s" % (GENDER_LABELS[group % 2], AGE_BANDS[group // 2])
+
+
+def _bins(probability):
+    return np.rint(np.clip(probability, 0.0, 1.0) * BINS).astype(np.intp)
+
+
+class PercentileIndex:
+    def __init__(self, counts, model_version):
+        self.counts = counts  # (GROUPS, BINS + 1) respondents per group and bin
+        self.added = np.zeros_like(counts)  # the part of counts added since loading
+        self.model_version = model_version
+        self._lock = threading.Lock()
+        self._refresh()
+
+    # Function to rebuild the cumulative tables used by lookups. Percentiles
+    # count everyone below a bin plus half of the bin itself ("mid-rank").
+    def _refresh(self):
+        overall = self.counts.sum(axis=0)
+        counts = np.vstack([self.counts, overall])
+        below = np.cumsum(counts, axis=1) - counts
+        self._tables = (below + counts / 2.0, counts.sum(axis=1))
+
+    @property
+    def size(self):
+        return int(self._tables[1][-1])
+
+    # Function to add scored respondents to the index
+    def add(self, features, probability):
+        with self._lock:
+            cells = (group_index(features), _bins(probability))
+            np.add.at(self.counts, cells, 1)
+            np.add.at(self.added, cells, 1)
+            self._refresh()
+
+    # Function to carry another index's additions over into this one
+    def merge_added(self, other):
+        with self._lock, other._lock:
+            self.counts += other.added
+            self.added += other.added
+            self._refresh()
+
+    # Function to look up percentiles for scored rows. Returns a dict of
+    # arrays: overall and within-group percentiles (0-100) and group sizes.
+    def lookup(self, features, probability):
+        bins = _bins(probability)
+        groups = group_index(features)
+        mid_rank, sizes = self._tables
+        return {
+            "overall": mid_rank[-1, bins] / max(sizes[-1], 1) * 100,
+            "group": mid_rank[groups, bins] / np.maximum(sizes[groups], 1) * 100,
+            "group_size": sizes[groups],
+            "groups": groups,
+        }
+
+    # Function to look up one respondent, as plain Python values
+    def lookup_one(self, features, probability):
+        result = self.lookup(features[:1], np.atleast_1d(probability))
+        group = int(result["groups"][0])
+        return {
+            "overall": float(result["overall"][0]),
+            "group": float(result["group"][0]),
+            "group_label": group_label(group),
+            "group_size": int(result["group_size"][0]),
+            "cohort_size": self.size,
+        }
+
+    def save(self, path=None):
+        path = index_path(self.model_version, path)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._lock:
+            counts = self.counts.copy()
+        tmp_path = path + ".tmp.npy"
+        np.save(tmp_path, counts)
+        os.replace(tmp_path, path)
+        meta = {
+            "model_version": self.model_version,
+            "bins": BINS,
+            "age_band_edges": AGE_BAND_EDGES.tolist(),
+            "size": int(counts.sum()),
+            "updated_at": time.time(),
+        }
+        with open(_meta_path(path), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        return meta
+
+
+# Function to make an empty index for a model (the active one by default)
+def empty(model=None):
+    model = model or scoring.active_model()
+    return PercentileIndex(np.zeros((GROUPS, BINS + 1), dtype=np.int64), model.version)
+
+
+# Function to load a model's index from disk. Returns None when it is missing
+# or was built for a different model or layout.
+def load(path=None, model=None):
+    model = model or scoring.active_model()
+    path = index_path(model.version, path)
+    try:
+        with open(_meta_path(path), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        counts = np.load(path)
+    except (OSError, ValueError):
+        return None
+    if (
+        meta.get("model_version") != model.version
+        or meta.get("bins") != BINS
+        or meta.get("age_band_edges") != AGE_BAND_EDGES.tolist()
+        or counts.shape != (GROUPS, BINS + 1)
+    ):
+        return None
+    return PercentileIndex(counts, model.version)
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+# Function to get the process-wide index for a model, loading it on first use,
+# whenever the model version changes and whenever its file was rewritten
+# (checked at most every PERCENTILE_RELOAD_INTERVAL seconds)
+def get_index(model=None):
+    global _current, _checked_at
+    model = model or scoring.active_model()
+    version, index, _ = _current
+    if version == model.version and time.monotonic() - _checked_at < config.PERCENTILE_RELOAD_INTERVAL:
+        return index
+    with _lock:
+        version, index, mtime = _current
+        _checked_at = time.monotonic()
+        # save() writes the metadata last, so its mtime marks a complete index
+        current_mtime = _mtime(_meta_path(index_path(model.version)))
+        if version != model.version or current_mtime != mtime:
+            fresh = load(model=model)
+            if fresh is not None and index is not None and version == model.version:
+                fresh.merge_added(index)
+            index = fresh
+            _current = (model.version, index, current_mtime)
+    return index
+
+
+# Function to score a cohort file chunk by chunk and add it to an index
+def add_file(index, path, model=None):
+    model = model or scoring.active_model()
+    file_format = batch_io.detect_format(path)
+    rows = 0
+    with open(path, "rb") as source:
+        for frame in batch_io.iter_chunks(source, file_format):
+            features = scoring.encode(frame)
+            index.add(features, scoring.predict_probability(features, model))
+            rows += len(features)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or extend the population percentile index.")
+    parser.add_argument("command", choices=["build", "add"],
+                        help="build a new index from a cohort file, or add respondents to the existing one")
+    parser.add_argument("cohort", help="CSV or Parquet file with the FEATURES columns")
+    parser.add_argument("--path", default=config.PERCENTILE_INDEX_PATH,
+                        help="index file (.npy); the model version is added to the name")
+    args = parser.parse_args(argv)
+
+    model = scoring.active_model()
+    try:
+        index = empty(model) if args.command == "build" else load(args.path, model)
+        if index is None:
+            raise ValueError("No index for model %s at %s" % (model.version, index_path(model.version, args.path)))
+        rows = add_file(index, args.cohort, model)
+    except (OSError, ValueError) as e:
+        print("error: %s" % e, file=sys.stderr)
+        return 1
+    meta = index.save(args.path)
+    print("Added %d respondents; index for model %s now holds %d: %s"
+          % (rows, model.version, meta["size"], index_path(model.version, args.path)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+# Progress reporting driven by the real stages of the assessment pipeline.
+#
+# Each stage is timed with a context manager; the progress bar only moves when
+# a stage actually starts, so it never adds wall-clock delay of its own.
+import time
+from contextlib import contextmanager
+
+import streamlit as st
+
+import config
+import metrics
+
+ANALYSIS_STAGES = [
+    "Encoding inputs",
+    "Scoring",
+    "Explaining score",
+    "Generating recommendations",
+    "Building charts",
+]
+
+
+class StageProgress:
+    def __init__(self, stages=ANALYSIS_STAGES, show=None):
+        self.stages = list(stages)
+        self.timings = {}
+        self.show = config.PROGRESS_ANIMATION if show is None else show
+        self._started = time.perf_counter()
+        self._bar = st.progress(0, text="Starting analysis...") if self.show else None
+
+    # Function to time one stage and advance the bar when it starts
+    @contextmanager
+    def stage(self, name):
+        if self._bar is not None:
+            done = self.stages.index(name) if name in self.stages else len(self.timings)
+            self._bar.progress(int(100 * done / len(self.stages)), text=name + "...")
+        started = time.perf_counter()
+        try:
+            with metrics.span(name):
+                yield
+        finally:
+            self.timings[name] = time.perf_counter() - started
+
+    @property
+    def total(self):
+        return time.perf_counter() - self._started
+
+    # Function to describe the per-stage timings, e.g. "Scoring 0.4 ms"
+    def summary(self):
+        parts = ["%s %.1f ms" % (name, seconds * 1000) for name, seconds in self.timings.items()]
+        return " · ".join(parts)
+
+    def finish(self):
+        if self._bar is None:
+            return
+        self._bar.empty()
+        st.success("Analysis Complete!")
+        st.caption("Completed in %.1f ms (%s)" % (self.total * 1000, self.summary()))
@@ -0,0 +1,154 @@
+# Personalized recommendations for one respondent or a whole batch.
+#
+# Rules are plain data: the flags that must be Yes ("all"), the flags that
+# must be No ("none"), a message and a priority. At import time every rule is
+# compiled into a (mask, value) pair over a packed per-row bit vector, so one
+# `(packed & mask) == value` pass evaluates all rules for one row or millions.
+import hashlib
+import json
+
+import numpy as np
+
+from scoring import COLUMN, YES_NO_FEATURES, pack_flags
+
+# Derived yes/no facts, packed after the YES_NO_FEATURES bits
+DERIVED_FLAGS = {
+    "AGE_OVER_60": lambda f: f[:, COLUMN["AGE"]] > 60,
+    "FEMALE": lambda f: f[:, COLUMN["GENDER"]] == 2,
+}
+FLAG_NAMES = YES_NO_FEATURES + list(DERIVED_FLAGS)
+FLAG_BIT = {name: bit for bit, name in enumerate(FLAG_NAMES)}
+
+# Recommendations are shown highest priority first. The priorities keep the
+# order the app has always listed them in.
+RULES = [
+    {
+        "id": "smoking",
+        "all": ["SMOKING"],
+        "message": "Consider smoking cessation programs - smoking is a major risk factor for lung cancer.",
+        "priority": 90,
+    },
+    {
+        "id": "alcohol",
+        "all": ["ALCOHOL_CONSUMING"],
+        "message": "Reduce alcohol consumption to improve overall health.",
+        "priority": 80,
+    },
+    {
+        "id": "fatigue_breathlessness",
+        "all": ["FATIGUE", "SHORTNESS_OF_BREATH"],
+        "message": "The combination of fatigue and shortness of breath could indicate respiratory issues. Consider consultation.",
+        "priority": 70,
+    },
+    {
+        "id": "cough_chest_pain",
+        "all": ["COUGHING", "CHEST_PAIN"],
+        "message": "Persistent cough with chest pain should be evaluated by a healthcare professional.",
+        "priority": 60,
+    },
+    {
+        "id": "screening",
+        "all": ["AGE_OVER_60", "SMOKING"],
+        "message": "Given your age and smoking history, regular lung cancer screenings are recommended.",
+        "priority": 50,
+    },
+]
+
+
+# Function to compile rule definitions into priority-ordered rules plus
+# int32 (mask, value) arrays; a row matches rule i when
+# packed & masks[i] == values[i]
+def compile_rules(rules):
+    ids = [rule["id"] for rule in rules]
+    if len(set(ids)) != len(ids):
+        raise ValueError("Rule ids must be unique")
+
+    ordered = sorted(rules, key=lambda rule: -rule.get("priority", 0))
+    masks = np.zeros(len(ordered), dtype=np.int32)
+    values = np.zeros(len(ordered), dtype=np.int32)
+    for i, rule in enumerate(ordered):
+        required = rule.get("all", [])
+        excluded = rule.get("none", [])
+        unknown = [name for name in required + excluded if name not in FLAG_BIT]
+        if unknown:
+            raise ValueError("Rule %s: unknown flags %s" % (rule["id"], ", ".join(unknown)))
+        if set(required) & set(excluded):
+            raise ValueError("Rule %s can never match" % rule["id"])
+        for name in required:
+            masks[i] |= 1 << FLAG_BIT[name]
+            values[i] |= 1 << FLAG_BIT[name]
+        for name in excluded:
+            masks[i] |= 1 << FLAG_BIT[name]
+    return ordered, masks, values
+
+
+COMPILED_RULES, RULE_MASKS, RULE_VALUES = compile_rules(RULES)
+RULE_IDS = [rule["id"] for rule in COMPILED_RULES]
+MESSAGES = [rule["message"] for rule in COMPILED_RULES]
+
+# Changes whenever the rules do, so cached batch results are not reused
+RULESET_ID = hashlib.sha1(json.dumps(COMPILED_RULES, sort_keys=True).encode("utf-8")).hexdigest()[:8]
+
+
+# Function to pack each row's yes/no answers and derived flags into an int32
+def pack(features):
+    packed = pack_flags(features)
+    for name, condition in DERIVED_FLAGS.items():
+        packed |= condition(features).astype(np.int32) << FLAG_BIT[name]
+    return packed
+
+
+# Function to evaluate every rule for every row. Returns a bool matrix of
+# shape (rows, len(RULES)), columns in priority order.
+def rule_matches(features):
+    packed = pack(features)
+    return (packed[:, None] & RULE_MASKS) == RULE_VALUES
+
+
+# Function to count how many rows of a batch match each rule
+def rule_hits(features, matches=None):
+    if matches is None:
+        matches = rule_matches(features)
+    return dict(zip(RULE_IDS, matches.sum(axis=0).tolist()))
+
+
+# Function to turn rule hit counts into per-rule hit rates
+def hit_rates(hits, rows):
+    return [
+        {
+            "id": rule_id,
+            "message": message,
+            "hits": hits.get(rule_id, 0),
+            "rate": hits.get(rule_id, 0) / rows if rows else 0.0,
+        }
+        for rule_id, message in zip(RULE_IDS, MESSAGES)
+    ]
+
+
+# Function to list the recommendations for one encoded row
+def recommend(features, index=0):
+    matches = rule_matches(features[index:index + 1])[0]
+    return [message for message, matched in zip(MESSAGES, matches) if matched]
+
+
+# Function to get each row's recommendations as one " | "-joined string.
+# There are only 2^len(RULES) possible combinations, so each distinct one is
+# joined once and rows just index into that list.
+def recommendation_text(features, matches=None):
+    if matches is None:
+        matches = rule_matches(features)
+    codes = matches.astype(np.int64) @ (1 << np.arange(len(MESSAGES), dtype=np.int64))
+    unique_codes, inverse = np.unique(codes, return_inverse=True)
+    texts = np.array([
+        " | ".join(m for bit, m in enumerate(MESSAGES) if code >> bit & 1)
+        for code in unique_codes
+    ], dtype=object)
+    return texts[inverse]
+
+
+# Function to list the recommendations of every row of a batch
+def recommendation_lists(features):
+    return [
+        [message for message, matched in zip(MESSAGES, row) if matched]
+        for row in rule_matches(features)
+    ]
@@ -0,0 +1,235 @@
+# Vectorized lung cancer risk scoring.
+#
+# Works on one respondent or millions at once: inputs are encoded into an
+# integer feature matrix (one row per respondent, one column per feature in
+# FEATURES order) and scored with NumPy array operations only.
+import numpy as np
+
+FEATURES = [
+    "GENDER",
+    "AGE",
+    "SMOKING",
+    "YELLOW_FINGERS",
+    "ANXIETY",
+    "PEER_PRESSURE",
+    "CHRONIC_DISEASE",
+    "FATIGUE",
+    "ALLERGY",
+    "WHEEZING",
+    "ALCOHOL_CONSUMING",
+    "COUGHING",
+    "SHORTNESS_OF_BREATH",
+    "SWALLOWING_DIFFICULTY",
+    "CHEST_PAIN",
+]
+
+# Yes/no answers are coded 1 = No, 2 = Yes; GENDER is "M" or "F" (encoded as 1 / 2)
+YES_NO_FEATURES = FEATURES[2:]
+COLUMN = {name: i for i, name in enumerate(FEATURES)}
+AGE_RANGE = (0, 120)  # plausible ages in years, inclusive
+INT16_RANGE = (np.iinfo(np.int16).min, np.iinfo(np.int16).max)
+STAGED_ROWS = 256  # encode() checks inputs up to this many rows in one pass
+
+RISK_LEVELS = np.array(["Low", "Medium", "High"])
+PREDICTIONS = np.array(["NO", "YES"])
+BAND_EDGES = np.array([0.3, 0.7])  # same boundaries as the gauge chart steps
+PREDICTION_THRESHOLD = 0.5
+
+# Mock model: probability per rule-based band (Low, Medium, High). Bump
+# models.MockModel.version whenever it changes so precomputed tables are rebuilt.
+MOCK_BAND_PROBABILITIES = np.array([0.25, 0.65, 0.85])
+
+
+def _column(data, name):
+    try:
+        values = data[name]
+    except (KeyError, ValueError, IndexError):
+        raise ValueError("Missing column: %s" % name)
+    return np.atleast_1d(np.asarray(values))
+
+
+def _encode_gender(values):
+    if values.dtype.kind in "OUS":
+        if values.dtype.kind == "S":
+            values = values.astype("U")
+        codes = np.where(values == "F", 2, np.where(values == "M", 1, 0))
+    else:
+        codes = values
+    return codes
+
+
+# Function to encode a dict, DataFrame or NumPy structured array holding the
+# FEATURES columns into an int16 matrix of shape (rows, len(FEATURES)). The
+# matrix is column-major so per-feature operations read contiguous memory.
+def encode(data):
+    missing = [name for name in FEATURES if not _has_column(data, name)]
+    if missing:
+        raise ValueError("Missing columns: %s" % ", ".join(missing))
+
+    # Numbers that don't survive the conversion to int16 (fractions,
+    # infinities, values out of range) are rejected rather than truncated or
+    # wrapped into valid-looking answers. Small inputs are gathered as float64
+    # and checked in one comparison; large ones are checked column by column,
+    # which avoids a float64 copy of the whole batch.
+    gender = _encode_gender(_column(data, "GENDER"))
+    rows = len(gender)
+    staged = rows <= STAGED_ROWS
+    matrix = np.empty((rows, len(FEATURES)), dtype=np.float64 if staged else np.int16, order="F")
+    lossy = []
+    for name in FEATURES:
+        column = gender if name == "GENDER" else _column(data, name)
+        if column.dtype.kind == "f" and np.isnan(column).any():
+            raise ValueError("Column %s has missing values" % name)
+        if len(column) != rows:
+            raise ValueError("Column %s has %d rows, expected %d" % (name, len(column), rows))
+        if staged or column.dtype.kind not in "fiu" or np.can_cast(column.dtype, np.int16):
+            matrix[:, COLUMN[name]] = column
+        elif column.dtype.kind == "f":
+            with np.errstate(invalid="ignore"):
+                matrix[:, COLUMN[name]] = column
+            if (matrix[:, COLUMN[name]] != column).any():
+                lossy.append(name)
+        elif column.min() < INT16_RANGE[0] or column.max() > INT16_RANGE[1]:
+            lossy.append(name)
+        else:
+            matrix[:, COLUMN[name]] = column
+
+    if staged:
+        with np.errstate(invalid="ignore"):
+            features = matrix.astype(np.int16, order="F")
+        mismatch = features != matrix
+        if mismatch.any():
+            lossy = [FEATURES[i] for i in np.flatnonzero(mismatch.any(axis=0))]
+    else:
+        features = matrix
+    if lossy:
+        raise ValueError("%s must hold whole numbers (found fractions or out-of-range values)" % ", ".join(lossy))
+    _validate(features)
+    return features
+
+
+def _has_column(data, name):
+    names = getattr(getattr(data, "dtype", None), "names", None)
+    if names is not None:
+        return name in names
+    return name in data
+
+
+def _validate(features):
+    errors = []
+    bad = ~np.isin(features[:, COLUMN["GENDER"]], (1, 2))
+    if bad.any():
+        errors.append("GENDER must be M or F (%d invalid rows)" % bad.sum())
+    age = features[:, COLUMN["AGE"]]
+    bad = (age < AGE_RANGE[0]) | (age > AGE_RANGE[1])
+    if bad.any():
+        errors.append("AGE must be between %d and %d (%d invalid rows)" % (AGE_RANGE + (bad.sum(),)))
+    yes_no = features[:, 2:]
+    bad = (yes_no != 1) & (yes_no != 2)
+    if bad.any():
+        columns = [YES_NO_FEATURES[i] for i in np.flatnonzero(bad.any(axis=0))]
+        errors.append("%s must be 1 (No) or 2 (Yes)" % ", ".join(columns))
+    if errors:
+        raise ValueError("; ".join(errors))
+
+
+# Function to pack each row's yes/no answers into an integer, with bit i set
+# when YES_NO_FEATURES[i] is answered Yes
+def pack_flags(features):
+    flags = np.zeros(len(features), dtype=np.int32)
+    for bit, name in enumerate(YES_NO_FEATURES):
+        flags |= (features[:, COLUMN[name]] == 2).astype(np.int32) << bit
+    return flags
+
+
+def _yes(features, name):
+    return features[:, COLUMN[name]] == 2
+
+
+# Function for the development mock model. High risk needs smoking, age over
+# 60 and a cough or wheeze; medium risk needs three or more of seven factors.
+def mock_probability(features):
+    smoking = _yes(features, "SMOKING")
+    older = features[:, COLUMN["AGE"]] > 60
+    coughing = _yes(features, "COUGHING")
+    wheezing = _yes(features, "WHEEZING")
+
+    risk_factors_count = (
+        smoking.astype(np.int8)
+        + older
+        + _yes(features, "YELLOW_FINGERS")
+        + coughing
+        + _yes(features, "SHORTNESS_OF_BREATH")
+        + wheezing
+        + _yes(features, "CHEST_PAIN")
+    )
+
+    band = np.where(smoking & older & (coughing | wheezing), 2, np.where(risk_factors_count >= 3, 1, 0))
+    return MOCK_BAND_PROBABILITIES[band]
+
+
+# Function to turn probabilities into risk band codes (0 = Low, 1 = Medium, 2 = High)
+def risk_bands(probability):
+    return np.searchsorted(BAND_EDGES, probability, side="right").astype(np.uint8)
+
+
+# Function to get the active model backend (see models.py)
+def active_model():
+    import models
+
+    return models.get_model()
+
+
+def model_version():
+    return active_model().version
+
+
+# Function for the live model, evaluated on every call
+def model_probability(features, model=None):
+    return (model or active_model()).probability(features)
+
+
+# Function to get probabilities, from the model's precomputed table when one is loaded
+def predict_probability(features, model=None):
+    import lookup_table
+
+    model = model or active_model()
+    table = lookup_table.get_table(model)
+    if table is None:
+        return model.probability(features)
+    return table.probability(features)
+
+
+# Function to score an encoded feature matrix. Returns a dict of arrays plus
+# the version of the model that produced them.
+def score_features(features, model=None):
+    model = model or active_model()
+    probability = predict_probability(features, model)
+    band = risk_bands(probability)
+    return {
+        "probability": probability,
+        "prediction": PREDICTIONS[(probability >= PREDICTION_THRESHOLD).astype(np.uint8)],
+        "risk_level": RISK_LEVELS[band],
+        "band": band,
+        "model_version": model.version,
+    }
+
+
+# Function to score many respondents at once
+def score_batch(data):
+    return score_features(encode(data))
+
+
+# Function to pull one respondent's result out of a batch, as plain Python values
+def row_result(scores, index):
+    return {
+        "prediction": str(scores["prediction"][index]),
+        "probability": float(scores["probability"][index]),
+        "risk_level": str(scores["risk_level"][index]),
+        "model_version": scores["model_version"],
+    }
+
+
+# Function to score a single input_data dict
+def score_one(input_data):
+    return row_result(score_batch(input_data), 0)
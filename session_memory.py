@@ -0,0 +1,240 @@
+# Per-session memory accounting and idle session cleanup.
+#
+# Each browser session holds its session state (widget values and the
+# assessment results), the files uploaded on the batch page, the media files
+# (downloads) built for it, and references keeping rendered messages alive in
+# Streamlit's message cache. footprint() measures each of these for every
+# session, so the admin view (sessions_page.py) can list the largest ones.
+#
+# Every rerun calls touch(), which also starts a background sweeper. Every
+# SESSION_SWEEP_INTERVAL seconds it measures all sessions and:
+#
+# - compacts sessions idle for SESSION_IDLE_COMPACT seconds: their uploaded
+#   files and message cache references are released. Session state (answers
+#   and score) stays, so the page still shows the results and the next
+#   interaction re-renders everything else. Media files stay too: a download
+#   button fetches its file without a rerun, so it has to keep working,
+# - evicts sessions idle for SESSION_IDLE_EVICT seconds: the session is closed
+#   and the browser reconnects to a fresh one, as after a server restart.
+#
+# A session is idle from the end of its last rerun; sessions whose script is
+# running are never touched. Session counts, measured bytes, compactions and
+# evictions are exported through metrics.py. All of this reads Streamlit
+# runtime internals and is skipped (not failed) when they are missing;
+# anything that changes a session runs on the runtime's event loop.
+import sys
+import threading
+import time
+
+import numpy as np
+
+import config
+import metrics
+
+KINDS = ("state", "uploads", "media", "messages")
+
+_last_seen = {}  # session id -> time.time() of its last rerun
+_compacted = set()  # sessions compacted since their last rerun
+_lock = threading.Lock()
+_sweeper = None
+last_report = None  # the most recent sweep's footprint() result
+
+
+# Function to estimate the memory held by a Python object and everything it
+# references. Functions, classes and modules are shared and are not followed.
+def deep_size(obj, seen=None):
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    if isinstance(obj, (str, bytes, bytearray, int, float, bool, type(None))):
+        return sys.getsizeof(obj)
+    if isinstance(obj, np.ndarray):
+        return sys.getsizeof(obj) + (obj.nbytes if obj.base is None else 0)
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(deep_size(key, seen) + deep_size(value, seen)
+                                        for key, value in list(obj.items()))
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return sys.getsizeof(obj) + sum(deep_size(item, seen) for item in list(obj))
+    if callable(obj) or isinstance(obj, type(sys)):
+        return 0
+    # pandas objects know their own size, including string columns
+    memory_usage = getattr(obj, "memory_usage", None)
+    if memory_usage is not None and type(obj).__module__.startswith("pandas"):
+        usage = memory_usage(deep=True)
+        return int(usage.sum()) if hasattr(usage, "sum") else int(usage)
+    size = sys.getsizeof(obj)
+    if hasattr(obj, "__dict__"):
+        size += deep_size(vars(obj), seen)
+    return size
+
+
+def _runtime():
+    try:
+        from streamlit.runtime import Runtime
+
+        return Runtime.instance() if Runtime.exists() else None
+    except (AttributeError, ImportError):
+        return None
+
+
+# Function to measure one session's state, ignoring Streamlit's own widget
+# metadata (shared callbacks and serializers)
+def _state_bytes(session):
+    state = session.session_state
+    widgets = getattr(state._new_widget_state, "states", {})
+    return deep_size((state._old_state, state._new_session_state, widgets))
+
+
+def _upload_bytes(runtime, session_id):
+    files = runtime.uploaded_file_mgr._files_by_id
+    return sum(len(rec.data) for (owner, _), recs in list(files.items()) if owner == session_id for rec in recs)
+
+
+def _media_bytes(runtime, session_id):
+    manager = runtime.media_file_mgr
+    file_ids = set(manager._files_by_session_and_coord.get(session_id, {}).values())
+    stored = manager._storage._files_by_id
+    return sum(stored[file_id].content_size for file_id in file_ids if file_id in stored)
+
+
+def _is_running(session):
+    from streamlit.runtime.app_session import AppSessionState
+
+    return session._state == AppSessionState.APP_IS_RUNNING
+
+
+def _message_bytes(runtime, session):
+    entries = runtime._message_cache._entries
+    return sum(entry.msg.ByteSize() for entry in list(entries.values()) if entry.has_session_ref(session))
+
+
+# Function to measure every session. Returns a list of dicts, largest first:
+# {"session_id", "idle_seconds", "script_runs", "connected", "running",
+#  "compacted", "state", "uploads", "media", "messages", "total"}. Sessions
+# that change while they are measured are skipped until the next call.
+def footprint():
+    runtime = _runtime()
+    if runtime is None:
+        return []
+    now = time.time()
+    active = {info.session.id for info in runtime._session_mgr.list_active_sessions()}
+    sessions = []
+    for info in runtime._session_mgr.list_sessions():
+        session = info.session
+        try:
+            sizes = {
+                "state": _state_bytes(session),
+                "uploads": _upload_bytes(runtime, session.id),
+                "media": _media_bytes(runtime, session.id),
+                "messages": _message_bytes(runtime, session),
+            }
+            running = _is_running(session)
+        except (AttributeError, ImportError, RuntimeError):
+            continue
+        with _lock:
+            # A long rerun counts as activity until it finishes
+            if running:
+                _last_seen[session.id] = now
+            last_seen = _last_seen.setdefault(session.id, now)
+            compacted = session.id in _compacted
+        sessions.append(dict(
+            sizes,
+            session_id=session.id,
+            idle_seconds=now - last_seen,
+            script_runs=info.script_run_count,
+            connected=session.id in active,
+            running=running,
+            compacted=compacted,
+            total=sum(sizes.values()),
+        ))
+    sessions.sort(key=lambda entry: entry["total"], reverse=True)
+    return sessions
+
+
+# Function to release what an idle session can rebuild on its next rerun.
+# Runs on the event loop; a rerun may have started since the sweep looked.
+def _compact(runtime, session_id):
+    info = runtime._session_mgr.get_session_info(session_id)
+    if info is None or _is_running(info.session):
+        with _lock:
+            _compacted.discard(session_id)
+        return
+    runtime._message_cache.remove_refs_for_session(info.session)
+    runtime.uploaded_file_mgr.remove_session_files(session_id)
+    metrics.SESSION_COMPACTIONS.inc()
+
+
+# Function to close a session and its connection; the browser reconnects to a
+# new session. Runs on the event loop.
+def _evict(runtime, session_id):
+    info = runtime._session_mgr.get_session_info(session_id)
+    if info is None or _is_running(info.session):
+        return
+    client = runtime.get_client(session_id)
+    runtime.close_session(session_id)
+    if client is not None:
+        client.close()
+    metrics.SESSION_EVICTIONS.inc()
+
+
+# Function to measure every session and compact or evict the idle ones
+def sweep():
+    global last_report
+    runtime = _runtime()
+    if runtime is None:
+        return []
+    sessions = footprint()
+    last_report = sessions
+
+    loop = runtime._get_async_objs().eventloop
+    for entry in sessions:
+        session_id, idle = entry["session_id"], entry["idle_seconds"]
+        if entry["running"]:
+            continue
+        if 0 < config.SESSION_IDLE_EVICT <= idle:
+            loop.call_soon_threadsafe(_evict, runtime, session_id)
+        elif 0 < config.SESSION_IDLE_COMPACT <= idle and not entry["compacted"]:
+            with _lock:
+                _compacted.add(session_id)
+            loop.call_soon_threadsafe(_compact, runtime, session_id)
+
+    # Forget sessions the runtime no longer knows about
+    known = {info.session.id for info in runtime._session_mgr.list_sessions()}
+    with _lock:
+        for session_id in list(_last_seen):
+            if session_id not in known:
+                del _last_seen[session_id]
+                _compacted.discard(session_id)
+    return sessions
+
+
+def _sweep_forever():
+    while True:
+        time.sleep(config.SESSION_SWEEP_INTERVAL)
+        try:
+            sweep()
+        except Exception:  # keep sweeping; the runtime may be shutting down
+            pass
+
+
+def ensure_sweeper():
+    global _sweeper
+    if _sweeper is not None or config.SESSION_SWEEP_INTERVAL <= 0:
+        return
+    with _lock:
+        if _sweeper is None:
+            _sweeper = threading.Thread(target=_sweep_forever, name="session-sweeper", daemon=True)
+            _sweeper.start()
+
+
+# Function to record activity for a session, called on every rerun
+def touch(session_id):
+    if session_id is None:
+        return
+    with _lock:
+        _last_seen[session_id] = time.time()
+        _compacted.discard(session_id)
+    ensure_sweeper()
@@ -0,0 +1,66 @@
+# Admin view of the browser sessions this process holds, largest first.
+# Shown only with ?admin=<ADMIN_TOKEN> in the URL (see app.py).
+import os
+
+import pandas as pd
+import streamlit as st
+
+import config
+import session_memory
+from metrics import process_rss
+
+MAX_ROWS = 100
+
+
+def _mb(size):
+    return size / (1024 * 1024)
+
+
+# Function to render the sessions admin page
+def render_sessions():
+    st.markdown("""
+    <div class="card">
+        <h2>Sessions</h2>
+        <p>Memory held by each browser session in this worker: session state, uploaded files, downloads and cached page messages.</p>
+    </div>
+    """, unsafe_allow_html=True)
+
+    compact_label = f"{config.SESSION_IDLE_COMPACT / 60:g} min" if config.SESSION_IDLE_COMPACT > 0 else "never"
+    evict_label = f"{config.SESSION_IDLE_EVICT / 60:g} min" if config.SESSION_IDLE_EVICT > 0 else "never"
+    st.caption(f"Idle sessions are compacted after {compact_label} and closed after {evict_label}.")
+
+    if st.button("Compact idle sessions now"):
+        sessions = session_memory.sweep()
+    else:
+        sessions = session_memory.footprint()
+
+    rss = process_rss(os.getpid())
+    metric_cols = st.columns(4)
+    metric_cols[0].metric("Sessions", f"{len(sessions):,}")
+    metric_cols[1].metric("Held by sessions", f"{_mb(sum(entry['total'] for entry in sessions)):.1f} MB")
+    metric_cols[2].metric("Largest session", f"{_mb(sessions[0]['total']) if sessions else 0:.2f} MB")
+    metric_cols[3].metric("Process RSS", f"{_mb(rss):.0f} MB" if rss is not None else "n/a")
+
+    if not sessions:
+        st.info("No sessions to show.")
+        return
+
+    st.dataframe(
+        pd.DataFrame({
+            "Session": [entry["session_id"][:8] for entry in sessions[:MAX_ROWS]],
+            "Idle (min)": [round(entry["idle_seconds"] / 60, 1) for entry in sessions[:MAX_ROWS]],
+            "Reruns": [entry["script_runs"] for entry in sessions[:MAX_ROWS]],
+            "Connected": [entry["connected"] for entry in sessions[:MAX_ROWS]],
+            "Running": [entry["running"] for entry in sessions[:MAX_ROWS]],
+            "Compacted": [entry["compacted"] for entry in sessions[:MAX_ROWS]],
+            **{
+                f"{kind.capitalize()} (KB)": [round(entry[kind] / 1024, 1) for entry in sessions[:MAX_ROWS]]
+                for kind in session_memory.KINDS
+            },
+            "Total (KB)": [round(entry["total"] / 1024, 1) for entry in sessions[:MAX_ROWS]],
+        }),
+        hide_index=True,
+        use_container_width=True,
+    )
+    if len(sessions) > MAX_ROWS:
+        st.caption(f"Showing the {MAX_ROWS} largest of {len(sessions):,} sessions.")
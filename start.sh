@@ -1,2 +1,10 @@
+python lookup_table.py build --if-missing
+python assets.py build --if-missing
+if [ "${LU_API_ENABLED:-0}" = "1" ]; then
+    python api.py --port "${LU_API_PORT:-10001}" --address 0.0.0.0 &
+fi
+if [ "${LU_WORKERS:-1}" -gt 1 ]; then
+    exec python launcher.py --workers "$LU_WORKERS" --port 10000 --address 0.0.0.0
+fi
 streamlit run app.py --server.port 10000 --server.address 0.0.0.0
 chmod +x start.sh
@@ -0,0 +1,593 @@
+# Static page content: the stylesheet, the header and the educational
+# sections around the assessment.
+#
+# Nothing here depends on the session, so each block is built once per
+# process and every section goes out as a few large messages rather than many
+# small ones. Streamlit still sends the page's elements on every rerun, but
+# any message of at least global.minCachedMessageSize bytes (lowered in
+# .streamlit/config.toml) is replaced by a ~50 byte hash reference once the
+# browser has it. Unchanged blocks therefore cost almost nothing on reruns
+# triggered by the form or the what-if panel.
+#
+# The stylesheet is one such message rather than a linked .css file:
+# Streamlit's static file handler serves anything but images as text/plain
+# with nosniff, which browsers refuse to apply as a stylesheet.
+import functools
+
+import streamlit as st
+
+import assets
+from figures import show_chart, survival_chart_spec
+
+STYLESHEET = """
+* {
+    font-family: 'Poppins', sans-serif;
+}
+
+.main {
+    background-color: #F0F9FF;  /* Light blue background */
+    background-image: linear-gradient(135deg, #F0F9FF 0%, #E0F2FE 100%);
+    padding: 20px;
+}
+
+h1 {
+    color: #0369A1;
+    font-weight: 700;
+    text-align: center;
+    margin-bottom: 1rem;
+    font-size: 2.5rem;
+    background: linear-gradient(90deg, #0369A1, #0284C7);
+    -webkit-background-clip: text;
+    -webkit-text-fill-color: transparent;
+}
+
+h2 {
+    color: #0369A1;
+    font-weight: 600;
+    margin-top: 1.5rem;
+}
+
+h3 {
+    color: #0284C7;
+    font-weight: 500;
+}
+
+.stButton>button {
+    background-color: #0284C7;
+    color: white;
+    font-weight: 600;
+    padding: 0.75rem 2rem;
+    border-radius: 10px;
+    border: none;
+    box-shadow: 0 4px 6px rgba(2, 132, 199, 0.2);
+    transition: all 0.3s ease;
+    width: 100%;
+}
+
+.stButton>button:hover {
+    background-color: #0369A1;
+    box-shadow: 0 6px 8px rgba(2, 132, 199, 0.3);
+    transform: translateY(-2px);
+}
+
+.prediction-box {
+    padding: 30px;
+    border-radius: 15px;
+    margin: 20px 0;
+    text-align: center;
+    box-shadow: 0 10px 15px rgba(0, 0, 0, 0.1);
+    transition: all 0.3s ease;
+}
+
+.prediction-box:hover {
+    transform: translateY(-5px);
+    box-shadow: 0 15px 20px rgba(0, 0, 0, 0.15);
+}
+
+.high-risk {
+    background: linear-gradient(135deg, #FEE2E2 0%, #FECACA 100%);
+    border-left: 8px solid #DC2626;
+}
+
+.medium-risk {
+    background: linear-gradient(135deg, #FEF9C3 0%, #FEF08A 100%);
+    border-left: 8px solid #CA8A04;
+}
+
+.low-risk {
+    background: linear-gradient(135deg, #DCFCE7 0%, #BBF7D0 100%);
+    border-left: 8px solid #16A34A;
+}
+
+.card {
+    background-color: white;
+    border-radius: 15px;
+    padding: 20px;
+    box-shadow: 0 4px 6px rgba(0, 0, 0, 0.05);
+    margin-bottom: 20px;
+    transition: all 0.3s ease;
+}
+
+.card:hover {
+    box-shadow: 0 10px 15px rgba(0, 0, 0, 0.1);
+    transform: translateY(-3px);
+}
+
+.sidebar .css-1d391kg {
+    background-color: #F0F9FF;
+}
+
+.stRadio>div {
+    display: flex;
+    justify-content: space-around;
+    flex-wrap: wrap;
+}
+
+.stRadio label {
+    background-color: white;
+    padding: 10px 20px;
+    border-radius: 20px;
+    box-shadow: 0 2px 5px rgba(0, 0, 0, 0.05);
+    margin: 5px;
+    text-align: center;
+    transition: all 0.2s ease;
+}
+
+.stRadio label:hover {
+    background-color: #E0F2FE;
+    box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
+}
+
+/* Header with animation */
+.animated-gradient {
+    background: linear-gradient(-45deg, #0369A1, #0284C7, #38BDF8, #7DD3FC);
+    background-size: 400% 400%;
+    animation: gradient 15s ease infinite;
+    color: white;
+    padding: 20px;
+    border-radius: 15px;
+    text-align: center;
+    margin-bottom: 30px;
+    box-shadow: 0 10px 15px rgba(2, 132, 199, 0.2);
+}
+
+@keyframes gradient {
+    0% {
+        background-position: 0% 50%;
+    }
+    50% {
+        background-position: 100% 50%;
+    }
+    100% {
+        background-position: 0% 50%;
+    }
+}
+
+/* Page header */
+.header-container {
+    background-color: #4B6CB7;
+    padding: 20px;
+    border-radius: 15px;
+    text-align: center;
+    margin-bottom: 30px;
+}
+
+.header-container .main-title {
+    color: white;
+    background: none;
+    -webkit-text-fill-color: white;
+    margin-bottom: 0;
+}
+
+.header-container .subtitle {
+    color: white;
+    font-size: 1.2rem;
+}
+
+/* Image styles */
+.rounded-image {
+    border-radius: 15px;
+    box-shadow: 0 5px 15px rgba(0, 0, 0, 0.1);
+}
+
+/* Footer */
+.footer {
+    text-align: center;
+    padding: 20px;
+    color: #64748B;
+    margin-top: 50px;
+    border-top: 1px solid #E2E8F0;
+}
+
+/* Tooltip */
+.tooltip {
+    position: relative;
+    display: inline-block;
+    cursor: help;
+}
+
+.tooltip .tooltiptext {
+    visibility: hidden;
+    width: 200px;
+    background-color: #0284C7;
+    color: white;
+    text-align: center;
+    border-radius: 6px;
+    padding: 10px;
+    position: absolute;
+    z-index: 1;
+    bottom: 125%;
+    left: 50%;
+    margin-left: -100px;
+    opacity: 0;
+    transition: opacity 0.3s;
+}
+
+.tooltip:hover .tooltiptext {
+    visibility: visible;
+    opacity: 1;
+}
+
+/* Info cards */
+.info-card {
+    border-left: 4px solid #0284C7;
+    background-color: white;
+    padding: 15px;
+    margin: 10px 0;
+    border-radius: 5px;
+    box-shadow: 0 2px 5px rgba(0, 0, 0, 0.05);
+}
+
+/* Animation for recommendations */
+@keyframes fadeIn {
+    from { opacity: 0; transform: translateY(20px); }
+    to { opacity: 1; transform: translateY(0); }
+}
+
+.recommendation-item {
+    animation: fadeIn 0.5s ease forwards;
+    opacity: 0;
+}
+
+.recommendation-item:nth-child(1) { animation-delay: 0.1s; }
+.recommendation-item:nth-child(2) { animation-delay: 0.2s; }
+.recommendation-item:nth-child(3) { animation-delay: 0.3s; }
+.recommendation-item:nth-child(4) { animation-delay: 0.4s; }
+.recommendation-item:nth-child(5) { animation-delay: 0.5s; }
+"""
+
+HEADER = """
+<div class="header-container">
+    <h1 class="main-title">Lung Cancer Risk Assessment Tool</h1>
+    <p class="subtitle">Evaluate your risk factors and get personalized recommendations</p>
+</div>
+"""
+
+INTRO = """
+<div class="card">
+    <h2>Why Early Detection Matters</h2>
+    <p>Lung cancer is the leading cause of cancer deaths worldwide. When detected early, the five-year survival rate can be as high as 56%, compared to just 5% in advanced stages.</p>
+    <p>This tool helps you identify potential risk factors and guides you toward appropriate healthcare decisions.</p>
+</div>
+"""
+
+ABOUT = """
+This tool uses an advanced machine learning model trained on comprehensive healthcare data to predict lung cancer risk.
+
+**Important**: This is an educational tool and should not replace professional medical advice.
+
+If you have concerns about lung cancer or other health issues, please consult with a healthcare professional.
+"""
+
+RISK_FACTORS = """
+Key risk factors for lung cancer include:
+
+- 🚬 Smoking (accounts for 80-90% of cases)
+- 💨 Exposure to secondhand smoke
+- 👪 Family history
+- ☢️ Exposure to radon gas
+- 🏭 Exposure to asbestos and other carcinogens
+- 🌫️ Air pollution
+- 📡 Previous radiation therapy
+"""
+
+SYMPTOMS = """
+Common symptoms of lung cancer:
+
+- 😷 Persistent cough
+- 💔 Chest pain
+- 🫁 Shortness of breath
+- 🌬️ Wheezing
+- 🗣️ Hoarseness
+- ⚖️ Weight loss
+- 😴 Fatigue
+- 🦠 Recurring infections
+"""
+
+# (title, color, background, summary, checklist) of each card under an assessment
+NEXT_STEPS = [
+    ("Lifestyle Changes", "#16A34A", "#F0FDF4", "Make positive changes to reduce your risk factors",
+     ["Quit smoking", "Maintain healthy weight", "Reduce alcohol intake", "Exercise regularly"]),
+    ("Medical Follow-ups", "#2563EB", "#EFF6FF", "Professional medical guidance is essential",
+     ["Regular check-ups", "Lung cancer screening", "Discuss risk factors", "Follow medical advice"]),
+    ("Environmental Changes", "#CA8A04", "#FEFCE8", "Improve your living environment",
+     ["Radon testing", "Avoid secondhand smoke", "Improve air quality", "Reduce pollutant exposure"]),
+]
+
+NEXT_STEP_CARD = """
+<div class="card" style="text-align: center; background-color: {background}; height: 220px;">
+    <h3 style="color: {color};">{title}</h3>
+    <p>{summary}</p>
+    <ul style="text-align: left; list-style-type: none; padding-left: 0;">
+{items}
+    </ul>
+</div>
+"""
+
+EDUCATION = """
+<br>
+<div class="card">
+    <h2>Understanding Lung Cancer</h2>
+    <p>Lung cancer is one of the most common and serious types of cancer. There are usually no signs or symptoms in the early stages, which makes early detection challenging but crucial.</p>
+</div>
+"""
+
+STATISTICS = """
+### Key Statistics
+- Lung cancer accounts for about 25% of all cancer deaths
+- The average age of diagnosis is about 70
+- 5-year survival rate for localized lung cancer: ~60%
+- 5-year survival rate for distant (metastasized) lung cancer: ~6%
+"""
+
+TYPES = """
+### Types of Lung Cancer
+
+#### Non-Small Cell Lung Cancer (NSCLC)
+- Accounts for 80-85% of lung cancers
+- Main subtypes: Adenocarcinoma, Squamous cell carcinoma, Large cell carcinoma
+- Generally grows and spreads more slowly than SCLC
+
+#### Small Cell Lung Cancer (SCLC)
+- Accounts for 15-20% of lung cancers
+- Strongly linked to cigarette smoking
+- Tends to grow more quickly and spread earlier than NSCLC
+- Often responds well to chemotherapy and radiation initially
+"""
+
+DIAGNOSIS = """
+### Diagnosis Methods
+
+- **Imaging Tests**: X-rays, CT scans, PET scans
+- **Sputum Cytology**: Examining mucus from the lungs
+- **Tissue Sample (Biopsy)**: Taking cells from suspicious areas
+- **Bronchoscopy**: Examining airways with a lighted tube
+- **Mediastinoscopy**: Surgical procedure to check lymph nodes
+"""
+
+TREATMENT = """
+### Treatment Options
+
+- **Surgery**: Removal of cancerous tissue
+- **Chemotherapy**: Using drugs to kill cancer cells
+- **Radiation Therapy**: Using high-energy rays to kill cancer cells
+- **Targeted Drug Therapy**: Targeting specific abnormalities in cancer cells
+- **Immunotherapy**: Boosting your immune system to fight cancer
+- **Palliative Care**: Improving quality of life
+"""
+
+PREVENTION = """
+<br>
+<div class="card">
+    <h2>Prevention Tips</h2>
+    <p>While not all lung cancers can be prevented, there are steps you can take to reduce your risk.</p>
+</div>
+"""
+
+PREVENTION_STRATEGIES = """
+### Key Prevention Strategies
+
+1. **Avoid Tobacco**: Don't start smoking, or quit if you already smoke.
+
+2. **Avoid Secondhand Smoke**: Stay away from places where people smoke.
+
+3. **Test for Radon**: Have your home tested for radon, a naturally occurring radioactive gas.
+
+4. **Avoid Carcinogens**: Follow safety guidelines when working with toxic chemicals.
+
+5. **Eat a Healthy Diet**: Include plenty of fruits and vegetables.
+
+6. **Exercise Regularly**: Aim for at least 30 minutes of activity most days of the week.
+
+7. **Get Regular Screening**: If you're at high risk, talk to your doctor about lung cancer screening.
+"""
+
+FAQ_HEADER = """
+<br>
+<div class="card">
+    <h2>Frequently Asked Questions</h2>
+</div>
+"""
+
+# (question, answer) pairs, each shown in its own expander
+FAQ = [
+    ("🔍 Who should get screened for lung cancer?", """
+Lung cancer screening is generally recommended for people who:
+
+- Are aged 50-80 years
+- Have a 20 pack-year smoking history (e.g., 1 pack a day for 20 years)
+- Currently smoke or have quit within the past 15 years
+- Are in relatively good health
+
+Always consult with your healthcare provider to determine if screening is right for you.
+"""),
+    ("⏱️ How often should screening occur?", """
+For those who meet the criteria for lung cancer screening, annual low-dose CT scans are typically recommended.
+Your healthcare provider may suggest a different schedule based on your personal risk factors.
+"""),
+    ("🧬 Is lung cancer hereditary?", """
+While most lung cancers are not inherited, having a family history of lung cancer does increase your risk slightly.
+This could be due to shared genetic factors or shared environmental exposures.
+
+If multiple members of your family have had lung cancer, especially at younger ages, you might consider genetic counseling.
+"""),
+    ("🚭 If I quit smoking, how long until my risk decreases?", """
+Your risk begins to decrease as soon as you quit smoking:
+
+- After 10 years, your risk of dying from lung cancer drops to about half that of a current smoker
+- After 15-20 years, your risk approaches (but never quite reaches) that of someone who has never smoked
+
+It's never too late to quit smoking - your body begins to heal almost immediately.
+"""),
+]
+
+RESOURCES_HEADER = """
+<br>
+<div class="card">
+    <h2>Additional Resources</h2>
+    <p>Learn more about lung cancer diagnosis, treatment, and support through these reliable resources.</p>
+</div>
+"""
+
+# (name, description, link) of each resource card
+RESOURCES = [
+    ("American Lung Association", "Comprehensive information on lung health and disease", "https://www.lung.org"),
+    ("American Cancer Society", "Cancer information, research, and patient support", "https://www.cancer.org"),
+    ("National Cancer Institute", "Government resource for cancer information", "https://www.cancer.gov"),
+]
+
+RESOURCE_CARD = """
+<div class="card" style="text-align: center; height: 200px;">
+    <h3>{name}</h3>
+    <p>{description}</p>
+    <p><a href="{link}" target="_blank">{host}</a></p>
+</div>
+"""
+
+FOOTER = """
+<div class="footer">
+    <p>© 2025 Lung Cancer Risk Assessment Tool | Developed with ❤️ for better health outcomes</p>
+    <p>This tool is for educational purposes only and does not provide medical advice.</p>
+    <p>Always consult with healthcare professionals for medical concerns.</p>
+</div>
+"""
+
+
+# Function to build the page stylesheet, font rules included, once per process
+@functools.lru_cache(maxsize=None)
+def stylesheet():
+    return "<style>\n%s\n%s</style>" % (assets.font_css(), STYLESHEET)
+
+
+@functools.lru_cache(maxsize=None)
+def _next_step_cards():
+    return [
+        NEXT_STEP_CARD.format(title=title, color=color, background=background, summary=summary,
+                              items="\n".join("        <li>✅ %s</li>" % item for item in checklist))
+        for title, color, background, summary, checklist in NEXT_STEPS
+    ]
+
+
+@functools.lru_cache(maxsize=None)
+def _resource_cards():
+    return [
+        RESOURCE_CARD.format(name=name, description=description, link=link, host=link.split("//", 1)[1])
+        for name, description, link in RESOURCES
+    ]
+
+
+# Function to show a Lottie animation. The component is imported on first
+# use, so pages without animations never load it.
+def lottie(animation, height, key):
+    from streamlit_lottie import st_lottie
+
+    st_lottie(animation, height=height, key=key)
+
+
+# Function to inject the stylesheet and show the page header
+def render_header():
+    st.markdown(stylesheet(), unsafe_allow_html=True)
+    st.markdown(HEADER, unsafe_allow_html=True)
+
+
+# Function to show the introduction card next to the lung animation
+def render_intro(lung_animation):
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        st.markdown(INTRO, unsafe_allow_html=True)
+    with col2:
+        if lung_animation:
+            lottie(lung_animation, height=200, key="lung")
+        else:
+            assets.image("lung_illustration")
+
+
+# Function to show the About box and the reference expanders in the sidebar
+def render_sidebar_info(doctor_animation):
+    st.header("About")
+    st.info(ABOUT)
+
+    if doctor_animation:
+        lottie(doctor_animation, height=200, key="doctor")
+
+    with st.expander("📋 Risk Factors", expanded=False):
+        st.markdown(RISK_FACTORS)
+
+    with st.expander("🔍 Symptoms", expanded=False):
+        st.markdown(SYMPTOMS)
+
+
+# Function to show the next-steps cards under an assessment
+def render_next_steps():
+    for col, card in zip(st.columns(3), _next_step_cards()):
+        with col:
+            st.markdown(card, unsafe_allow_html=True)
+
+
+# Function to show everything below the assessment: education tabs,
+# prevention tips, FAQ, resources and the footer
+def render_education(health_animation):
+    st.markdown(EDUCATION, unsafe_allow_html=True)
+
+    info_tabs = st.tabs(["📈 Statistics", "🔬 Types", "🩺 Diagnosis & Treatment"])
+
+    with info_tabs[0]:
+        stats_cols = st.columns([1, 1])
+        with stats_cols[0]:
+            st.markdown(STATISTICS)
+        with stats_cols[1]:
+            # Built once per process; the data never changes
+            show_chart(survival_chart_spec(), use_container_width=True)
+
+    with info_tabs[1]:
+        st.markdown(TYPES)
+        assets.image("lung_cancer_types", caption="Lung cancer types illustration")
+
+    with info_tabs[2]:
+        diag_cols = st.columns([1, 1])
+        with diag_cols[0]:
+            st.markdown(DIAGNOSIS)
+        with diag_cols[1]:
+            st.markdown(TREATMENT)
+
+    st.markdown(PREVENTION, unsafe_allow_html=True)
+    prevention_cols = st.columns([1, 2])
+    with prevention_cols[0]:
+        if health_animation:
+            lottie(health_animation, height=300, key="health")
+        else:
+            assets.image("lung_diagnostics")
+    with prevention_cols[1]:
+        st.markdown(PREVENTION_STRATEGIES)
+
+    st.markdown(FAQ_HEADER, unsafe_allow_html=True)
+    for question, answer in FAQ:
+        with st.expander(question):
+            st.markdown(answer)
+
+    st.markdown(RESOURCES_HEADER, unsafe_allow_html=True)
+    for col, card in zip(st.columns(3), _resource_cards()):
+        with col:
+            st.markdown(card, unsafe_allow_html=True)
+
+    st.markdown(FOOTER, unsafe_allow_html=True)
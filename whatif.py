@@ -0,0 +1,61 @@
+# What-if sensitivity sweep for one respondent.
+#
+# From a base profile, every answer except AGE is flipped one at a time
+# (Yes <-> No, M <-> F). The base profile and each flipped one are then scored
+# at the respondent's own age and across the whole 18-100 age range, all in a
+# single vectorized call (about 1,300 rows, served from the lookup table when
+# one is loaded). Sweeps are memoized per model and base profile.
+import functools
+
+import numpy as np
+
+import config
+import scoring
+from lookup_table import AGE_MAX, AGE_MIN
+
+AGES = np.arange(AGE_MIN, AGE_MAX + 1, dtype=np.int16)
+FLIP_FEATURES = [name for name in scoring.FEATURES if name != "AGE"]
+
+
+@functools.lru_cache(maxsize=config.WHATIF_CACHE_MAX_ENTRIES)
+def _sweep(model, row):
+    base = np.array(row, dtype=np.int16)
+    profiles = np.tile(base, (len(FLIP_FEATURES) + 1, 1))
+    for i, name in enumerate(FLIP_FEATURES, start=1):
+        column = scoring.COLUMN[name]
+        profiles[i, column] = 3 - base[column]  # 1 <-> 2 for yes/no answers and gender
+
+    grid = np.repeat(profiles, len(AGES), axis=0)
+    grid[:, scoring.COLUMN["AGE"]] = np.tile(AGES, len(profiles))
+    rows = np.asfortranarray(np.concatenate([profiles, grid]))
+    probability = scoring.predict_probability(rows, model)
+
+    current = probability[:len(profiles)]
+    curves = probability[len(profiles):].reshape(len(profiles), len(AGES))
+    curves.flags.writeable = False
+    return {
+        "model_version": model.version,
+        "profile": row,
+        "age": int(base[scoring.COLUMN["AGE"]]),
+        "ages": AGES,
+        "probability": float(current[0]),
+        "curve": curves[0],
+        "flips": [
+            {
+                "feature": name,
+                "value": int(profiles[i, scoring.COLUMN[name]]),
+                "probability": float(current[i]),
+                "delta": float(current[i] - current[0]),
+                "curve": curves[i],
+            }
+            for i, name in enumerate(FLIP_FEATURES, start=1)
+        ],
+    }
+
+
+# Function to run the what-if sweep for one encoded row. Returns a dict with
+# the base probability and age curve plus, per flipped feature, its new
+# answer, probability, delta and age curve. The result is shared with the
+# cache, so treat it as read-only.
+def sweep(features, index=0, model=None):
+    return _sweep(model or scoring.active_model(), tuple(features[index].tolist()))